@@ -0,0 +1,63 @@
+"""
+Compare the file walk with per-file pathspec matching against the pruning, index-backed walk.
+
+Run from the repository root:
+    python -m benchmarks.bench_ignore --files 100000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import pathspec
+from src.scanner import FileScanner
+from src.settings import Settings
+from .synthetic import generate_tree
+
+
+def walk_with_pathspec(root_path: str, spec: pathspec.PathSpec) -> int:
+    """The previous walk: only hard-coded directories are pruned, every file is matched against the spec."""
+    count = 0
+    for root, dirs, files in os.walk(root_path):
+        dirs[:] = [d for d in dirs if d not in Settings.IGNORED_DIRECTORIES]
+        for file_name in files:
+            file_path = os.path.join(root, file_name)
+            if spec.match_file(os.path.relpath(file_path, root_path)):
+                continue
+            os.stat(file_path)
+            count += 1
+    return count
+
+
+def walk_with_matcher(scanner: FileScanner, root_path: str) -> int:
+    """The pruning walk used by FileScanner.walk_files."""
+    scanner.start(root_path, root_path, '.gptignore')
+    return sum(1 for _ in scanner.iter_candidate_files())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ignore matching on a synthetic tree")
+    parser.add_argument("--files", type=int, default=100000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as root:
+        generate_tree(root, args.files)
+        with open(os.path.join(root, '.gitignore'), 'r', encoding='utf-8') as file:
+            spec = pathspec.PathSpec.from_lines('gitwildmatch', file.readlines())
+
+        start = time.perf_counter()
+        baseline = walk_with_pathspec(root, spec)
+        baseline_time = time.perf_counter() - start
+
+        scanner = FileScanner()
+        start = time.perf_counter()
+        pruned = walk_with_matcher(scanner, root)
+        pruned_time = time.perf_counter() - start
+
+        print(f"pathspec per file: {baseline} files kept in {baseline_time:.2f}s")
+        print(f"pruned + indexed:  {pruned} files kept in {pruned_time:.2f}s ({baseline_time / pruned_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
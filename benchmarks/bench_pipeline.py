@@ -0,0 +1,184 @@
+"""
+Benchmark the GPTizer pipeline on a synthetic repository, end to end (process_directory + combine_files)
+and stage by stage (walk, load, tokenize, build). Reports files/s, MB/s, tokens/s and peak RSS, and saves
+the results as JSON so runs on different commits can be compared.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline --files 20000 --median-size 4096 --binary-ratio 0.05 \
+        --encodings utf-8,latin-1 --json results.json
+    python -m benchmarks.bench_pipeline --compare results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from src.gptizer import GPTizer
+from src.metrics import RunMetrics
+from src.output_builder import OutputBuilder
+from src.settings import Settings
+from src.tokenizers import HeuristicTokenizer, create_tokenizer
+from .synthetic import generate_tree
+
+
+def best_of(repeat: int, setup, stage):
+    """Run setup() and time stage(state) repeat times; returns the best time and the last state."""
+    best, state = float('inf'), None
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        stage(state)
+        best = min(best, time.perf_counter() - start)
+    return best, state
+
+
+def throughput(seconds: float, files: int, size: int, tokens: int) -> dict:
+    return {
+        'seconds': round(seconds, 6),
+        'files_per_second': round(files / seconds, 1),
+        'mb_per_second': round(size / 1024 / 1024 / seconds, 2),
+        'tokens_per_second': round(tokens / seconds, 1),
+    }
+
+
+def run_benchmark(root: str, args, tokenizer) -> dict:
+    def new_gptizer():
+        return GPTizer(jobs=args.jobs, tokenizer=tokenizer, transforms=args.transform.split(',') if args.transform else None)
+
+    def scanned():
+        gptizer = new_gptizer()
+        gptizer.scan_directory(root, root, '.gptignore')
+        return gptizer
+
+    def load(gptizer):
+        # Read and decode only, tokenization is measured as its own stage
+        gptizer.counter.tokenizer = None
+        gptizer.loader.load_files(gptizer.project.files)
+        gptizer.counter.tokenizer = tokenizer
+
+    def loaded():
+        gptizer = scanned()
+        load(gptizer)
+        return gptizer
+
+    def tokenize(gptizer):
+        gptizer.counter.count_files([file for file in gptizer.project.files if not file.is_binary])
+        gptizer.project.contents_loaded = True
+
+    def tokenized():
+        gptizer = loaded()
+        tokenize(gptizer)
+        return gptizer
+
+    def end_to_end(gptizer):
+        gptizer.process_directory(root, root, '.gptignore')
+        gptizer.combine_files()
+
+    seconds, gptizer = best_of(args.repeat, new_gptizer, end_to_end)
+    files = len(gptizer.project.files)
+    size = sum(file.metadata.size for file in gptizer.project.files)
+    tokens = sum(file.stats.token_count for file in gptizer.project.files)
+    results = {'end_to_end': throughput(seconds, files, size, tokens)}
+
+    stages = {
+        'walk': (new_gptizer, lambda gptizer: gptizer.scan_directory(root, root, '.gptignore')),
+        'load': (scanned, load),
+        'tokenize': (loaded, tokenize),
+        'build': (tokenized, lambda gptizer: gptizer.build_output(OutputBuilder())),
+    }
+    for name, (setup, stage) in stages.items():
+        seconds, _ = best_of(args.repeat, setup, stage)
+        results[name] = throughput(seconds, files, size, tokens)
+    return {'files': files, 'bytes': size, 'tokens': tokens, 'stages': results}
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(report: dict, baseline: dict = None) -> None:
+    print(f"{report['results']['files']} files, {report['results']['bytes'] / 1024 / 1024:.1f} MB, "
+          f"{report['results']['tokens']} tokens ({report['config']['tokenizer']}), "
+          f"peak RSS {report['peak_rss_bytes'] / 1024 / 1024:.0f} MB")
+    print(f"{'stage':<12} {'seconds':>9} {'files/s':>10} {'MB/s':>8} {'tokens/s':>12}")
+    for name, stage in report['results']['stages'].items():
+        line = (f"{name:<12} {stage['seconds']:>9.3f} {stage['files_per_second']:>10.0f} "
+                f"{stage['mb_per_second']:>8.1f} {stage['tokens_per_second']:>12.0f}")
+        if baseline and name in baseline['results']['stages']:
+            line += f"  {baseline['results']['stages'][name]['seconds'] / stage['seconds']:.2f}x vs {baseline['commit']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the GPTizer pipeline on a synthetic repository")
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--median-size", type=int, default=4096, help="Median file size in bytes")
+    parser.add_argument("--size-sigma", type=float, default=1.0, help="Spread of the log-normal size distribution")
+    parser.add_argument("--binary-ratio", type=float, default=0.05)
+    parser.add_argument("--encodings", type=str, default="utf-8,latin-1",
+                        help="Comma-separated encodings text files are written in")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--ignored-ratio", type=float, default=0.3)
+    parser.add_argument("--ignore-patterns", type=int, default=50, help="Extra .gitignore patterns")
+    parser.add_argument("-j", "--jobs", type=int, default=Settings.DEFAULT_JOBS)
+    parser.add_argument("--tokenizer", type=str, default='exact', choices=['exact', 'heuristic', 'sampled'])
+    parser.add_argument("--encoder-file", type=str, default=None)
+    parser.add_argument("--transform", type=str, default=None, metavar="NAMES", help="Comma-separated content transforms")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=str, default=None, metavar="PATH", help="Save the results as JSON")
+    parser.add_argument("--compare", type=str, default=None, metavar="PATH",
+                        help="Results JSON of an earlier run; its configuration is reused and speedups are shown")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)  # Context usage errors of the large synthetic output are expected
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        for key, value in baseline['config'].items():
+            setattr(args, key, value)
+
+    tokenizer = create_tokenizer(args.tokenizer, Settings.TOKEN_MODEL_NAME, args.encoder_file)
+    if not tokenizer.available:
+        print(f"{args.tokenizer} tokenizer not available, falling back to the heuristic estimate")
+        args.tokenizer = 'heuristic'
+        tokenizer = HeuristicTokenizer()
+
+    config = {key: getattr(args, key) for key in (
+        'files', 'median_size', 'size_sigma', 'binary_ratio', 'encodings', 'depth', 'fanout', 'ignored_ratio',
+        'ignore_patterns', 'jobs', 'tokenizer', 'transform', 'repeat', 'seed')}
+    with tempfile.TemporaryDirectory() as root:
+        generate_tree(root, args.files, args.depth, args.fanout, args.ignored_ratio, args.seed, args.median_size,
+                      args.size_sigma, args.binary_ratio, args.encodings.split(','), args.ignore_patterns)
+        results = run_benchmark(root, args, tokenizer)
+
+    report = {
+        'commit': current_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'config': config,
+        'results': results,
+        'peak_rss_bytes': RunMetrics.peak_memory_bytes(),
+    }
+    print_results(report, baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
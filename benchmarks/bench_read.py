@@ -0,0 +1,85 @@
+"""
+Compare the single-read file loader with the previous double-open, readlines based loader across file sizes.
+
+Run from the repository root:
+    python -m benchmarks.bench_read
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from src.models import File
+from src.reader import FileReader
+from src.settings import Settings
+from src.tokenizers import TokenCounter
+
+SIZE_BUCKETS = [1024, 16 * 1024, 256 * 1024, 4 * 1024 * 1024, 32 * 1024 * 1024]
+
+
+def read_previous(file: File) -> None:
+    """The previous loader: sniff in binary mode, reopen in text mode per encoding, re-encode to measure."""
+    with open(file.directory, 'rb') as f:
+        if b'\0' in f.read(1024):
+            file.is_binary = True
+            return
+    for encoding in Settings.DEFAULT_ENCODINGS:
+        try:
+            with open(file.directory, 'r', encoding=encoding) as f:
+                lines = f.readlines()
+                file.content = ''.join(lines)
+                file.content_size = len(file.content.encode('utf-8'))
+                file.stats.line_count = len(lines)
+                file.stats.char_count = len(file.content)
+                return
+        except UnicodeDecodeError:
+            continue
+
+
+def make_file(path: str, size: int, latin: bool) -> None:
+    line = 'caf\xe9 = {"value": 42, "text": "lorem ipsum dolor sit amet"}\n'
+    data = (line * (size // len(line) + 1)).encode('latin-1' if latin else 'utf-8')[:size]
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def measure(function, files, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for file in files:
+            function(file)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark file loading across file-size buckets")
+    parser.add_argument("--total-bytes", type=int, default=64 * 1024 * 1024, help="Bytes read per bucket")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    reader = FileReader(TokenCounter(None))
+    with tempfile.TemporaryDirectory() as root:
+        reader.root_path = root
+        print(f"{'size':>10} {'encoding':>8} {'files':>6} {'previous':>10} {'single read':>12} {'speedup':>8}")
+        for size in SIZE_BUCKETS:
+            for latin in (False, True):
+                count = max(1, args.total_bytes // size)
+                paths = []
+                for index in range(count):
+                    path = os.path.join(root, f'{size}-{latin}-{index}.txt')
+                    make_file(path, size, latin)
+                    paths.append(path)
+
+                previous = measure(read_previous, [File('', path) for path in paths], args.repeat)
+                current = measure(reader.read_file_content, [File('', path) for path in paths], args.repeat)
+                print(f"{size:>10} {'latin-1' if latin else 'utf-8':>8} {count:>6} "
+                      f"{previous:>9.3f}s {current:>11.3f}s {previous / current:>7.1f}x")
+                for path in paths:
+                    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
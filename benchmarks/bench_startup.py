@@ -0,0 +1,56 @@
+"""
+Measure startup latency: module import, --help, and the time until the first output of a small project is written.
+Every measurement runs in a fresh interpreter.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --encoder-file o200k_base.tiktoken
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from .synthetic import generate_tree
+
+
+def measure(command, repeat: int, env) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import and first-output latency")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--encoder-file", type=str, default=None,
+                        help="Local BPE rank file, so the tokenizer run works without network access")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        project = os.path.join(root, 'project')
+        generate_tree(project, args.files)
+        output = os.path.join(root, 'output.txt')
+        env = dict(os.environ, XDG_CACHE_HOME=os.path.join(root, 'cache'))
+        gptize = [sys.executable, '-m', 'src.main', project, '--repo-root', project, '-o', output, '--no-cache']
+        if args.encoder_file:
+            gptize += ['--encoder-file', os.path.abspath(args.encoder_file)]
+
+        cases = [
+            ("python startup", [sys.executable, '-c', 'pass']),
+            ("import tiktoken", [sys.executable, '-c', 'import tiktoken']),
+            ("import src.gptizer", [sys.executable, '-c', 'import src.gptizer']),
+            ("gptize --help", [sys.executable, '-m', 'src.main', '--help']),
+            ("first output, --no-tokens", gptize + ['--no-tokens']),
+            ("first output, tokens", gptize),
+        ]
+        for name, command in cases:
+            print(f"{name:<28} {measure(command, args.repeat, env) * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare the speed and accuracy of the exact, heuristic and sampled token counters on the repository's own sources,
+run through GPTizer so the batches are the ones the pipeline tokenizes.
+
+Run from the repository root:
+    python -m benchmarks.bench_tokenizers --encoder-file o200k_base.tiktoken
+"""
+import argparse
+import glob
+import logging
+import os
+import shutil
+import tempfile
+from src.gptizer import GPTizer
+from src.settings import Settings
+from src.tokenizers import HeuristicTokenizer, SampledTokenizer, TiktokenTokenizer
+
+
+def measure(root: str, tokenizer, jobs: int, repeat: int):
+    """Best tokenize phase time of repeat full runs, and the total token count."""
+    best, count = float('inf'), 0
+    for _ in range(repeat):
+        gptizer = GPTizer(jobs=jobs, tokenizer=tokenizer, dedup=False)  # The copies are identical
+        gptizer.process_directory(root, root, '.gptignore')
+        best = min(best, gptizer.metrics.timings['tokenize'])
+        count = sum(file.stats.token_count for file in gptizer.project.files)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark token counting backends")
+    parser.add_argument("--copies", type=int, default=200, help="How often the sources are repeated")
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--encoder-file", type=str, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    sources = sorted(glob.glob('src/*.py') + glob.glob('*.md'))
+    root = tempfile.mkdtemp(prefix='gptize-bench-')
+    try:
+        for copy in range(args.copies):
+            for path in sources:
+                shutil.copyfile(path, os.path.join(root, f"{copy}_{os.path.basename(path)}"))
+        megabytes = sum(os.path.getsize(path) for path in sources) * args.copies / 1024 / 1024
+
+        exact = TiktokenTokenizer(Settings.TOKEN_MODEL_NAME, args.encoder_file)
+        backends = [HeuristicTokenizer()]
+        if exact.available:
+            backends = [exact, SampledTokenizer(exact)] + backends
+        else:
+            print("tiktoken encoder not available, only the heuristic is measured")
+
+        exact_time, exact_count = None, None
+        print(f"{len(sources) * args.copies} files, {megabytes:.1f} MB, {args.jobs} jobs")
+        for tokenizer in backends:
+            seconds, count = measure(root, tokenizer, args.jobs, args.repeat)
+            if tokenizer is exact:
+                exact_time, exact_count = seconds, count
+            line = f"{tokenizer.name:<20} {count:>10} tokens {megabytes / seconds:>8.1f} MB/s"
+            if exact_time is not None and tokenizer is not exact:
+                line += f" {exact_time / seconds:>6.1f}x faster, error {(count - exact_count) / exact_count:+.1%}"
+            print(line if tokenizer.error_bound is None else f"{line} (bound ±{tokenizer.error_bound:.0%})")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
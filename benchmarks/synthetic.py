@@ -0,0 +1,77 @@
+import math
+import os
+import random
+from typing import List, Sequence
+
+GITIGNORE_PATTERNS = ['*.log', '*.tmp', 'node_modules/', 'build/', '.venv/', 'dist/', '/coverage', '**/generated/*.py']
+IGNORED_TREES = ['node_modules', 'build', '.venv', 'dist']
+MAX_FILE_SIZE = 8 * 1024 * 1024
+SOURCE_LINES = [
+    'def handler(request, context=None):\n',
+    '    """Return the caf\xe9 menu for the request."""\n',
+    '    items = [item for item in context.items if item.price < 42]\n',
+    '    return {"status": "ok", "count": len(items), "items": items}\n',
+    '\n',
+    'class Repository(BaseModel):\n',
+    '    name: str = "synthetic"\n',
+    '    # TODO: r\xe9sum\xe9 parsing, na\xefve implementation\n',
+    'const value = await fetch(`/api/v1/items?page=${page}`);\n',
+    'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor.\n',
+]
+
+
+def extra_ignore_patterns(count: int) -> List[str]:
+    """Generate count additional patterns of mixed kinds (suffix, directory, anchored, glob, negation)."""
+    kinds = ['*.ext{0}', 'cache{0}/', '/top{0}', '**/tmp{0}/*.dat', 'src/**/gen{0}_*.py', '!keep{0}.log']
+    return [kinds[index % len(kinds)].format(index) for index in range(count)]
+
+
+def generate_tree(root: str, file_count: int, depth: int = 4, fanout: int = 8, ignored_ratio: float = 0.5,
+                  seed: int = 0, median_size: int = 0, size_sigma: float = 1.0, binary_ratio: float = 0.0,
+                  encodings: Sequence[str] = ('utf-8',), ignore_patterns: int = 0) -> List[str]:
+    """
+    Generate a synthetic repository with file_count files spread over nested directories.
+    About ignored_ratio of the files land in trees matched by the generated .gitignore
+    (node_modules/, build/, ...), which gets ignore_patterns extra patterns for matcher load.
+    With median_size set, file sizes follow a log-normal distribution around it, a binary_ratio
+    share of the files is binary and text files are encoded with a random choice of encodings;
+    otherwise every file is a single line. Returns the paths of the generated files.
+    """
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, '.gitignore'), 'w', encoding='utf-8') as file:
+        file.write('\n'.join(GITIGNORE_PATTERNS + extra_ignore_patterns(ignore_patterns)) + '\n')
+
+    block = ''.join(rng.choice(SOURCE_LINES) for _ in range(4096))
+    paths = []
+    for index in range(file_count):
+        parts = [f'dir{rng.randrange(fanout)}' for _ in range(rng.randrange(depth) + 1)]
+        if rng.random() < ignored_ratio:
+            parts.insert(rng.randrange(len(parts)), rng.choice(IGNORED_TREES))
+        directory = os.path.join(root, *parts)
+        os.makedirs(directory, exist_ok=True)
+        if median_size and rng.random() < binary_ratio:
+            path = os.path.join(directory, f'file{index}.bin')
+            data = b'\x89PNG\r\n\x1a\n\0' + rng.randbytes(synthetic_size(rng, median_size, size_sigma))
+        else:
+            path = os.path.join(directory, f'file{index}.{rng.choice(["py", "js", "md", "log"])}')
+            if median_size:
+                data = synthetic_text(rng, block, synthetic_size(rng, median_size, size_sigma))
+                data = data.encode(rng.choice(encodings))
+            else:
+                data = f'# synthetic file {index}\n'.encode('utf-8')
+        with open(path, 'wb') as file:
+            file.write(data)
+        paths.append(path)
+    return paths
+
+
+def synthetic_size(rng: random.Random, median_size: int, sigma: float) -> int:
+    return max(1, min(MAX_FILE_SIZE, int(rng.lognormvariate(math.log(median_size), sigma))))
+
+
+def synthetic_text(rng: random.Random, block: str, size: int) -> str:
+    """Code-like text of about size characters, cut from a random line of the block."""
+    start = block.index('\n', rng.randrange(len(block) // 2)) + 1
+    repeats = size // (len(block) - start) + 1
+    return (block[start:] + block * repeats)[:size]
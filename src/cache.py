@@ -0,0 +1,191 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .models import File, Project
+from .settings import Settings
+
+
+class StatsCache:
+    """Persistent SQLite cache of per-file stats, keyed by path, mtime, size and encoder."""
+
+    def __init__(self, path: str, max_entries: int = Settings.CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS file_stats ("
+            " path TEXT NOT NULL,"
+            " encoder TEXT NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " is_binary INTEGER NOT NULL,"
+            " encoding TEXT,"
+            " content_size INTEGER NOT NULL,"
+            " line_count INTEGER NOT NULL,"
+            " char_count INTEGER NOT NULL,"
+            " token_count INTEGER NOT NULL,"
+            " last_used INTEGER NOT NULL,"
+            " PRIMARY KEY (path, encoder))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS file_stats_last_used ON file_stats (last_used)")
+        self._hits: List[Tuple[str, str]] = []  # (path, encoder) of restored entries, touched on commit
+
+    def restore(self, file: File, encoder_name: str) -> bool:
+        """
+        Fill binary flag, encoding and stats of a file from the cache.
+        Returns False when there is no entry for the file's current mtime and size.
+        """
+        row = self._connection.execute(
+            "SELECT is_binary, encoding, content_size, line_count, char_count, token_count FROM file_stats"
+            " WHERE path = ? AND encoder = ? AND mtime_ns = ? AND size = ?",
+            (self._key(file), encoder_name, file.metadata.mtime_ns, file.metadata.size)
+        ).fetchone()
+        if row is None:
+            return False
+
+        file.is_binary = bool(row[0])
+        file.encoding = row[1]
+        file.content_size = row[2]
+        file.stats.line_count = row[3]
+        file.stats.char_count = row[4]
+        file.stats.token_count = row[5]
+        self._hits.append((self._key(file), encoder_name))
+        return True
+
+    def store(self, file: File, encoder_name: str) -> None:
+        """
+        Store the stats of a loaded file. Files that could not be decoded, diffs and duplicates are not cached.
+        """
+        if file.diff is not None or file.duplicate_of is not None or (not file.is_binary and file.encoding is None):
+            return
+        self._connection.execute(
+            "INSERT OR REPLACE INTO file_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._key(file), encoder_name, file.metadata.mtime_ns, file.metadata.size, int(file.is_binary),
+             file.encoding, file.content_size, file.stats.line_count, file.stats.char_count,
+             file.stats.token_count, int(time.time()))
+        )
+
+    def commit(self) -> None:
+        """
+        Touch the entries used in this run, evict the least recently used ones above the size bound and commit.
+        """
+        now = int(time.time())
+        self._connection.executemany(
+            "UPDATE file_stats SET last_used = ? WHERE path = ? AND encoder = ?",
+            [(now, path, encoder_name) for path, encoder_name in self._hits]
+        )
+        self._hits = []
+        self._connection.execute(
+            "DELETE FROM file_stats WHERE rowid IN ("
+            " SELECT rowid FROM file_stats ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._connection.commit()
+
+    def clear(self) -> None:
+        """
+        Remove all cached entries.
+        """
+        self._connection.execute("DELETE FROM file_stats")
+        self._connection.commit()
+        logging.info(f"Stats cache cleared at {self.path}")
+
+    def close(self) -> None:
+        self._connection.close()
+
+    @staticmethod
+    def _key(file: File) -> str:
+        return os.path.abspath(file.directory)
+
+    @classmethod
+    def open_default(cls) -> Optional['StatsCache']:
+        """
+        Open the cache in the user cache directory, or return None if it is not usable.
+        """
+        path = os.path.join(Settings.cache_dir(), Settings.CACHE_FILE_NAME)
+        try:
+            return cls(path)
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"Stats cache at {path} is not available, proceeding without it: {e}")
+            return None
+
+    def __repr__(self):
+        return f"<StatsCache at {self.path}>"
+
+
+class LastRunManifest:
+    """Size and mtime of every file of a project at the previous run, used by --since-last-run."""
+
+    def __init__(self, root_path: str):
+        key = hashlib.sha1(os.path.abspath(root_path).encode('utf-8')).hexdigest()
+        self.path = os.path.join(Settings.cache_dir(), 'runs', f'{key}.json')
+        self.snapshot: Dict[str, List[int]] = {}
+        self._previous: Dict[str, List[int]] = {}
+
+    def load(self) -> Optional[Dict[str, List[int]]]:
+        """
+        Load the manifest of the previous run, or return None if there is none.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read last run manifest {self.path}: {e}")
+            return None
+
+    def diff(self, files: Dict[str, Tuple[int, int]]) -> Tuple[Set[str], List[str]]:
+        """
+        Compare the current (size, mtime_ns) of files, keyed by relative path, with the previous run.
+        Returns changed or added paths and deleted paths; everything is changed when there was no previous run.
+        The current state is kept for save().
+        """
+        self.snapshot = {path: list(state) for path, state in files.items()}
+        previous = self.load()
+        self._previous = previous or {}
+        if previous is None:
+            logging.info("No previous run found, all files are treated as changed")
+            return set(files), []
+        changed = {path for path, state in self.snapshot.items() if previous.get(path) != state}
+        deleted = sorted(path for path in previous if path not in self.snapshot)
+        return changed, deleted
+
+    def save(self, written: Iterable[str]) -> None:
+        """
+        Write the manifest for the next run: the written paths get the state captured by diff(), other files
+        keep their previous state, so files left out of the output are reported as changed again.
+        """
+        manifest = {path: state for path, state in self._previous.items() if path in self.snapshot}
+        manifest.update((path, self.snapshot[path]) for path in written if path in self.snapshot)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as file:
+                json.dump(manifest, file)
+        except OSError as e:
+            logging.warning(f"Could not write last run manifest {self.path}: {e}")
+
+    def select_changed(self, project: Project) -> None:
+        """
+        Keep only the project files whose size or modification time changed since the previous run, and record
+        deleted files. Call save_run() after the output is written to make this run the new baseline.
+        """
+        states = {os.path.relpath(file.directory, project.root_path): (file.metadata.size, file.metadata.mtime_ns)
+                  for file in project.files}
+        changed, deleted = self.diff(states)
+        project.keep_changed_files(changed, deleted)
+
+    def save_run(self, project: Project) -> None:
+        """
+        Save the manifest with the files this run wrote. Files skipped by a limit or the token budget keep
+        their previous state, so the next --since-last-run run includes them again.
+        """
+        self.save(os.path.relpath(file.directory, project.root_path) for file in project.files if not file.skip_reason)
+
+    def __repr__(self):
+        return f"<LastRunManifest at {self.path}>"
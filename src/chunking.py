@@ -0,0 +1,93 @@
+import logging
+from typing import Callable, List, Optional, Tuple
+from .models import File
+
+
+class OutputPart:
+    """Files, or line ranges of oversized files, written to one part of a split output."""
+
+    def __init__(self, token_count: int):
+        self.segments: List[Tuple[File, Optional[Tuple[int, int]]]] = []
+        self.token_count = token_count
+
+    def add(self, file: File, line_range: Optional[Tuple[int, int]], token_count: int):
+        self.segments.append((file, line_range))
+        self.token_count += token_count
+
+    def __repr__(self):
+        return f"<OutputPart with {len(self.segments)} segments, {self.token_count} tokens>"
+
+
+class OutputSplitter:
+    """
+    Plan a split of the output into parts of at most max_tokens tokens, using precomputed token counts.
+
+    Parameters:
+    max_tokens (int): Token limit of each part.
+    part_overhead (int): Header tokens repeated at the start of every part.
+    first_part_overhead (int): Header tokens of the first part, which also carries the git status.
+    line_range_overhead (int): Extra header tokens of a file written as a line range.
+    """
+
+    def __init__(self, max_tokens: int, part_overhead: int = 0, first_part_overhead: int = 0,
+                 line_range_overhead: int = 0):
+        self.max_tokens = max_tokens
+        self.part_overhead = part_overhead
+        self.first_part_overhead = first_part_overhead
+        self.line_range_overhead = line_range_overhead
+
+    def split(self, files: List[File], overheads: List[int], line_tokens: Callable[[File], List[int]]) -> List[OutputPart]:
+        """
+        Assign files to parts in order. Files go whole into the current part, or the next one if they do not fit;
+        files larger than a whole part are split at line boundaries. Raises ValueError if the part headers alone
+        exceed max_tokens.
+
+        Parameters:
+        files (list): Files to write, with token counts already computed.
+        overheads (list): Header and separator tokens written with each file.
+        line_tokens (callable): Returns per-line token counts of a file, only called for oversized files.
+        """
+        headers = max(self.part_overhead, self.first_part_overhead)
+        if headers >= self.max_tokens:
+            raise ValueError(f"The part headers alone take {headers} tokens, parts need more than that")
+        parts = [OutputPart(self.first_part_overhead)]
+        for file, overhead in zip(files, overheads):
+            if file.is_binary or file.skip_reason:
+                continue
+            cost = file.stats.token_count + overhead
+            if parts[-1].token_count + cost <= self.max_tokens:
+                parts[-1].add(file, None, cost)
+            elif self.part_overhead + cost <= self.max_tokens:
+                parts.append(OutputPart(self.part_overhead))
+                parts[-1].add(file, None, cost)
+            else:
+                self._split_lines(parts, file, line_tokens(file), overhead + self.line_range_overhead)
+        return parts
+
+    def _split_lines(self, parts: List[OutputPart], file: File, counts: List[int], chunk_overhead: int):
+        """Spread the lines of an oversized file over the current and following parts."""
+        start = 0
+        while start < len(counts):
+            part = parts[-1]
+            budget = self.max_tokens - part.token_count - chunk_overhead
+            end, used = start, 0
+            while end < len(counts) and used + counts[end] <= budget:
+                used += counts[end]
+                end += 1
+            if end == start:
+                if part.segments:
+                    parts.append(OutputPart(self.part_overhead))
+                    continue
+                if budget <= 0:
+                    logging.warning(f"Part and file headers of {file.directory} alone take "
+                                    f"{part.token_count + chunk_overhead} tokens, more than {self.max_tokens}.")
+                else:
+                    logging.warning(f"Line {start + 1} of {file.directory} alone exceeds {self.max_tokens} tokens.")
+                end, used = start + 1, counts[start]
+            part.add(file, (start, end), used + chunk_overhead)
+            start = end
+            if start < len(counts):
+                parts.append(OutputPart(self.part_overhead))
+
+    def __repr__(self):
+        return f"<OutputSplitter max_tokens={self.max_tokens}>"
@@ -0,0 +1,160 @@
+import difflib
+import hashlib
+import heapq
+import logging
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Tuple, cast
+from .models import File
+from .reader import FileReader
+from .settings import Settings
+
+
+class NearDuplicateIndex:
+    """
+    Find texts whose distinct lines largely overlap with an earlier text. Each text is summarized by a
+    bottom-k MinHash sketch (the k smallest hashes of its stripped, non-empty lines); candidates sharing
+    sketch values are found through an inverted index and compared by their estimated Jaccard similarity.
+    """
+
+    def __init__(self, threshold: float, sketch_size: int = Settings.NEAR_DUPLICATE_SKETCH_SIZE):
+        self.threshold = threshold
+        self.sketch_size = sketch_size
+        self._order: Dict[Hashable, int] = {}
+        self._sketches: Dict[Hashable, List[int]] = {}
+        self._postings: Dict[int, List[Hashable]] = {}
+
+    def sketch(self, text: str) -> List[int]:
+        """
+        Bottom-k sketch of the distinct lines of a text. Lines are hashed with blake2b rather than hash(),
+        which is salted per process, so the same texts match in every run.
+        """
+        lines = {line.strip() for line in text.splitlines() if line.strip()}
+        return heapq.nsmallest(self.sketch_size, (self.hash_line(line) for line in lines))
+
+    @staticmethod
+    def hash_line(line: str) -> int:
+        digest = hashlib.blake2b(line.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    def similarity(self, first: List[int], second: List[int]) -> float:
+        """
+        Estimated Jaccard similarity of the line sets behind two sketches.
+        """
+        first_set, second_set = set(first), set(second)
+        union = heapq.nsmallest(self.sketch_size, first_set | second_set)
+        if not union:
+            return 0.0
+        return sum(1 for value in union if value in first_set and value in second_set) / len(union)
+
+    def find(self, key: Hashable, text: str) -> Optional[Tuple[Hashable, float]]:
+        """
+        Register a text under key and return the most similar text added before it, with its similarity,
+        if that reaches the threshold. Keys seen before keep their position, so looking up a text again
+        never matches texts added after it.
+        """
+        sketch = self.sketch(text)
+        if key not in self._order:
+            self._order[key] = len(self._order)
+            self._sketches[key] = sketch
+            for value in sketch:
+                self._postings.setdefault(value, []).append(key)
+        if len(sketch) < Settings.NEAR_DUPLICATE_MIN_LINES:
+            return None
+
+        order = self._order[key]
+        shared = Counter(candidate for value in sketch for candidate in self._postings.get(value, ())
+                         if self._order[candidate] < order)
+        best, best_similarity = None, 0.0
+        for candidate, _ in shared.most_common(Settings.NEAR_DUPLICATE_CANDIDATES):
+            similarity = self.similarity(sketch, self._sketches[candidate])
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        if best is None or best_similarity < self.threshold:
+            return None
+        return best, best_similarity
+
+    def __repr__(self):
+        return f"<NearDuplicateIndex threshold={self.threshold} with {len(self._order)} texts>"
+
+
+class DuplicateDetector:
+    """
+    Collapse files whose bytes are identical to an earlier file of the project into references to it and, with a
+    near-duplicate threshold, write files similar to an earlier file as a diff against it.
+    """
+
+    def __init__(self, reader: FileReader, threshold: Optional[float] = None):
+        """
+        Parameters:
+        reader (FileReader): Reads originals whose content was already released, to diff against them.
+        threshold (float): Line similarity from which files are written as a diff, None to disable.
+        """
+        self.reader = reader
+        self.threshold = threshold
+        self._blobs: Dict[bytes, File] = {}
+        self._near_duplicates: Optional[NearDuplicateIndex] = None
+
+    def reset(self) -> None:
+        """
+        Forget the files seen so far, e.g. before a project is scanned again.
+        """
+        self._blobs = {}
+        self._near_duplicates = NearDuplicateIndex(self.threshold) if self.threshold is not None else None
+
+    def collapse_duplicate(self, file: File) -> bool:
+        """
+        Turn a loaded file whose bytes are identical to an earlier file into a reference to it; the content
+        is released and not tokenized. With near-duplicate detection, files whose lines mostly match an
+        earlier file are written as a diff against it instead. Files keep their role when loaded again.
+        Returns True if the file just became a near-duplicate, so its diff needs to be tokenized.
+        """
+        if file.content_hash is None or file.is_binary or file.diff is not None:
+            return False
+        original = self._blobs.setdefault(file.content_hash, file)
+        if original is not file:
+            file.duplicate_of = original
+            file.content = ""
+            file.stats.token_count = 0
+            file.stats.original_token_count = 0
+            return False
+        if self._near_duplicates is not None:
+            match = self._near_duplicates.find(file, file.content)
+            if match is not None:
+                nearest, similarity = match  # The index is keyed by the files themselves
+                return self.write_as_near_duplicate(file, cast(File, nearest), similarity)
+        return False
+
+    @staticmethod
+    def is_identical_duplicate(file: File) -> bool:
+        """
+        True for files written as a reference to an identical earlier file.
+        """
+        return file.duplicate_of is not None and file.diff is None
+
+    def write_as_near_duplicate(self, file: File, original: File, similarity: float) -> bool:
+        """
+        Replace the content of a near-duplicate with a unified diff against the earlier, similar file,
+        unless the diff is not shorter than the content. Returns True if the content was replaced.
+        """
+        original_content = original.content if original.diff is None else ""
+        if not original_content:
+            reloaded = File(original.file_name, original.directory)
+            reloaded.encoding = original.encoding
+            if not self.reader.read_file_content(reloaded, [original.encoding] if original.encoding else None):
+                return False
+            original_content = reloaded.content
+        diff = ''.join(difflib.unified_diff(
+            FileReader.split_lines(original_content), FileReader.split_lines(file.content),
+            fromfile=original.directory, tofile=file.directory, n=Settings.NEAR_DUPLICATE_DIFF_CONTEXT))
+        if len(diff) >= len(file.content):
+            return False
+        file.duplicate_of = original
+        file.similarity = similarity
+        file.diff = diff
+        file.stats.original_token_count = 0
+        FileReader.set_content(file, diff)
+        logging.info(f"File {file.directory} is a near-duplicate of {original.directory} ({similarity:.0%} similar)")
+        return True
+
+    def __repr__(self):
+        return f"<DuplicateDetector threshold={self.threshold} with {len(self._blobs)} files>"
@@ -0,0 +1,281 @@
+import logging
+import os
+import re
+import subprocess
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from .metrics import RunMetrics
+from .settings import Settings
+
+LOG_FORMAT = '%x1e%H%x1f%h%x1f%s%x1f%an%x1f%ar'  # Commits start with a record separator, fields are unit separated
+CHANGE_KINDS = {'M': 'modified', 'T': 'type changed', 'A': 'added', 'D': 'deleted', 'R': 'renamed', 'C': 'copied'}
+
+
+class GitCommit:
+    """A commit as shown in the output: hash, subject, author and relative date."""
+
+    def __init__(self, oid: str, short_oid: str, subject: str, author: str, date: str):
+        self.oid = oid
+        self.short_oid = short_oid
+        self.subject = subject
+        self.author = author
+        self.date = date
+
+    def describe(self, short: bool = False) -> str:
+        return f"{self.short_oid if short else self.oid} - {self.subject} ({self.author}, {self.date})"
+
+    def __repr__(self):
+        return f"<GitCommit {self.short_oid}>"
+
+
+class GitMetadata:
+    """
+    Branch, last commit and per-file state of a git work tree. The state comes from a single
+    `git status --porcelain=v2 --branch -z` call; the last commit, and optionally the last commit touching
+    each file, from a single `git log` call started at the same time.
+    """
+
+    def __init__(self, root: str):
+        self.branch: Optional[str] = None
+        self.last_commit: Optional[GitCommit] = None
+        self.changes: List[Tuple[str, str, Optional[str]]] = []  # Status code, path and original path of renames
+        self.states: Dict[str, str] = {}
+        self.untracked_directories: Set[str] = set()
+        self.file_commits: Dict[str, GitCommit] = {}
+        self.prefix = self.repository_prefix(root)  # Files are looked up by their path relative to root
+
+    @classmethod
+    def collect(cls, root: str, file_log: bool = False) -> 'GitMetadata':
+        """
+        Run git status and git log concurrently in root and parse their output. With file_log, the log covers
+        the last Settings.GIT_LOG_MAX_COMMITS commits with the files they touched.
+        Raises CalledProcessError if root is not in a git work tree and OSError if git is not installed.
+        """
+        status_command = ['git', '--no-optional-locks', 'status', '--porcelain=v2', '--branch', '-z']
+        log_command = ['git', '-c', 'core.quotePath=false', 'log', f'--pretty=format:{LOG_FORMAT}']
+        log_command += ['--name-only', f'--max-count={Settings.GIT_LOG_MAX_COMMITS}'] if file_log else ['--max-count=1']
+        with subprocess.Popen(status_command, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as status_process, \
+                subprocess.Popen(log_command, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as log_process:
+            status, status_error = status_process.communicate()
+            log, log_error = log_process.communicate()
+        if status_process.returncode != 0:
+            raise subprocess.CalledProcessError(status_process.returncode, status_command, status, status_error)
+
+        metadata = cls(root)
+        metadata.parse_status(status)
+        if log_process.returncode == 0:
+            metadata.parse_log(log.decode('utf-8', 'replace'), file_log)
+        else:  # No commits yet
+            logging.debug(f"git log failed: {log_error.decode('utf-8', 'replace').strip()}")
+        return metadata
+
+    @staticmethod
+    def repository_prefix(root: str) -> str:
+        """
+        Path of root relative to the top of its work tree, with a trailing slash, as used in git output.
+        """
+        path = os.path.realpath(root)
+        parts = []
+        while not os.path.exists(os.path.join(path, '.git')):
+            path, name = os.path.split(path)
+            if not name:
+                return ''
+            parts.append(name)
+        return ''.join(f'{name}/' for name in reversed(parts))
+
+    def parse_status(self, output: bytes) -> None:
+        """
+        Parse `git status --porcelain=v2 --branch -z` output. Paths are relative to the top of the work tree.
+        """
+        records = iter(output.split(b'\0'))
+        for record in records:
+            line = os.fsdecode(record)
+            if line.startswith('# branch.head '):
+                self.branch = line[len('# branch.head '):]
+            elif line.startswith(('1 ', 'u ')):
+                fields = line.split(' ', 10 if line[0] == 'u' else 8)
+                self.add_change(fields[1], fields[-1])
+            elif line.startswith('2 '):
+                fields = line.split(' ', 9)
+                self.add_change(fields[1], fields[-1], os.fsdecode(next(records, b'')))
+            elif line.startswith(('? ', '! ')):
+                path = line[2:]
+                self.add_change(line[0] * 2, path)
+                if path.endswith('/'):
+                    self.untracked_directories.add(path)
+
+    def add_change(self, code: str, path: str, original: Optional[str] = None) -> None:
+        self.changes.append((code, path, original))
+        self.states[path] = self.describe_status(code, original)
+
+    def parse_log(self, output: str, file_log: bool) -> None:
+        """
+        Parse `git log` output in LOG_FORMAT, newest commit first, optionally followed by file names.
+        """
+        for entry in output.split('\x1e')[1:]:
+            header, _, names = entry.partition('\n')
+            commit = GitCommit(*header.split('\x1f', 4))
+            if self.last_commit is None:
+                self.last_commit = commit
+            if not file_log:
+                break
+            for name in names.splitlines():
+                if name:
+                    self.file_commits.setdefault(name, commit)
+
+    @staticmethod
+    def describe_status(code: str, original: Optional[str] = None) -> str:
+        """
+        Readable form of a porcelain status code, e.g. 'modified in work tree' for '.M'.
+        """
+        if 'U' in code or code in ('AA', 'DD'):
+            return 'unmerged'
+        if code == '??':
+            return 'untracked'
+        if code == '!!':
+            return 'ignored'
+        parts = []
+        if code[0] != '.':
+            parts.append(f"{CHANGE_KINDS.get(code[0], code[0])} in index")
+        if code[1] != '.':
+            parts.append(f"{CHANGE_KINDS.get(code[1], code[1])} in work tree")
+        description = ', '.join(parts)
+        return f"{description} from {original}" if original else description
+
+    def file_state(self, relative_path: str) -> Tuple[Optional[str], Optional[GitCommit]]:
+        """
+        State and last commit of a file, given by its path relative to root. Files without changes have
+        no state; files not touched within the logged commits have no commit.
+        """
+        path = self.prefix + relative_path.replace(os.sep, '/')
+        state = self.states.get(path)
+        if state is None and self.untracked_directories:
+            directory = path
+            while '/' in directory:
+                directory = directory.rsplit('/', 1)[0]
+                if directory + '/' in self.untracked_directories:
+                    state = 'untracked'
+                    break
+        return state, self.file_commits.get(path)
+
+    def summary(self) -> str:
+        """
+        Branch, last commit and changed paths, in the form of `git status --short`.
+        """
+        lines = []
+        for code, path, original in self.changes:
+            code = code.replace('.', ' ')
+            lines.append(f"{code} {original} -> {path}" if original else f"{code} {path}")
+        last_commit = self.last_commit.describe() if self.last_commit else 'none'
+        return f"Branch: {self.branch}\nLast Commit: {last_commit}\n\nGit Status:\n" + '\n'.join(lines)
+
+    def __repr__(self):
+        return f"<GitMetadata {self.prefix or './'} on {self.branch} with {len(self.changes)} changes>"
+
+
+class GitChanges:
+    """
+    Files changed, added, untracked or deleted since a git ref, with their unified diffs when requested.
+    Paths are relative to the root the changes were collected in.
+    """
+
+    def __init__(self):
+        self.changed: Set[str] = set()
+        self.deleted: List[str] = []
+        self.diffs: Optional[Dict[str, str]] = None
+
+    @classmethod
+    def collect(cls, root: str, ref: str, diff_context: Optional[int] = None,
+                metrics: Optional[RunMetrics] = None) -> 'GitChanges':
+        """
+        Compare the work tree under root against ref. With diff_context, the diff of each changed file is
+        kept with that many context lines. Raises ValueError if git cannot compare against the ref.
+        """
+        changes = cls()
+        try:
+            diff_result = cls.run_git(root, ['diff', '--name-status', '-z', '--no-renames', '--relative', ref, '--'],
+                                      metrics)
+            untracked_result = cls.run_git(root, ['ls-files', '-z', '--others', '--exclude-standard'], metrics)
+        except (subprocess.CalledProcessError, OSError) as e:
+            raise ValueError(f"Cannot compare against git ref '{ref}': {e}") from e
+
+        entries = diff_result.split('\0')
+        changes.changed = {os.path.normpath(path) for path in untracked_result.split('\0') if path}
+        for status, path in zip(entries[0::2], entries[1::2]):
+            if status == 'D':
+                changes.deleted.append(os.path.normpath(path))
+            else:
+                changes.changed.add(os.path.normpath(path))
+
+        if diff_context is not None:
+            changes.diffs = cls.split_patch(cls.run_git(
+                root, ['-c', 'core.quotepath=off', 'diff', f'-U{diff_context}', '--no-renames', '--relative', ref, '--'],
+                metrics))
+        return changes
+
+    @staticmethod
+    def split_patch(patch: str) -> Dict[str, str]:
+        """
+        Split the output of git diff into per-file diffs keyed by the new path. Deleted files are skipped.
+        """
+        diffs: Dict[str, str] = {}
+        for chunk in re.split(r'^(?=diff --git )', patch, flags=re.MULTILINE):
+            for line in chunk.splitlines():
+                if line.startswith('+++ b/'):
+                    diffs[os.path.normpath(line[len('+++ b/'):].rstrip('\t'))] = chunk.rstrip('\n')
+                    break
+        return diffs
+
+    @staticmethod
+    def run_git(root: str, args: List[str], metrics: Optional[RunMetrics] = None) -> str:
+        """
+        Run a git command in root and return its standard output.
+        """
+        command = ['git'] + args
+        if metrics is None:
+            return subprocess.run(command, capture_output=True, text=True, cwd=root, check=True).stdout
+        with metrics.phase('git'):
+            return subprocess.run(command, capture_output=True, text=True, cwd=root, check=True).stdout
+
+    def __repr__(self):
+        return f"<GitChanges {len(self.changed)} changed, {len(self.deleted)} deleted>"
+
+
+class GitMetadataLoader:
+    """
+    Collect GitMetadata on a background thread, so git runs while the directory is walked and files are
+    loaded. Failures are logged when the result is first needed.
+    """
+
+    def __init__(self, root: str, file_log: bool = False, metrics: Optional[RunMetrics] = None):
+        self.root = root
+        self.file_log = file_log
+        self._metrics = metrics
+        self._metadata: Optional[GitMetadata] = None
+        self._error: Optional[Exception] = None
+        self._reported = False
+        self._thread = threading.Thread(target=self._collect, name='gptize-git', daemon=True)
+        self._thread.start()
+
+    def _collect(self) -> None:
+        try:
+            if self._metrics is None:
+                self._metadata = GitMetadata.collect(self.root, self.file_log)
+            else:
+                with self._metrics.phase('git'):
+                    self._metadata = GitMetadata.collect(self.root, self.file_log)
+        except Exception as e:
+            self._error = e
+
+    def result(self) -> Optional[GitMetadata]:
+        """
+        Wait for git to finish and return the metadata, or None if it could not be collected.
+        """
+        self._thread.join()
+        if self._error is not None and not self._reported:
+            self._reported = True
+            if isinstance(self._error, subprocess.CalledProcessError):
+                logging.warning(f"Git command failed: {self._error}")
+            else:
+                logging.warning(f"Could not fetch git details: {self._error}")
+        return self._metadata
@@ -1,27 +1,61 @@
 import os
-import subprocess
 import logging
-from datetime import datetime
-import pathspec
-import pyperclip
-import tiktoken
+from typing import Dict, Iterator, List, Optional, TextIO
+from .cache import StatsCache
+from .git_metadata import GitMetadataLoader
+from .loader import FileLoader
+from .metrics import RunMetrics
 from .models import File, Project
-from .settings import Settings
+from .packing import OutputPlanner
+from .reader import FileReader
+from .report import StatsReport
+from .scanner import FileScanner
+from .settings import Limits, Settings
+from .sinks import ClipboardSink
 from .output_builder import OutputBuilder
+from .tokenizers import ModelProfile, TiktokenTokenizer, TokenCounter, Tokenizer
+from .transforms import TransformPipeline
 
 
 class GPTizer:
-    def __init__(self):
-        self._project = None
-        self._gitignore = None
+    def __init__(self, jobs: int = Settings.DEFAULT_JOBS, *, cache: Optional[StatsCache] = None,
+                 use_git_index: bool = False, limits: Optional[Limits] = None, count_tokens: bool = True,
+                 encoder_file: Optional[str] = None, tokenizer: Optional[Tokenizer] = None,
+                 model: Optional[ModelProfile] = None, dedup: bool = True,
+                 near_duplicate_threshold: Optional[float] = None, transforms: Optional[List[str]] = None,
+                 git_file_log: bool = False):
+        self._project: Optional[Project] = None
+        self.model = model or ModelProfile.get(Settings.DEFAULT_MODEL)
+        if tokenizer is None and count_tokens:
+            tokenizer = TiktokenTokenizer(self.model.encoding, encoder_file)
+        self.counter = TokenCounter(tokenizer, jobs, RunMetrics())
+        self.scanner = FileScanner(use_git_index, self.counter.metrics)
+        reader = FileReader(self.counter, TransformPipeline(transforms) if transforms else None, hash_content=dedup)
+        self.loader = FileLoader(self.counter, reader, cache, limits, near_duplicate_threshold)
+        self._git: Optional[GitMetadataLoader] = None
+        self.git_file_log = git_file_log
 
-        try:
-            logging.info(f"Loading tiktoken {Settings.TOKEN_MODEL_NAME} model")
-            self.encoder = tiktoken.get_encoding(Settings.TOKEN_MODEL_NAME)
-            logging.info(f"Loading tiktoken {Settings.TOKEN_MODEL_NAME} model complete")
-        except Exception as e:
-            self.encoder = None
-            logging.error(f"Failed to initialize tiktoken encoder: {e}")
+    @property
+    def metrics(self) -> RunMetrics:
+        """
+        Per-phase timings of the run.
+        """
+        return self.counter.metrics
+
+    @property
+    def active_tokenizer(self) -> Optional[Tokenizer]:
+        """
+        The tokenizer, or None if tokens are not counted or the tokenizer failed to load.
+        """
+        return self.counter.active
+
+    @property
+    def encoder(self):
+        """
+        The tiktoken encoder of an exact tokenizer, or None for estimating backends and when tokens are not counted.
+        """
+        tokenizer = self.active_tokenizer
+        return tokenizer.encoder if isinstance(tokenizer, TiktokenTokenizer) else None
 
     def process_directory(self, target_path: str, repo_root: str, gptize_ignore: str):
         """
@@ -30,10 +64,39 @@ class GPTizer:
         from the repository root, and populates the project with files that are not
         ignored by .gitignore.
         """
+        self._start_project(target_path, repo_root, gptize_ignore)
+        self.populate_files()
+
+    def scan_directory(self, target_path: str, repo_root: str, gptize_ignore: str):
+        """
+        Initializes the Project object for the specified directory and collects the
+        metadata of files not ignored by .gitignore, without loading their contents.
+        Contents are loaded lazily in batches while the output is written, so only
+        metadata and stats stay in memory.
+        """
+        self._start_project(target_path, repo_root, gptize_ignore)
+        with self.metrics.phase('walk'):
+            self.project.files.extend(self.iter_files())
+
+    def populate_files(self) -> None:
+        """
+        Populate the project with files, excluding those matched by .gitignore and inside ignored directories,
+        and load their contents.
+        """
+        with self.metrics.phase('walk'):
+            self.project.files.extend(self.iter_files())
+        self.loader.load_files(self.project.files)
+        self.project.contents_loaded = True
+
+    def _start_project(self, target_path: str, repo_root: str, gptize_ignore: str) -> None:
+        """
+        Create an empty project for a directory, load its ignore files and reset the state of the previous run.
+        """
         project_name = os.path.basename(target_path)
         self._project = Project(project_name, target_path)
-        self._gitignore = self.load_gitignore(repo_root, gptize_ignore)
-        self.populate_files()
+        self.scanner.start(target_path, repo_root, gptize_ignore)
+        self.loader.start(self._project)
+        self._git = GitMetadataLoader(target_path, self.git_file_log, self.metrics)  # Runs during the walk
 
     def process_file(self, file_path: str, repo_root: str, gptize_ignore: str):
         """
@@ -43,12 +106,15 @@ class GPTizer:
         """
         root_path, file_name = os.path.split(file_path)
         project_name = os.path.basename(root_path) if root_path else 'SingleFileProject'
-        self._project = Project(project_name, root_path or '.')
-        self._gitignore = self.load_gitignore(repo_root, gptize_ignore)
+        self._start_project(root_path or '.', repo_root, gptize_ignore)
+        self.project.name = project_name
 
         file_obj = File(file_name, file_path)
-        self.load_file_content(file_obj)
-        self._project.files.append(file_obj)
+        FileScanner.load_file_metadata(file_obj)
+        self.loader.load_file_content(file_obj)
+        self.loader.commit_cache()
+        self.project.files.append(file_obj)
+        self.project.contents_loaded = True
 
     @property
     def project(self) -> Project:
@@ -60,236 +126,138 @@ class GPTizer:
             raise AttributeError("Project has not been initialized.")
         return self._project
 
-    def load_gitignore(self, repo_root: str, gptize_ignore: str) -> pathspec.PathSpec:
+    def iter_files(self) -> Iterator[File]:
         """
-        Load both .gitignore from the repo root and a custom .gptignore for filtering files.
+        Yield files that are not ignored and within the size limits, with their metadata but without content.
+        Files are rejected on their stat size alone, before anything is read. With estimate_tokens, the size-based
+        token estimate is checked against the per-file limit and the remaining total token budget.
         """
-        gitignore_path = os.path.join(repo_root, Settings.GITIGNORE_PATH)
-        gptize_ignore_path = os.path.join(repo_root, gptize_ignore)
-
-        patterns = []
-
-        # Load .gitignore from repo root
-        try:
-            with open(gitignore_path, 'r', encoding='utf-8') as file:
-                patterns += file.readlines()
-            logging.info(f".gitignore loaded from {gitignore_path}")
-        except FileNotFoundError:
-            logging.warning(f".gitignore not found at {gitignore_path}, proceeding without it")
-        except Exception as e:
-            logging.error(f"An unexpected error occurred when loading .gitignore: {e}")
-
-        # Load custom .gptignore
-        try:
-            with open(gptize_ignore_path, 'r', encoding='utf-8') as file:
-                patterns += file.readlines()
-            logging.info(f"Custom .gptignore loaded from {gptize_ignore_path}")
-        except FileNotFoundError:
-            logging.warning(f"Custom .gptignore not found at {gptize_ignore_path}, proceeding without it")
-        except Exception as e:
-            logging.error(f"An unexpected error occurred when loading custom .gptignore: {e}")
-
-        return pathspec.PathSpec.from_lines('gitwildmatch', patterns)
+        return self.loader.limiter.iter_within_size_limits(self.scanner.iter_candidate_files())
 
-    def populate_files(self) -> None:
+    def reuse_stats(self, previous: List[File]) -> None:
         """
-        Populate the project with files, excluding those matched by .gitignore and inside ignored directories.
+        Copy stats of files unchanged since a previous scan, so that only touched files are tokenized again.
         """
-        for root, dirs, files in os.walk(self.project.root_path):
-            dirs[:] = [d for d in dirs if d not in Settings.IGNORED_DIRECTORIES]
-            for file_name in files:
-                file_path = os.path.join(root, file_name)
-
-                # Use the full path relative to the project root directory, not the current working directory
-                relative_path = os.path.relpath(file_path, self.project.root_path)
-
-                if self._gitignore.match_file(relative_path):
-                    logging.debug(f"File {relative_path} is ignored")
-                    continue
-
-                file_obj = File(file_name, file_path)
-                try:
-                    stat = os.stat(file_path)
-                    file_obj.metadata.size = stat.st_size
-                    file_obj.metadata.last_modified = datetime.fromtimestamp(stat.st_mtime).isoformat()
-                    file_obj.metadata.permissions = oct(stat.st_mode)[-3:]
-                except Exception as e:
-                    logging.error(f"Failed to retrieve metadata for {file_path}: {e}")
-                self.load_file_content(file_obj)
-                self.project.files.append(file_obj)
+        known = {file.directory: file for file in previous
+                 if (file.is_binary or file.encoding is not None) and file.duplicate_of is None}
+        for file in self.project.files:
+            old = known.get(file.directory)
+            if old is None or (old.metadata.size, old.metadata.mtime_ns) != (file.metadata.size, file.metadata.mtime_ns):
+                continue
+            file.is_binary = old.is_binary
+            file.encoding = old.encoding
+            file.content_size = old.content_size
+            file.stats = old.stats
 
-    def load_file_content(self, file: File) -> None:
+    def git_status(self) -> str:
         """
-        Load content from a file and detect binary files.
-        Warn if the file contains more than 700 lines.
+        Git status of the project, fetched once per run on a background thread started when the project was
+        scanned. The git state and, when the git log was read, the last commit of each file are set along with it.
         """
-        relative_path = os.path.relpath(file.directory, self.project.root_path)
-
-        try:
-            with open(file.directory, 'rb') as f:
-                if b'\0' in f.read(1024):
-                    file.is_binary = True
-                    logging.info(f"Binary file detected: {relative_path}")
-                    return None
-        except IOError as e:
-            logging.error(f"Error reading file {relative_path}: {e}")
-            return None
-
-        for encoding in Settings.DEFAULT_ENCODINGS:
-            try:
-                with open(file.directory, 'r', encoding=encoding) as f:
-                    lines = f.readlines()
-                    file.content = ''.join(lines)
-                    self.calculate_content_size(file)
-
-                    file.stats.line_count = len(lines)
-                    file.stats.char_count = len(file.content)
-
-                    if self.encoder:
-                        file.stats.token_count = len(self.encoder.encode(file.content))
-                    else:
-                        file.stats.token_count = 0
-
-                    if len(lines) > Settings.WARN_LINES_COUNT:
-                        logging.warning(f"File {relative_path} exceeds 700 lines ({len(lines)} lines).")
-                    logging.info(f"Content of {relative_path} loaded with encoding {encoding}")
-                    logging.info(f"File {relative_path}: {file.stats.line_count} lines, {file.stats.char_count} characters, {file.stats.token_count} tokens.")
-                    return None
-            except UnicodeDecodeError:
-                continue
-            except IOError as e:
-                logging.error(f"Error reading file {relative_path}: {e}")
-                return None
-            except Exception as e:
-                logging.error(f"An unexpected error occurred while reading {relative_path}: {e}")
-                return None
-
-        logging.error(f"Failed to read {relative_path} in any known encoding")
-        return None
-
-    def calculate_content_size(self, file: File) -> None:
+        project = self.project
+        if project.git_status is None:
+            if self._git is None:
+                self._git = GitMetadataLoader(project.root_path, self.git_file_log, self.metrics)
+            metadata = self._git.result()
+            if metadata is None:
+                project.git_status = "Git information not available."
+            else:
+                project.git_status = metadata.summary()
+                for file in project.files:
+                    file.git_state, file.last_commit = metadata.file_state(
+                        os.path.relpath(file.directory, project.root_path))
+        return project.git_status
+
+    def get_git_status(self) -> str:
         """
-        Calculate the size of the content of a file in bytes.
+        Fetch detailed git status for the project directory. Kept for library callers, see git_status.
         """
-        file.content_size = len(file.content.encode('utf-8'))
+        return self.git_status()
 
-    def summarize_stats(self):
+    def stats_report(self) -> StatsReport:
         """
-        Summarize total tokens, lines, characters, and percentage of context usage.
+        Stats of the project in its current state, for the log summary and the JSON manifest.
         """
-        total_chars = 0
-        for file in self.project.files:
-            total_chars += file.stats.char_count
-        total_lines = 0
-        for file in self.project.files:
-            total_lines += file.stats.line_count
-        total_tokens = 0
-        for file in self.project.files:
-            total_tokens += file.stats.token_count
-        max_context = Settings.GPT4O_CONTEXT_WINDOW
+        return StatsReport(self.project, self.model, self.counter, self.loader.reader.transforms)
 
-        files_with_tokens = []
-        for f in self.project.files:
-            if hasattr(f, 'stats'):
-                file_stats = f.stats
-                if hasattr(file_stats, 'token_count') and file_stats.token_count > 0:
-                    files_with_tokens.append(f)
-
-        files_with_tokens.sort(key=lambda x: x.stats.token_count, reverse=True)
-        top_by_token_files = files_with_tokens[:Settings.TOP_TOKEN_FILES_COUNT]
-
-        logging.info(f"Top {Settings.TOP_TOKEN_FILES_COUNT} files by token count:")
-        for i, file in enumerate(top_by_token_files, start=1):
-            token_percentage = (file.stats.token_count / max_context) * 100 if total_tokens > 0 else 0
-            logging.info(
-                f"{str(i).zfill(2)}. {file.file_name} - {file.stats.token_count} tokens "
-                f"({token_percentage:.2f}% of context), "
-                f"{file.stats.line_count} lines, {file.stats.char_count} characters"
-            )
-
-        logging.info(f"Total lines: {total_lines}")
-        logging.info(f"Total tokens: {total_tokens}")
-        logging.info(f"Total characters: {total_chars}")
-        context_usage_percent = (total_tokens / max_context) * 100
-        logging.info(f"GPT-4o context usage: {context_usage_percent:.2f}%")
+    def write_stats_json(self, path: str) -> None:
+        """
+        Write the stats manifest of the run as JSON.
+        """
+        self.stats_report().write_stats_json(path)
 
-        if context_usage_percent > 100:
-            logging.error("CONTEXT WINDOW EXCEEDED: Total tokens exceed the maximum allowed by GPT-4o.")
-        elif context_usage_percent > 50:
-            logging.warning("Context usage exceeds 50%. GPT response quality may degrade.")
+    def fit_to_budget(self, max_tokens: int, weights: Optional[Dict[str, float]] = None) -> None:
+        """
+        Keep only the files that fit into max_tokens, including the tokens of headers and separators.
+        Token counts are computed up front, so an oversized output is never written.
+        """
+        if not self.active_tokenizer:
+            logging.warning("Token budget cannot be applied without a tokenizer, all files are kept.")
+            return
+        OutputPlanner(self.project, self.loader, self.git_status()).fit_to_budget(max_tokens, weights)
 
-    def get_git_status(self):
-        """
-        Fetch detailed git status for the project directory.
-        """
-        try:
-            branch_result = subprocess.run(
-                ['git', 'rev-parse', '--abbrev-ref', 'HEAD'],
-                capture_output=True,
-                text=True,
-                cwd=self.project.root_path,
-                check=True
-            )
-            branch = branch_result.stdout.strip()
+    def write_parts(self, output_file: str, max_tokens: int) -> List[str]:
+        """
+        Stream the output into several files of at most max_tokens tokens each, see OutputPlanner.write_parts.
+        Returns the paths of the written parts. Raises ValueError without a tokenizer, as parts cannot be sized,
+        and OSError if a part cannot be written.
+        """
+        if not self.active_tokenizer:
+            raise ValueError("Splitting the output by tokens needs a tokenizer, token counting is disabled")
+        paths = OutputPlanner(self.project, self.loader, self.git_status()).write_parts(output_file, max_tokens)
+        self.stats_report().summarize_stats()
+        return paths
 
-            last_commit_result = subprocess.run(
-                ['git', 'log', '-1', '--pretty=format:%H - %s (%an, %ar)'],
-                capture_output=True,
-                text=True,
-                cwd=self.project.root_path,
-                check=True
-            )
-            last_commit = last_commit_result.stdout.strip()
+    def combine_files(self, copy_to_clipboard: bool = False) -> str:
+        """
+        Combine the content of all files into a single string using OutputBuilder, optionally copying it
+        to the clipboard.
+        """
+        builder = OutputBuilder()
+        with self.metrics.phase('build'):
+            self.build_output(builder)
+        combined_content = builder.get_content()
+        if copy_to_clipboard:
+            with self.metrics.phase('clipboard'):
+                ClipboardSink.copy(combined_content)
 
-            status_result = subprocess.run(
-                ['git', 'status', '--short'],
-                capture_output=True,
-                text=True,
-                cwd=self.project.root_path,
-                check=True
-            )
-            status = status_result.stdout.strip()
+        logging.info("Processing completed.")
+        return combined_content
 
-            return f"Branch: {branch}\nLast Commit: {last_commit}\n\nGit Status:\n{status}"
-        except subprocess.CalledProcessError as e:
-            logging.warning(f"Git command failed: {e}")
-            return "Git information not available."
-        except Exception as e:
-            logging.warning(f"Could not fetch git details: {e}")
-            return "Git information not available."
+    def write_output(self, sink: TextIO) -> None:
+        """
+        Stream the combined output to a text sink, such as an open file.
+        File contents are released as soon as they are written, so they are not held twice in memory.
+        """
+        builder = OutputBuilder(self.metrics.timed_writer(sink))
+        with self.metrics.phase('build'):
+            self.build_output(builder, release_content=True)
+        logging.info("Processing completed.")
 
-    def combine_files(self) -> str:
+    def build_output(self, builder: OutputBuilder, release_content: bool = False) -> None:
         """
-        Combine the content of all files into a single string using OutputBuilder.
+        Write headers, git status and all non-binary files to the builder.
+        Files of a scanned but not yet loaded project are loaded while they are written.
         """
-        builder = OutputBuilder()
         builder.write_common_header()
         builder.write_project_header(self.project)
 
-        git_status = self.get_git_status()
+        git_status = self.git_status()
         if git_status:
             builder.write_git_status(git_status)
 
-        self.summarize_stats()
-
-        for file in self.project.files:
-            if file.is_binary:
-                continue  # Skip binary files
+        contents_loaded = self.project.contents_loaded
+        files = self.project.files if contents_loaded else self.loader.iter_loaded_files(self.project.files)
+        for file in files:
+            if file.is_binary or file.skip_reason:
+                continue  # Skip binary files and files over the limits
             builder.write_file_content(file)
             builder.write_separator()
+            if release_content or not contents_loaded:
+                file.content = ""
 
-        combined_content = builder.get_content()
-
-        try:
-            pyperclip.copy(combined_content)
-        except FileNotFoundError:
-            logging.warning("Clipboard tool 'clip.exe' not found.")
-            try:
-                logging.info("Attempting to use 'xclip' as the clipboard tool.")
-                pyperclip.set_clipboard("xclip")
-                pyperclip.copy(combined_content)
-            except Exception:
-                logging.warning("Failed to copy content to clipboard even with 'xclip'")
+        for path in self.project.deleted_files:
+            builder.write_deleted_file(path)
+            builder.write_separator()
 
-        logging.info("Processing completed.")
-        return combined_content
+        self.stats_report().summarize_stats()
@@ -0,0 +1,147 @@
+import logging
+import os
+from typing import Iterable, List, Optional, Set, Tuple
+import pathspec
+from pathspec.patterns import GitWildMatchPattern
+
+WILDCARD_CHARS = set('*?[]\\!')
+
+
+class PatternIndex:
+    """
+    Literal gitignore patterns sorted into indexes: '*.log' by suffix, 'node_modules' and 'build/' by name,
+    '/docs/out' by path prefix. Patterns with wildcards are compiled into one residual pathspec.
+    Only valid for pattern lists without negations, where any match ignores the path.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self.suffixes: Tuple[str, ...] = ()
+        self.names: Set[str] = set()
+        self.dir_names: Set[str] = set()
+        self.prefixes: List[str] = []
+        self.dir_prefixes: List[str] = []
+        self.residual: Optional[pathspec.PathSpec] = None
+        self._build(lines)
+
+    def _build(self, lines: Iterable[str]):
+        """Sort literal patterns into indexes and compile the rest."""
+        suffixes = []
+        residual = []
+        for line in lines:
+            pattern = line.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            is_dir = pattern.endswith('/')
+            body = pattern.rstrip('/')
+            if pattern != line or not body:
+                residual.append(line)
+            elif body.startswith('*.') and not WILDCARD_CHARS & set(body[1:]) and '/' not in body:
+                if is_dir:
+                    residual.append(line)
+                else:
+                    suffixes.append(body[1:])
+            elif WILDCARD_CHARS & set(body):
+                residual.append(line)
+            elif '/' not in body:
+                (self.dir_names if is_dir else self.names).add(body)
+            else:
+                (self.dir_prefixes if is_dir else self.prefixes).append(body.lstrip('/'))
+        self.suffixes = tuple(suffixes)
+        self.residual = pathspec.PathSpec.from_lines('gitwildmatch', residual) if residual else None
+
+    def matches(self, path: str) -> bool:
+        """Return True if any pattern matches the path, given with forward slashes."""
+        return self._matches_parts(path.split('/')) or self._matches_prefix(path) or \
+            (self.residual is not None and self.residual.match_file(path))
+
+    def _matches_parts(self, parts: List[str]) -> bool:
+        if self.suffixes and any(part.endswith(self.suffixes) for part in parts):
+            return True
+        if self.names and not self.names.isdisjoint(parts):
+            return True
+        return bool(self.dir_names) and not self.dir_names.isdisjoint(parts[:-1])
+
+    def _matches_prefix(self, path: str) -> bool:
+        return any(path == prefix or path.startswith(prefix + '/') for prefix in self.prefixes) or \
+            any(path.startswith(prefix + '/') for prefix in self.dir_prefixes)
+
+
+class IgnoreMatcher:
+    """
+    Compiled gitignore-style patterns with a fast path for the common literal cases.
+
+    Patterns like '*.log', 'node_modules', 'build/' and '/docs/out' are answered from
+    a PatternIndex; only the remaining patterns go through pathspec regexes.
+    When the patterns contain negations, all patterns are evaluated in order so the last match wins.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self.lines: List[str] = [line.rstrip('\r\n') for line in lines]
+        self.patterns = [GitWildMatchPattern(line) for line in self.lines]
+        self.patterns = [pattern for pattern in self.patterns if pattern.include is not None]
+        self.has_negations = any(not pattern.include for pattern in self.patterns)
+        self.index = None if self.has_negations else PatternIndex(self.lines)
+
+    def check(self, path: str) -> Optional[bool]:
+        """
+        Return True if the path is ignored, False if a negation re-includes it and None if no pattern matches.
+        Directories are checked with a trailing slash.
+        """
+        path = path.replace(os.sep, '/')
+        if self.index is not None:
+            return True if self.index.matches(path) else None
+        decision = None
+        for pattern in self.patterns:
+            if pattern.match_file(path) is not None:
+                decision = pattern.include
+        return decision
+
+    def match_file(self, path: str) -> bool:
+        """Return True if the path is ignored, compatible with pathspec.PathSpec.match_file."""
+        return bool(self.check(path))
+
+    def match_dir(self, path: str) -> bool:
+        """Return True if the directory is ignored, so it does not need to be walked."""
+        return bool(self.check(path.rstrip('/') + '/'))
+
+    @classmethod
+    def from_file(cls, path: str) -> Optional['IgnoreMatcher']:
+        """Load patterns from an ignore file, returning None if it cannot be read."""
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                return cls(file.readlines())
+        except (IOError, UnicodeDecodeError) as e:
+            logging.warning(f"Could not load ignore file {path}: {e}")
+            return None
+
+    def __repr__(self):
+        return f"<IgnoreMatcher with {len(self.patterns)} patterns>"
+
+
+class IgnoreChain:
+    """Ignore matchers that apply inside one directory: the root patterns plus nested .gitignore files."""
+
+    def __init__(self, matchers: List[Tuple[str, IgnoreMatcher]]):
+        # (directory relative to the project root, matcher) from the outermost to the innermost directory
+        self.matchers = matchers
+
+    def extend(self, directory: str, matcher: Optional[IgnoreMatcher]) -> 'IgnoreChain':
+        """Return the chain for a subdirectory, adding its own .gitignore if it has one."""
+        if matcher is None:
+            return self
+        return IgnoreChain(self.matchers + [(directory, matcher)])
+
+    def is_ignored(self, relative_path: str, is_dir: bool = False) -> bool:
+        """
+        Check a path relative to the project root. The innermost .gitignore with a matching
+        pattern decides, as in git.
+        """
+        for directory, matcher in reversed(self.matchers):
+            path = relative_path[len(directory) + 1:] if directory else relative_path
+            decision = matcher.check(path + '/' if is_dir else path)
+            if decision is not None:
+                return decision
+        return False
+
+    def __repr__(self):
+        return f"<IgnoreChain with {len(self.matchers)} matchers>"
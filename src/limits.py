@@ -0,0 +1,127 @@
+import logging
+import os
+from typing import Iterable, Iterator, List, Optional, Set
+from .models import File, Project
+from .settings import Limits, Settings
+
+
+class LimitTracker:
+    """Apply the size and token limits to the files of a project, keeping the running token total."""
+
+    def __init__(self, limits: Optional[Limits] = None):
+        self.limits = limits or Limits()
+        self.project = Project('', os.curdir)  # Skipped files are logged relative to its root and recorded in it
+        self._total_tokens = 0
+        self._token_limit_reached = False
+        self._counted_files: Set[str] = set()
+
+    def reset(self, project: Project) -> None:
+        """
+        Start tracking a project and reset the running token total, e.g. before a project is scanned again.
+        """
+        self.project = project
+        self._total_tokens = 0
+        self._token_limit_reached = False
+        self._counted_files = set()
+
+    @property
+    def token_limit_reached(self) -> bool:
+        return self._token_limit_reached
+
+    def is_counted(self, file: File) -> bool:
+        """
+        True for files already counted towards the total, e.g. in an earlier stats pass.
+        """
+        return file.directory in self._counted_files
+
+    def iter_within_size_limits(self, files: Iterable[File]) -> Iterator[File]:
+        """
+        Yield the files within the size limits. Files are rejected on their stat size alone, before anything is
+        read. With estimate_tokens, the size-based token estimate is checked against the per-file limit and the
+        remaining total token budget.
+        """
+        total_size = 0
+        size_limit_reached = False
+        estimated_tokens = 0
+        token_limit_reached = False
+        limits = self.limits
+        for file in files:
+            estimate = file.metadata.size / Settings.BYTES_PER_TOKEN_ESTIMATE if limits.estimate_tokens else 0
+            reason = None
+            if limits.max_file_size is not None and file.metadata.size > limits.max_file_size:
+                reason = f"{file.metadata.size} bytes exceed the per-file limit of {limits.max_file_size} bytes"
+            elif estimate > (limits.max_file_tokens or float('inf')):
+                reason = (f"about {file.metadata.size // Settings.BYTES_PER_TOKEN_ESTIMATE} estimated tokens exceed "
+                          f"the per-file limit of {limits.max_file_tokens} tokens")
+            elif token_limit_reached or estimated_tokens + estimate > (limits.max_total_tokens or float('inf')):
+                token_limit_reached = True  # Like the exact limit, every later file is skipped
+                reason = f"total token limit of {limits.max_total_tokens} tokens reached by estimate"
+            elif size_limit_reached or total_size + file.metadata.size > (limits.max_total_size or float('inf')):
+                size_limit_reached = True
+                reason = f"total size limit of {limits.max_total_size} bytes reached"
+            if reason is not None:
+                file.skip_reason = reason
+                self.project.excluded_files.append(file)
+                logging.warning(f"File {os.path.relpath(file.directory, self.project.root_path)} skipped: {reason}")
+                continue
+            total_size += file.metadata.size
+            estimated_tokens += estimate
+            yield file
+
+    def token_budget_end(self, sizes: List[int], start: int) -> int:
+        """
+        End of the run of files from start whose sizes in bytes, an upper bound of their tokens, fit
+        together into the remaining total token budget. The run holds at least one file.
+        """
+        if self.limits.max_total_tokens is None:
+            return len(sizes)
+        remaining = self.limits.max_total_tokens - self._total_tokens
+        end = start
+        while end < len(sizes) and sizes[end] <= remaining:
+            remaining -= sizes[end]
+            end += 1
+        return max(end, start + 1)
+
+    def skip_if_token_limit_reached(self, file: File) -> bool:
+        """
+        Skip a file without reading or tokenizing it once the total token limit has been reached.
+        Files already counted towards the total, e.g. in an earlier stats pass, are kept.
+        """
+        if not self._token_limit_reached or self.is_counted(file) or file.skip_reason:
+            return bool(file.skip_reason)
+        self.skip_file(file, f"total token limit of {self.limits.max_total_tokens} tokens reached")
+        return True
+
+    def apply_token_limits(self, file: File) -> None:
+        """
+        Check a loaded file against the per-file and total token limits and add it to the running total.
+        Once the total limit is reached, every later file is skipped, even if it would fit.
+        """
+        if file.is_binary or file.skip_reason or self.is_counted(file):
+            return
+        limits = self.limits
+        if self._token_limit_reached:
+            self.skip_file(file, f"total token limit of {limits.max_total_tokens} tokens reached")
+            return
+        token_count = file.stats.token_count
+        if file.duplicate_of is not None and file.duplicate_of.skip_reason:
+            self.skip_file(file, f"duplicate of skipped file {file.duplicate_of.directory}")
+        elif limits.max_file_tokens is not None and token_count > limits.max_file_tokens:
+            self.skip_file(file, f"{token_count} tokens exceed the per-file limit of {limits.max_file_tokens} tokens")
+        elif limits.max_total_tokens is not None and self._total_tokens + token_count > limits.max_total_tokens:
+            self._token_limit_reached = True
+            self.skip_file(file, f"total token limit of {limits.max_total_tokens} tokens reached")
+        else:
+            self._total_tokens += token_count
+            self._counted_files.add(file.directory)
+
+    def skip_file(self, file: File, reason: str) -> None:
+        """
+        Exclude a file from the output because it exceeds a limit.
+        """
+        file.skip_reason = reason
+        file.content = ""
+        logging.warning(f"File {os.path.relpath(file.directory, self.project.root_path)} skipped: {reason}")
+
+    def __repr__(self):
+        return f"<LimitTracker {self.limits!r} with {self._total_tokens} tokens counted>"
@@ -0,0 +1,181 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+from .cache import StatsCache
+from .dedup import DuplicateDetector
+from .limits import LimitTracker
+from .models import File, Project
+from .reader import FileReader
+from .settings import Limits, Settings
+from .tokenizers import TokenCounter
+
+
+class FileLoader:
+    """
+    Load the contents and token counts of project files in batches, reusing cached stats, collapsing duplicates
+    and applying the token limits.
+    """
+
+    def __init__(self, counter: TokenCounter, reader: FileReader, cache: Optional[StatsCache] = None,
+                 limits: Optional[Limits] = None, near_duplicate_threshold: Optional[float] = None):
+        self.counter = counter
+        self.reader = reader
+        self.cache = cache
+        self.limiter = LimitTracker(limits)
+        self.duplicates = DuplicateDetector(reader, near_duplicate_threshold)
+
+    def start(self, project: Project) -> None:
+        """
+        Prepare loading the files of a newly scanned project, resetting the token total and the duplicates seen.
+        """
+        self.reader.root_path = project.root_path
+        self.limiter.reset(project)
+        self.duplicates.reset()
+
+    @property
+    def encoder_name(self) -> str:
+        """
+        Name of the encoder the token counts were computed with, and of the transforms applied before,
+        part of the cache key.
+        """
+        tokenizer = self.counter.active
+        name = tokenizer.name if tokenizer else 'none'
+        transforms = self.reader.transforms
+        return f"{name}+{transforms.name}" if transforms else name
+
+    def iter_loaded_files(self, files: Iterable[File]) -> Iterator[File]:
+        """
+        Load files in batches and yield them in order, so only one batch of contents is held at a time.
+        """
+        batch: List[File] = []
+        for file in files:
+            batch.append(file)
+            if len(batch) >= Settings.TOKENIZE_BATCH_SIZE:
+                self.load_files(batch)
+                yield from batch
+                batch = []
+        if batch:
+            self.load_files(batch)
+            yield from batch
+
+    def load_files(self, files: List[File]) -> None:
+        """
+        Load content and token counts for the given files, counting tokens for whole batches at once so
+        batch tokenizers such as SampledTokenizer see all of it. With more than one job, files are read on a
+        thread pool; the files keep their order, so the output is identical to a single job.
+        Batches are cut where the files may no longer fit into the total token limit, so files after the
+        limit are neither read nor tokenized.
+        Stats of files unchanged since a previous run are taken from the cache instead of re-tokenizing.
+        """
+        limiter = self.limiter
+        sizes = [0 if file.is_binary or file.skip_reason or limiter.is_counted(file)
+                 else file.metadata.size for file in files]
+        start = 0
+        while start < len(files):
+            end = limiter.token_budget_end(sizes, start)
+            self.load_batch([file for file in files[start:end] if not limiter.skip_if_token_limit_reached(file)])
+            start = end
+
+    def load_batch(self, files: List[File]) -> None:
+        """
+        Read a batch of files, serially or on a thread pool, then tokenize them in runs that fit into
+        the remaining total token budget and apply the token limits.
+        """
+        jobs = self.counter.jobs
+        limiter = self.limiter
+        cached = [self.restore_cached_stats(file) for file in files]
+        if jobs <= 1 or len(files) <= 1:
+            loaded = list(map(self.read_cached_or_new_content, files, cached))
+        else:
+            logging.info(f"Loading {len(files)} files with {jobs} jobs")
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                loaded = list(executor.map(self.read_cached_or_new_content, files, cached))
+        # Identical duplicates are not tokenized, new near-duplicates are tokenized as their diff
+        near_duplicates = [ok and self.duplicates.collapse_duplicate(file) for file, ok in zip(files, loaded)]
+        uncounted = [ok and (near or not is_cached and not DuplicateDetector.is_identical_duplicate(file))
+                     for file, is_cached, ok, near in zip(files, cached, loaded, near_duplicates)]
+        sizes = [file.content_size if count else 0 for file, count in zip(files, uncounted)]
+        start = 0
+        while start < len(files):
+            if limiter.token_limit_reached:
+                for file in files[start:]:
+                    limiter.skip_if_token_limit_reached(file)
+                break
+            end = limiter.token_budget_end(sizes, start)
+            self.counter.count_files([file for file, count in zip(files[start:end], uncounted[start:end]) if count])
+            for file, is_cached, ok in zip(files[start:end], cached[start:end], loaded[start:end]):
+                if ok:
+                    self.reader.log_file_stats(file)
+                if not is_cached:
+                    self.store_cached_stats(file)
+                limiter.apply_token_limits(file)
+            start = end
+        self.commit_cache()
+
+    def load_file_content(self, file: File) -> None:
+        """
+        Load content from a file, detect binary files and count its tokens.
+        """
+        if self.restore_cached_stats(file):
+            if self.read_cached_or_new_content(file, True):
+                if self.duplicates.collapse_duplicate(file):
+                    self.count_tokens(file)
+                self.reader.log_file_stats(file)
+            return
+
+        if self.reader.read_file_content(file):
+            self.duplicates.collapse_duplicate(file)
+            if not DuplicateDetector.is_identical_duplicate(file):
+                self.count_tokens(file)
+            self.reader.log_file_stats(file)
+        self.store_cached_stats(file)
+
+    def read_cached_or_new_content(self, file: File, is_cached: bool) -> bool:
+        """
+        Read a file, decoding it only with its known encoding when its stats came from the cache.
+        """
+        if not is_cached:
+            return self.reader.read_file_content(file)
+        if file.is_binary:
+            return False
+        if self.reader.read_file_content(file, [file.encoding] if file.encoding else None):
+            return True
+        # The cached encoding no longer applies, fall back to a full load
+        if self.reader.read_file_content(file):
+            self.count_tokens(file)
+            return True
+        return False
+
+    def count_tokens(self, file: File) -> None:
+        """
+        Count the tokens of a loaded file.
+        """
+        file.stats.token_count = self.counter.count([file.content])[0]
+
+    def restore_cached_stats(self, file: File) -> bool:
+        """
+        Restore the stats of a file from the cache, if it is enabled and has an entry for this file version.
+        Files already loaded once in this run keep their stats and are not tokenized again.
+        """
+        if file.is_binary or file.encoding is not None:
+            return True
+        if self.cache is None or file.diff is not None:
+            return False
+        return self.cache.restore(file, self.encoder_name)
+
+    def store_cached_stats(self, file: File) -> None:
+        """
+        Store the stats of a freshly loaded file in the cache, if it is enabled.
+        """
+        if self.cache is not None:
+            self.cache.store(file, self.encoder_name)
+
+    def commit_cache(self) -> None:
+        """
+        Persist cache updates made while loading files.
+        """
+        if self.cache is not None:
+            self.cache.commit()
+
+    def __repr__(self):
+        return f"<FileLoader {self.encoder_name} with {self.counter.jobs} jobs>"
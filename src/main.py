@@ -1,8 +1,27 @@
 import argparse
 import os
 import logging
+import sys
+from typing import Optional
+from .cache import LastRunManifest, StatsCache
+from .git_metadata import GitChanges
 from .gptizer import GPTizer
-from .settings import Settings
+from .settings import Limits, Settings
+from .sinks import ClipboardSink, SinkGroup, create_sinks, output_path
+from .tokenizers import ModelProfile, create_tokenizer
+from .transforms import TRANSFORMS
+from .watcher import ProjectWatcher
+
+
+def parse_weight(value: str):
+    """Parse a PATTERN=WEIGHT option into a (pattern, weight) tuple."""
+    pattern, separator, weight = value.rpartition('=')
+    try:
+        if not separator or not pattern:
+            raise ValueError
+        return pattern, float(weight)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid weight '{value}', expected PATTERN=WEIGHT") from exc
 
 
 def parse_arguments():
@@ -12,14 +31,73 @@ def parse_arguments():
     parser.add_argument("target", nargs='?', type=str, default=os.getcwd(),
                         help="Target file or directory to process (default: current directory)")
     parser.add_argument("-o", "--output", type=str, default=default_output,
-                        help=f"Output file path (default: {default_output})")
+                        help=f"Output file path, compressed when ending in .gz or .zst, or - for stdout (default: {default_output})")
+    parser.add_argument("--sink", type=str, action="append", default=[], metavar="DEST",
+                        help="Also write the output to DEST while it is built: a file path, -, unix:SOCKET or an http:// URL")
+    parser.add_argument("--no-clipboard", action="store_true",
+                        help="Do not copy the output to the clipboard")
     parser.add_argument("--ignore", type=str, default='.gptignore',
                         help="Custom .gitignore file for gptize (default: .gptignore)")
     parser.add_argument("--repo-root", type=str, default=os.getcwd(),
                         help="Root directory of the repository where .gitignore is located (default: current directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=Settings.DEFAULT_JOBS,
+                        help=f"Number of parallel jobs for reading and tokenizing files (default: {Settings.DEFAULT_JOBS})")
+    parser.add_argument("--max-tokens", type=int, default=None,
+                        help="Select files by priority so the whole output fits into this many tokens")
+    parser.add_argument("--weight", type=parse_weight, action="append", default=[], metavar="PATTERN=WEIGHT",
+                        help="Priority multiplier for files matching a glob pattern when --max-tokens is used (0 excludes)")
+    parser.add_argument("--split-tokens", type=int, default=None, metavar="K",
+                        help="Split the output into numbered parts of at most K tokens each")
+    parser.add_argument("--max-file-size", type=int, default=Settings.MAX_FILE_SIZE_BYTES_LIMIT, metavar="BYTES",
+                        help=f"Skip files larger than this without reading them, 0 for no limit (default: {Settings.MAX_FILE_SIZE_BYTES_LIMIT})")
+    parser.add_argument("--max-total-size", type=int, default=0, metavar="BYTES",
+                        help="Skip the remaining files once the collected files reach this many bytes (default: no limit)")
+    parser.add_argument("--max-file-tokens", type=int, default=0, metavar="N",
+                        help="Skip files with more than N tokens (default: no limit)")
+    parser.add_argument("--max-total-tokens", type=int, default=Settings.MAX_TOKEN_COUNT_LIMIT, metavar="N",
+                        help=f"Stop reading and tokenizing files once the output reaches N tokens, 0 for no limit (default: {Settings.MAX_TOKEN_COUNT_LIMIT})")
+    parser.add_argument("--estimate-tokens", action="store_true",
+                        help=f"Reject files over --max-file-tokens or past --max-total-tokens by a size estimate of {Settings.BYTES_PER_TOKEN_ESTIMATE} bytes per token before reading them")
+    parser.add_argument("--model", type=str, default=Settings.DEFAULT_MODEL, choices=list(Settings.MODEL_PROFILES),
+                        help=f"Model whose encoding and context window are used for token counts (default: {Settings.DEFAULT_MODEL})")
+    parser.add_argument("--tokenizer", type=str, default='exact', choices=['exact', 'heuristic', 'sampled'],
+                        help="Token counting backend: exact tiktoken counts, or a much faster heuristic or sampled estimate (default: exact)")
+    parser.add_argument("--no-tokens", action="store_true",
+                        help="Do not count tokens; tiktoken is not loaded and token based options are disabled")
+    parser.add_argument("--encoder-file", type=str, default=None, metavar="PATH",
+                        help=f"Local {Settings.TOKEN_MODEL_NAME}.tiktoken file to load the tokenizer from without network access")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Write files with identical content in full instead of as a reference to the first copy")
+    parser.add_argument("--near-duplicates", type=float, default=None, metavar="SIMILARITY",
+                        help="Write files whose lines match an earlier file by at least SIMILARITY (0-1) as a diff against it")
+    parser.add_argument("--transform", type=str, default=None, metavar="NAMES",
+                        help=f"Comma-separated content transforms applied before tokenizing, of: {', '.join(TRANSFORMS)}")
+    parser.add_argument("--git-files", action="store_true",
+                        help="List files with git ls-files instead of walking the directory (falls back outside git repositories)")
+    parser.add_argument("--git-log", action="store_true",
+                        help=f"Show the last commit of each file, read from the last {Settings.GIT_LOG_MAX_COMMITS} commits")
+    parser.add_argument("--since", type=str, default=None, metavar="REF",
+                        help="Only include files changed since a git ref, e.g. main")
+    parser.add_argument("--since-last-run", action="store_true",
+                        help="Only include files changed since the previous --since-last-run run of this directory")
+    parser.add_argument("--diff-context", type=int, default=None, metavar="N",
+                        help="With --since, write changed files as diffs with N lines of context")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and regenerate the output whenever files in the target directory change")
+    parser.add_argument("--poll", action="store_true",
+                        help="In watch mode, poll for changes instead of using inotify")
+    parser.add_argument("--stats-json", type=str, default=None, metavar="PATH",
+                        help="Write per-file stats, totals, per-phase timings and peak memory as JSON to PATH")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or update the persistent file stats cache")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Clear the persistent file stats cache before processing")
     parser.add_argument("--debug", action="store_true",
                         help="Enable debug logging (saves to gptize.log in the current directory)")
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.split_tokens is not None and (args.sink or output_path(args.output) is None):
+        parser.error("--split-tokens writes numbered part files and cannot be combined with --sink, stdout, sockets or HTTP")
+    return args
 
 
 def setup_logging(debug: bool):
@@ -30,32 +108,115 @@ def setup_logging(debug: bool):
         logging.getLogger().addHandler(logging.FileHandler('gptize.log'))
 
 
+def write_output(gptizer: GPTizer, args) -> Optional[ClipboardSink]:
+    """
+    Write the output into parts with --split-tokens, otherwise stream it to the output file, the extra sinks
+    and the clipboard. Raises OSError if the output file fails; the other sinks only log their failures.
+    Returns the clipboard sink, to wait for its copy to finish.
+    """
+    if args.split_tokens is not None:
+        paths = gptizer.write_parts(args.output, args.split_tokens)
+        logging.info(f"Files were combined into {len(paths)} parts, split output is not copied to the clipboard")
+        return None
+    sinks = create_sinks([args.output] + args.sink)
+    logging.info(f"Writing the output to {', '.join(sink.name for sink in sinks)}")
+    clipboard = None
+    if not args.no_clipboard:
+        clipboard = ClipboardSink(metrics=gptizer.metrics)
+        sinks.append(clipboard)
+    with SinkGroup(sinks) as output:
+        gptizer.write_output(output)
+    if sinks[0] in output.failed:
+        raise OSError(f"The output could not be written to {sinks[0].name}")
+    logging.info(f"Files were combined into {args.output}")
+    return clipboard
+
+
+def create_gptizer(args) -> GPTizer:
+    """
+    Create a GPTizer with the stats cache, limits, tokenizer and content options given on the command line.
+    """
+    cache = StatsCache.open_default() if not args.no_cache or args.clear_cache else None
+    if cache is not None and args.clear_cache:
+        cache.clear()
+    model = ModelProfile.get(args.model)
+    limits = Limits(max_file_size=args.max_file_size or None, max_total_size=args.max_total_size or None,
+                    max_file_tokens=args.max_file_tokens or None, max_total_tokens=args.max_total_tokens or None,
+                    estimate_tokens=args.estimate_tokens)
+    tokenizer = None if args.no_tokens else create_tokenizer(args.tokenizer, model.encoding, args.encoder_file)
+    return GPTizer(jobs=args.jobs, cache=None if args.no_cache else cache, use_git_index=args.git_files,
+                   limits=limits, count_tokens=not args.no_tokens, tokenizer=tokenizer, model=model,
+                   dedup=not args.no_dedup, near_duplicate_threshold=args.near_duplicates,
+                   transforms=args.transform.split(',') if args.transform else None, git_file_log=args.git_log)
+
+
+def watch(gptizer: GPTizer, args) -> None:
+    """
+    Run watch mode on a directory target until interrupted, writing to the output, the sinks and the clipboard.
+    """
+    if not os.path.isdir(args.target):
+        raise ValueError(f"Watch mode needs a directory target: {args.target}")
+    if args.output == Settings.default_output_file():
+        args.output = Settings.custom_output_file(os.path.basename(args.target), args.target)
+    outputs = [args.output] + args.sink + ([] if args.no_clipboard else ['clipboard'])
+    ProjectWatcher(gptizer, args.target, args.repo_root, args.ignore, outputs, use_polling=args.poll).run()
+
+
+def select_files(gptizer: GPTizer, args) -> Optional[LastRunManifest]:
+    """
+    Scan the target and keep the files selected by --since, --since-last-run and --max-tokens.
+    Returns the last run manifest to save once the output is written.
+    """
+    if os.path.isdir(args.target):
+        gptizer.scan_directory(args.target, args.repo_root, args.ignore)
+    elif os.path.isfile(args.target):
+        gptizer.process_file(args.target, args.repo_root, args.ignore)
+    else:
+        raise ValueError(f"Invalid target: {args.target}")
+    manifest = None
+    if args.since is not None:
+        changes = GitChanges.collect(gptizer.project.root_path, args.since, args.diff_context, gptizer.metrics)
+        gptizer.project.keep_changed_files(changes.changed, changes.deleted, changes.diffs)
+    elif args.since_last_run:
+        manifest = LastRunManifest(gptizer.project.root_path)
+        manifest.select_changed(gptizer.project)
+    if args.max_tokens is not None:
+        gptizer.fit_to_budget(args.max_tokens, dict(args.weight))
+    return manifest
+
+
 def main():
     args = parse_arguments()
     setup_logging(args.debug)
 
     try:
-        gptizer = GPTizer()
-        if os.path.isdir(args.target):
-            gptizer.process_directory(args.target, args.repo_root, args.ignore)
-        elif os.path.isfile(args.target):
-            gptizer.process_file(args.target, args.repo_root, args.ignore)
-        else:
-            raise ValueError(f"Invalid target: {args.target}")
+        gptizer = create_gptizer(args)
+        if args.watch:
+            watch(gptizer, args)
+            return 0
+        manifest = select_files(gptizer, args)
         output_file_name = Settings.custom_output_file(gptizer.project.name, args.target)
         if args.output == Settings.default_output_file():
             args.output = output_file_name
-        combined_content = gptizer.combine_files()
-        with open(args.output, 'w', encoding='utf-8') as file:
-            file.write(combined_content)
-            logging.info(f"Files were combined into {args.output}")
+        clipboard = write_output(gptizer, args)
+        if manifest is not None:
+            manifest.save_run(gptizer.project)
+        if args.stats_json is not None:
+            gptizer.write_stats_json(args.stats_json)
+        if clipboard is not None:
+            clipboard.wait()
     except FileNotFoundError as e:
         logging.error(f"File not found: {e}")
     except ValueError as e:
         logging.error(f"ValueError occurred: {e}")
+    except OSError as e:
+        logging.error(f"OSError occurred: {e}")
     except Exception as e:
         logging.error(f"An unexpected error occurred: {e}")
+    else:
+        return 0
+    return 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Dict, List, Optional, TextIO, cast
+
+resource: Optional[ModuleType]
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+class RunMetrics:
+    """
+    Wall-clock time spent per processing phase. Phases nest: time spent in an inner phase, e.g. decode
+    within read, is only counted for the inner one. Phases running on worker threads add up.
+    """
+
+    PHASES = ('walk', 'ignore', 'read', 'decode', 'transform', 'tokenize', 'git', 'build', 'write', 'clipboard')
+
+    def __init__(self):
+        self.timings: Dict[str, float] = dict.fromkeys(self.PHASES, 0.0)
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def phase(self, name: str) -> '_Phase':
+        """
+        Context manager timing a phase.
+        """
+        return _Phase(self, name)
+
+    def timed_writer(self, sink: TextIO) -> TextIO:
+        """
+        Wrap an output sink so the time spent writing to it is counted as the write phase. The wrapper only
+        implements write, which is all OutputBuilder uses of a sink.
+        """
+        return cast(TextIO, _TimedWriter(self, sink))
+
+    def _stack(self) -> List[list]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @property
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    @staticmethod
+    def peak_memory_bytes() -> Optional[int]:
+        """
+        Peak resident set size of the process, or None where it cannot be determined.
+        """
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # Bytes on macOS, kilobytes elsewhere
+
+    def __repr__(self):
+        return f"<RunMetrics {self.total_seconds:.3f}s>"
+
+
+class _Phase:
+    def __init__(self, metrics: RunMetrics, name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        # Each entry holds the phase start and the time spent in nested phases
+        self._metrics._stack().append([time.perf_counter(), 0.0])
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        stack = self._metrics._stack()
+        start, nested = stack.pop()
+        elapsed = time.perf_counter() - start
+        self._metrics._add(self._name, elapsed - nested)
+        if stack:
+            stack[-1][1] += elapsed
+
+
+class _TimedWriter:
+    def __init__(self, metrics: RunMetrics, sink: TextIO):
+        self._metrics = metrics
+        self._sink = sink
+
+    def write(self, text: str) -> int:
+        with self._metrics.phase('write'):
+            return self._sink.write(text)
@@ -1,35 +1,70 @@
-from typing import List
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from .git_metadata import GitCommit
 
 
 class FileMetadata:
-    """Class representing a file metadata in the project."""
+    """Class representing a file metadata in the project. Dates and permissions are formatted when read."""
 
-    def __init__(self, size=0, last_modified=None, permissions=None):
+    __slots__ = ('size', 'mtime_ns', 'mode')
+
+    def __init__(self, size=0, mtime_ns=0, mode=0):
         self.size = size
-        self.last_modified = last_modified
-        self.permissions = permissions
-        self.lines = 0
-        self.tokens = 0
+        self.mtime_ns = mtime_ns
+        self.mode = mode
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        if not self.mtime_ns:
+            return None
+        # Whole seconds and microseconds separately, a float of nanoseconds loses the last microseconds
+        seconds, nanoseconds = divmod(self.mtime_ns, 10**9)
+        return datetime.fromtimestamp(seconds).replace(microsecond=nanoseconds // 1000).isoformat()
+
+    @property
+    def permissions(self) -> Optional[str]:
+        return oct(self.mode)[-3:] if self.mode else None
 
 
 class FileStats:
     """Class to store file statistics."""
 
+    __slots__ = ('line_count', 'char_count', 'token_count', 'original_token_count')
+
     def __init__(self):
         self.line_count: int = 0
         self.char_count: int = 0
         self.token_count: int = 0
+        self.original_token_count: int = 0  # Tokens before content transforms, when they were counted
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_token_count - self.token_count if self.original_token_count else 0
 
 
-class File:
+class File:  # pylint: disable=too-many-instance-attributes  # A slotted record of everything written per file
     """Class representing a file in the project."""
 
+    __slots__ = ('file_name', 'directory', 'content', 'content_size', 'is_binary', 'encoding', 'diff', 'skip_reason',
+                 'content_hash', 'duplicate_of', 'similarity', 'git_state', 'last_commit', 'metadata', 'stats')
+
     def __init__(self, file_name: str, directory: str):
         self.file_name = file_name
         self.directory = directory
         self.content = ""
         self.content_size = 0
         self.is_binary = False
+        self.encoding: Optional[str] = None
+        self.diff: Optional[str] = None  # Unified diff written instead of the content in incremental mode
+        self.skip_reason: Optional[str] = None  # Set when the file exceeds a size or token limit and is not written
+        self.content_hash: Optional[bytes] = None  # Digest of the raw bytes, set when duplicates are collapsed
+        # Earlier file this one is identical to, or a near-duplicate of when diff is set
+        self.duplicate_of: Optional[File] = None
+        self.similarity: Optional[float] = None  # Estimated line similarity to duplicate_of
+        self.git_state: Optional[str] = None  # Uncommitted change of the file, e.g. 'modified in work tree'
+        self.last_commit: Optional[GitCommit] = None  # Last commit touching the file, when the git log is read
         self.metadata = FileMetadata()
         self.stats = FileStats()
 
@@ -46,7 +81,24 @@ class Project:
     def __init__(self, name: str, root_path: str):
         self.name: str = name
         self.files: List[File] = []
+        self.deleted_files: List[str] = []
         self.root_path: str = root_path
+        self.excluded_files: List[File] = []  # Files considered but left out by a limit or the token budget
+        self.contents_loaded = False  # True when the contents of all files are held in memory
+        self.git_status: Optional[str] = None  # Git status summary, fetched once per run
+
+    def keep_changed_files(self, changed: Set[str], deleted: List[str], diffs: Optional[Dict[str, str]] = None) -> None:
+        """
+        Drop unchanged files, given by their path relative to the root, before their contents are loaded and record
+        deleted files. With diffs, the kept files are written as their diff.
+        """
+        total = len(self.files)
+        self.files = [file for file in self.files if os.path.relpath(file.directory, self.root_path) in changed]
+        self.deleted_files = deleted
+        if diffs is not None:
+            for file in self.files:
+                file.diff = diffs.get(os.path.relpath(file.directory, self.root_path))
+        logging.info(f"{len(self.files)} of {total} files changed, {len(deleted)} deleted")
 
     def __str__(self):
         file_list = ', '.join(file.file_name for file in self.files)
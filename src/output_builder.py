@@ -1,50 +1,104 @@
+from typing import List, Optional, TextIO, Tuple
 from .models import Project, File
 
 
 class OutputBuilder:
-    def __init__(self):
-        self.content = ""
+    SEPARATOR = "=" * 40 + "\n"
+
+    def __init__(self, sink: Optional[TextIO] = None):
+        """
+        Build the output in memory, or stream it to a text sink (e.g. an open file) when one is given.
+        """
+        self.sink = sink
+        self._parts: List[str] = []
+        self.length = 0
+
+    def _write(self, text: str):
+        """Append text to the content, or write it straight to the sink."""
+        self.length += len(text)
+        if self.sink is not None:
+            self.sink.write(text)
+        else:
+            self._parts.append(text)
 
     def write_common_header(self):
         """Write a common header to the content."""
-        self.content += "This file was generated using third party tool 'gptize'. For more information, visit https://github.com/svetlovtech/gptize\n"
-        self.content += "=" * 40 + "\n"
+        self._write("This file was generated using third party tool 'gptize'. For more information, visit https://github.com/svetlovtech/gptize\n")
+        self._write(self.SEPARATOR)
 
-    def write_project_header(self, project: Project):
-        """Write a header for the project."""
-        self.content += f"Project Name: {project.name}\n"
-        self.content += f"Total Files: {len(project.files)}\n"
-        self.content += "=" * 40 + "\n"
+    def write_project_header(self, project: Project, part: Optional[Tuple[int, int]] = None):
+        """Write a header for the project, with the part number and count for split outputs."""
+        self._write(f"Project Name: {project.name}\n")
+        if part is not None:
+            self._write(f"Part: {part[0]} of {part[1]}\n")
+        self._write(f"Total Files: {len(project.files)}\n")
+        self._write(self.SEPARATOR)
 
     def write_git_status(self, git_status: str):
         """Write git status to the content."""
-        self.content += "Git Status:\n"
-        self.content += git_status + "\n"
-        self.content += "=" * 40 + "\n"
+        self._write("Git Status:\n")
+        self._write(git_status + "\n")
+        self._write(self.SEPARATOR)
 
-    def write_file_content(self, file: File):
-        """Write the content of a file."""
+    @staticmethod
+    def file_header(file: File, line_range: Optional[Tuple[int, int]] = None) -> str:
+        """Header lines written before the content of a file, or of a zero-based, end-exclusive line range of it."""
         if file.is_binary:
-            self.content += f"File: {file.directory} (Binary file present)\n"
-        else:
-            self.content += f"File: {file.directory}\n"
-            self.content += f"Size: {file.metadata.size} bytes\n"
-            self.content += f"Last Modified: {file.metadata.last_modified}\n"
-            self.content += f"Permissions: {file.metadata.permissions}\n"
-            self.content += file.content + "\n"
+            return f"File: {file.directory} (Binary file present)\n"
+        header = (
+            f"File: {file.directory}\n"
+            f"Size: {file.metadata.size} bytes\n"
+            f"Last Modified: {file.metadata.last_modified}\n"
+            f"Permissions: {file.metadata.permissions}\n"
+        )
+        if file.git_state is not None:
+            header += f"Git State: {file.git_state}\n"
+        if file.last_commit is not None:
+            header += f"Last Commit: {file.last_commit.describe(short=True)}\n"
+        if file.duplicate_of is not None and file.diff is None:
+            header += f"Identical to: {file.duplicate_of.directory}\n"
+        elif file.duplicate_of is not None:
+            header += f"Near-duplicate of: {file.duplicate_of.directory} ({file.similarity:.0%} similar)\n"
+        if file.diff is not None:
+            header += "Changes:\n"
+        if line_range is not None:
+            header += f"Lines: {line_range[0] + 1}-{line_range[1]} of {file.stats.line_count}\n"
+        return header
+
+    def write_file_content(self, file: File):
+        """Write the content of a file; files identical to an earlier one only get the header with the reference."""
+        self._write(self.file_header(file))
+        if not file.is_binary and (file.duplicate_of is None or file.diff is not None):
+            self._write(file.content)
+            self._write("\n")
+
+    def write_file_lines(self, file: File, content: str, line_range: Tuple[int, int]):
+        """Write a line range of a file that is split across output parts."""
+        self._write(self.file_header(file, line_range))
+        self._write(content)
+        self._write("\n")
+
+    def write_deleted_file(self, path: str):
+        """Write a marker for a file deleted since the compared revision or run."""
+        self._write(f"File: {path} (Deleted)\n")
 
     def write_separator(self):
         """Write a separator."""
-        self.content += "=" * 40 + "\n"
+        self._write(self.SEPARATOR)
 
     def get_content(self) -> str:
-        """Get the final combined content."""
-        return self.content
+        """Get the final combined content. Streamed content is not kept, so this is empty with a sink."""
+        return ''.join(self._parts)
+
+    @property
+    def content(self) -> str:
+        """The combined content written so far."""
+        return self.get_content()
 
     def __str__(self):
         """String representation of the OutputBuilder."""
-        return f"OutputBuilder with {len(self.content)} characters of content"
+        return f"OutputBuilder with {self.length} characters of content"
 
     def __repr__(self):
         """Formal string representation of the OutputBuilder."""
-        return f"<OutputBuilder with {len(self.content)} characters>"
+        return f"<OutputBuilder with {self.length} characters>"
@@ -0,0 +1,229 @@
+import fnmatch
+import logging
+import os
+from typing import Dict, List, Optional, TextIO, cast
+from .chunking import OutputSplitter
+from .loader import FileLoader
+from .models import File, Project
+from .output_builder import OutputBuilder
+from .reader import FileReader
+from .settings import Settings
+from .sinks import SinkGroup, create_sink
+
+
+class TokenBudgetPacker:
+    """Select files that fit into a token budget, preferring shallow, recently modified and weighted files."""
+
+    def __init__(self, max_tokens: int, weights: Optional[Dict[str, float]] = None):
+        """
+        Parameters:
+        max_tokens (int): Token budget for the whole output, including headers and separators.
+        weights (dict): Glob pattern to weight multiplier; the last matching pattern wins and a weight of 0 excludes the file.
+        """
+        self.max_tokens = max_tokens
+        self.weights = weights or {}
+
+    def weight(self, relative_path: str) -> float:
+        """Return the user weight of a path, 1.0 when no pattern matches."""
+        weight = 1.0
+        for pattern, pattern_weight in self.weights.items():
+            if fnmatch.fnmatch(relative_path, pattern):
+                weight = pattern_weight
+        return weight
+
+    def priority(self, file: File, relative_path: str, oldest_mtime: int, newest_mtime: int) -> float:
+        """
+        Priority of a file: user weight, halved for each directory level and doubled for the most recently modified file.
+        """
+        depth = relative_path.count(os.sep)
+        span = newest_mtime - oldest_mtime
+        recency = (file.metadata.mtime_ns - oldest_mtime) / span if span > 0 else 1.0
+        return self.weight(relative_path) * (1 + recency) / (2 ** depth)
+
+    def select(self, files: List[File], overheads: List[int], fixed_overhead: int, root_path: str) -> List[File]:
+        """
+        Greedily pick files by priority while their tokens plus per-file header and separator tokens fit the budget.
+        Selected files keep their original order.
+
+        Parameters:
+        files (list): Candidate files with token counts already computed.
+        overheads (list): Header and separator tokens written with each file.
+        fixed_overhead (int): Tokens of the common header, project header and git status.
+        root_path (str): Project root, used to compute relative paths for depth and weights.
+        """
+        remaining = self.max_tokens - fixed_overhead
+        if remaining < 0:
+            logging.error(f"Token budget {self.max_tokens} is smaller than the output header ({fixed_overhead} tokens).")
+            return []
+
+        relative_paths = [os.path.relpath(file.directory, root_path) for file in files]
+        mtimes = [file.metadata.mtime_ns for file in files] or [0]
+        oldest_mtime, newest_mtime = min(mtimes), max(mtimes)
+        priorities = [self.priority(file, path, oldest_mtime, newest_mtime) for file, path in zip(files, relative_paths)]
+
+        order = sorted(range(len(files)), key=lambda i: (-priorities[i], relative_paths[i]))
+        selected = set()
+        for i in order:
+            if priorities[i] <= 0:
+                continue
+            cost = files[i].stats.token_count + overheads[i]
+            if cost <= remaining:
+                selected.add(i)
+                remaining -= cost
+
+        logging.info(
+            f"Token budget {self.max_tokens}: selected {len(selected)} of {len(files)} files, "
+            f"{self.max_tokens - remaining} tokens used."
+        )
+        return [file for i, file in enumerate(files) if i in selected]
+
+    def __repr__(self):
+        return f"<TokenBudgetPacker max_tokens={self.max_tokens} weights={self.weights}>"
+
+
+class OutputPlanner:
+    """
+    Fit the output of a project into a token budget, or write it as parts of at most a number of tokens, counting
+    the tokens of headers and separators along with the file contents.
+    """
+
+    def __init__(self, project: Project, loader: FileLoader, git_status: str):
+        """
+        Parameters:
+        project (Project): Scanned or loaded project whose files are selected or split.
+        loader (FileLoader): Loads file contents and counts tokens.
+        git_status (str): Git status written to the output header.
+        """
+        self.project = project
+        self.loader = loader
+        self.git_status = git_status
+
+    def count_text_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count the tokens of each text, e.g. of output headers.
+        """
+        return self.loader.counter.count(texts)
+
+    def fit_to_budget(self, max_tokens: int, weights: Optional[Dict[str, float]] = None) -> None:
+        """
+        Keep only the files that fit into max_tokens, including the tokens of headers and separators.
+        Token counts are computed up front, so an oversized output is never written.
+        """
+        project = self.project
+        self.ensure_stats()
+        header = OutputBuilder()
+        header.write_common_header()
+        header.write_project_header(project)
+        header.write_git_status(self.git_status)
+        fixed_overhead = self.count_text_tokens([header.get_content()])[0]
+
+        packer = TokenBudgetPacker(max_tokens, weights)
+        project.excluded_files.extend(file for file in project.files if file.skip_reason)
+        project.files = [file for file in project.files if not file.skip_reason]
+        candidates = project.files
+        project.files = packer.select(candidates, self.file_overheads(), fixed_overhead, project.root_path)
+        selected = set(map(id, project.files))
+        for file in candidates:
+            if id(file) not in selected:
+                file.skip_reason = f"does not fit into the token budget of {max_tokens} tokens"
+                project.excluded_files.append(file)
+        # Duplicates refer to their original, so they are dropped along with it
+        for file in project.files:
+            if file.duplicate_of is not None and file.duplicate_of.skip_reason:
+                file.skip_reason = f"duplicate of {file.duplicate_of.directory}, which does not fit into the token budget"
+                project.excluded_files.append(file)
+        project.files = [file for file in project.files if not file.skip_reason]
+
+    def ensure_stats(self) -> None:
+        """
+        Make sure token counts are known for all files. Lazily scanned projects are loaded
+        and released again; the stats are kept, so the files are not tokenized twice.
+        """
+        if not self.project.contents_loaded:
+            for file in self.loader.iter_loaded_files(self.project.files):
+                file.content = ""
+
+    def file_overheads(self) -> List[int]:
+        """
+        Tokens of the header and separator written with each file of the project.
+        """
+        counts = self.count_text_tokens(
+            ["\n" + OutputBuilder.SEPARATOR] + [OutputBuilder.file_header(file) for file in self.project.files])
+        separator_tokens = counts[0]
+        # Binary files are not written, so they cost nothing
+        return [0 if file.is_binary or file.skip_reason else tokens + separator_tokens
+                for file, tokens in zip(self.project.files, counts[1:])]
+
+    def write_parts(self, output_file: str, max_tokens: int) -> List[str]:
+        """
+        Stream the output into several files of at most max_tokens tokens each, split at file
+        boundaries and, for files larger than a part, at line boundaries. Every part starts with
+        the common and project headers; the git status is written to the first part only. Parts ending in
+        .gz or .zst are compressed. Returns the paths of the written parts. Raises OSError if a part cannot
+        be written.
+        """
+        project = self.project
+        metrics = self.loader.counter.metrics
+        self.ensure_stats()
+
+        part_header = OutputBuilder()
+        part_header.write_common_header()
+        part_header.write_project_header(project, (99, 99))
+        git_header = OutputBuilder()
+        git_header.write_git_status(self.git_status)
+        part_overhead, git_overhead, line_range_overhead = self.count_text_tokens([
+            part_header.get_content(), git_header.get_content(), "Lines: 99999-99999 of 99999\n"])
+
+        splitter = OutputSplitter(max_tokens, part_overhead, part_overhead + git_overhead, line_range_overhead)
+        parts = splitter.split(project.files, self.file_overheads(), self.count_line_tokens)
+
+        paths = []
+        files = project.files if project.contents_loaded else self.loader.iter_loaded_files(
+            [file for file in project.files if not file.is_binary and not file.skip_reason])
+        loaded_files = iter(files)
+        current: Optional[File] = None
+        current_lines: List[str] = []
+        for index, part in enumerate(parts, start=1):
+            path = Settings.part_output_file(output_file, index, len(parts))
+            with SinkGroup([create_sink(path)]) as sink, metrics.phase('build'):
+                builder = OutputBuilder(metrics.timed_writer(cast(TextIO, sink)))
+                builder.write_common_header()
+                builder.write_project_header(project, (index, len(parts)))
+                if index == 1:
+                    builder.write_git_status(self.git_status)
+                for file, line_range in part.segments:
+                    while current is not file:
+                        if current is not None and not project.contents_loaded:
+                            current.content = ""
+                        current = next(loaded_files)
+                        current_lines = []
+                    if line_range is None:
+                        builder.write_file_content(file)
+                    else:
+                        current_lines = current_lines or FileReader.split_lines(file.content)
+                        content = ''.join(current_lines[line_range[0]:line_range[1]])
+                        builder.write_file_lines(file, content, line_range)
+                    builder.write_separator()
+            if sink.failed:
+                raise OSError(f"Part {index} of {len(parts)} could not be written to {path}")
+            logging.info(f"Part {index} of {len(parts)} with {part.token_count} tokens written to {path}")
+            paths.append(path)
+
+        if current is not None and not project.contents_loaded:
+            current.content = ""
+        return paths
+
+    def count_line_tokens(self, file: File) -> List[int]:
+        """
+        Token counts of each line of a file, used to split files larger than an output part.
+        """
+        released = not file.content and not self.project.contents_loaded
+        if released:
+            self.loader.reader.read_file_content(file, [file.encoding] if file.encoding else None)
+        counts = self.count_text_tokens(FileReader.split_lines(file.content))
+        if released:
+            file.content = ""
+        return counts
+
+    def __repr__(self):
+        return f"<OutputPlanner for {self.project.name}>"
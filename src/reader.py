@@ -0,0 +1,150 @@
+import hashlib
+import io
+import logging
+import mmap
+import os
+from typing import List, Optional, Union
+from .models import File
+from .settings import Settings
+from .tokenizers import TokenCounter
+from .transforms import TransformPipeline
+
+
+class FileReader:
+    """Read, decode and transform project files, filling their content and line and character counts."""
+
+    def __init__(self, counter: TokenCounter, transforms: Optional[TransformPipeline] = None,
+                 hash_content: bool = True):
+        """
+        Parameters:
+        counter (TokenCounter): Counts the tokens of the original content of transformed files.
+        transforms (TransformPipeline): Content transforms applied after decoding, if any.
+        hash_content (bool): Keep a digest of the raw bytes, used to collapse identical duplicates.
+        """
+        self.counter = counter
+        self.transforms = transforms
+        self.hash_content = hash_content
+        self.root_path = os.curdir  # Project root, file paths are logged relative to it
+
+    def read_file_content(self, file: File, encodings: Optional[List[str]] = None) -> bool:
+        """
+        Read and decode a file, filling its content, size, encoding, line and character counts.
+        The file is read once (memory-mapped above Settings.MMAP_THRESHOLD_BYTES); binary detection
+        and decoding work on that buffer. Encodings are tried in order, defaulting to Settings.DEFAULT_ENCODINGS.
+        Returns False for binary or unreadable files. Files with a diff take the diff as their content.
+        Warn if the file contains more than 700 lines.
+        """
+        relative_path = os.path.relpath(file.directory, self.root_path)
+        metrics = self.counter.metrics
+
+        if file.diff is not None:
+            file.encoding = 'utf-8'
+            self.set_content(file, file.diff)
+            return True
+
+        try:
+            with metrics.phase('read'), open(file.directory, 'rb') as f:
+                if os.fstat(f.fileno()).st_size >= Settings.MMAP_THRESHOLD_BYTES:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, metrics.phase('decode'):
+                        return self.decode_content(file, mapped, encodings, relative_path)
+                data = f.read()
+            with metrics.phase('decode'):
+                return self.decode_content(file, data, encodings, relative_path)
+        except IOError as e:
+            logging.error(f"Error reading file {relative_path}: {e}")
+            return False
+        except Exception as e:
+            logging.error(f"An unexpected error occurred while reading {relative_path}: {e}")
+            return False
+
+    def decode_content(self, file: File, data: Union[bytes, mmap.mmap], encodings: Optional[List[str]],
+                       relative_path: str) -> bool:
+        """
+        Detect binary content and decode a file's raw bytes with the first encoding that fits.
+        Newlines are normalized like in text mode, so the content matches what open() would return.
+        """
+        first_load = file.encoding is None
+        if b'\0' in data[:1024]:
+            file.is_binary = True
+            logging.info(f"Binary file detected: {relative_path}")
+            return False
+
+        if self.hash_content:
+            file.content_hash = hashlib.blake2b(data, digest_size=16).digest()
+
+        for encoding in encodings or Settings.DEFAULT_ENCODINGS:
+            try:
+                content = str(data, encoding)
+            except UnicodeDecodeError:
+                continue
+            has_carriage_returns = '\r' in content
+            if has_carriage_returns:
+                content = content.replace('\r\n', '\n').replace('\r', '\n')
+            file.encoding = encoding
+            self.set_content(file, content, len(data) if encoding == 'utf-8' and not has_carriage_returns else None)
+            self.transform_content(file, relative_path, first_load)
+
+            if file.stats.line_count > Settings.WARN_LINES_COUNT:
+                logging.warning(f"File {relative_path} exceeds 700 lines ({file.stats.line_count} lines).")
+            logging.info(f"Content of {relative_path} loaded with encoding {encoding}")
+            return True
+
+        logging.error(f"Failed to read {relative_path} in any known encoding")
+        return False
+
+    def transform_content(self, file: File, relative_path: str, first_load: bool) -> None:
+        """
+        Apply the content transforms to a freshly decoded file. This runs on the worker thread that read the
+        file, so transforms work in parallel and on one file at a time. Savings are recorded the first time
+        a file is loaded, with the tokens of the original content; files whose stats come from the cache
+        or that are read again are only transformed.
+        """
+        transforms = self.transforms
+        if transforms is None:
+            return
+        with self.counter.metrics.phase('transform'):
+            content = transforms.apply(file.content, file.file_name, record=first_load)
+        if content is None or content == file.content:
+            return
+        if first_load and self.counter.active:
+            file.stats.original_token_count = self.counter.count([file.content])[0]
+        self.set_content(file, content)
+        logging.info(f"Content of {relative_path} transformed ({transforms.name})")
+
+    def log_file_stats(self, file: File) -> None:
+        """
+        Log line, character and token counts of a loaded file.
+        """
+        relative_path = os.path.relpath(file.directory, self.root_path)
+        logging.info(f"File {relative_path}: {file.stats.line_count} lines, {file.stats.char_count} characters, {file.stats.token_count} tokens.")
+
+    @classmethod
+    def set_content(cls, file: File, content: str, content_size: Optional[int] = None) -> None:
+        """
+        Set the content of a file with its size in bytes and line and character counts.
+        The size is measured by encoding to UTF-8 only when it is not already known from the raw bytes.
+        """
+        file.content = content
+        if content_size is None:
+            cls.calculate_content_size(file)
+        else:
+            file.content_size = content_size
+        file.stats.line_count = content.count('\n') + (1 if content and not content.endswith('\n') else 0)
+        file.stats.char_count = len(content)
+
+    @staticmethod
+    def calculate_content_size(file: File) -> None:
+        """
+        Calculate the size of the content of a file in bytes.
+        """
+        file.content_size = len(file.content.encode('utf-8'))
+
+    @staticmethod
+    def split_lines(content: str) -> List[str]:
+        """
+        Split content into lines the way they are counted in FileStats.line_count.
+        """
+        return io.StringIO(content).readlines()
+
+    def __repr__(self):
+        return f"<FileReader at {self.root_path} transforms={self.transforms.name if self.transforms else None}>"
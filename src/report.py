@@ -0,0 +1,147 @@
+import heapq
+import json
+import logging
+import os
+from typing import List, Optional
+from .models import File, Project
+from .settings import Settings
+from .tokenizers import ModelProfile, TokenCounter
+from .transforms import TransformPipeline
+
+
+class StatsReport:
+    """Token, line and character totals of a project, logged as a summary or written as a JSON manifest."""
+
+    def __init__(self, project: Project, model: ModelProfile, counter: TokenCounter,
+                 transforms: Optional[TransformPipeline] = None):
+        self.project = project
+        self.model = model
+        self.counter = counter
+        self.transforms = transforms
+
+    def summarize_stats(self):
+        """
+        Summarize total tokens, lines, characters, and percentage of context usage.
+        """
+        written_files = [file for file in self.project.files if not file.skip_reason]
+        total_chars = sum(file.stats.char_count for file in written_files)
+        total_lines = sum(file.stats.line_count for file in written_files)
+        total_tokens = sum(file.stats.token_count for file in written_files)
+        max_context = self.model.context_window
+
+        top_by_token_files = self.top_files_by_tokens(written_files)
+
+        logging.info(f"Top {Settings.TOP_TOKEN_FILES_COUNT} files by token count:")
+        for i, file in enumerate(top_by_token_files, start=1):
+            token_percentage = (file.stats.token_count / max_context) * 100 if total_tokens > 0 else 0
+            logging.info(
+                f"{str(i).zfill(2)}. {file.file_name} - {file.stats.token_count} tokens "
+                f"({token_percentage:.2f}% of context), "
+                f"{file.stats.line_count} lines, {file.stats.char_count} characters"
+            )
+
+        logging.info(f"Total lines: {total_lines}")
+        tokenizer = self.counter.active
+        if tokenizer is not None and tokenizer.error_bound is None:
+            logging.info(f"Total tokens: {total_tokens} (rough estimate by {tokenizer.name})")
+        elif tokenizer is not None and tokenizer.error_bound:
+            logging.info(f"Total tokens: {total_tokens} (estimated by {tokenizer.name}, "
+                         f"within \u00b1{tokenizer.error_bound:.0%})")
+        else:
+            logging.info(f"Total tokens: {total_tokens}")
+        logging.info(f"Total characters: {total_chars}")
+        self.summarize_transforms(written_files)
+        context_usage_percent = (total_tokens / max_context) * 100
+        logging.info(f"{self.model.name} context usage: {context_usage_percent:.2f}%")
+
+        if context_usage_percent > 100:
+            logging.error(f"CONTEXT WINDOW EXCEEDED: Total tokens exceed the maximum allowed by {self.model.name}.")
+        elif context_usage_percent > 50:
+            logging.warning("Context usage exceeds 50%. GPT response quality may degrade.")
+
+    @staticmethod
+    def top_files_by_tokens(files: List[File]) -> List[File]:
+        """
+        The Settings.TOP_TOKEN_FILES_COUNT files with the most tokens, selected without sorting all files.
+        """
+        return heapq.nlargest(Settings.TOP_TOKEN_FILES_COUNT, (file for file in files if file.stats.token_count > 0),
+                              key=lambda file: file.stats.token_count)
+
+    def summarize_transforms(self, files: List[File]) -> None:
+        """
+        Log the tokens saved by the content transforms and the characters each transform removed.
+        Savings are known for files tokenized in this run, cached files are not tokenized again.
+        """
+        if self.transforms is None:
+            return
+        transformed = [file for file in files if file.stats.original_token_count]
+        saved = sum(file.stats.tokens_saved for file in transformed)
+        original = sum(file.stats.original_token_count for file in transformed)
+        logging.info(f"Transforms saved {saved} tokens ({saved / original if original else 0:.1%}) "
+                     f"in {len(transformed)} files")
+        for name, chars in self.transforms.chars_saved.items():
+            logging.info(f"  {name}: {chars} characters removed")
+
+    def stats_manifest(self) -> dict:
+        """
+        Structured stats of the run: every file considered with its counts and whether it was included,
+        totals, per-phase timings and peak memory.
+        """
+        root_path = self.project.root_path
+        files = self.project.files + self.project.excluded_files
+        included = [file for file in self.project.files if not (file.is_binary or file.skip_reason)]
+        total_tokens = sum(file.stats.token_count for file in included)
+        top_files = self.top_files_by_tokens(included)
+        tokenizer = self.counter.active
+        metrics = self.counter.metrics
+        return {
+            'project': self.project.name,
+            'root': os.path.abspath(root_path),
+            'model': self.model.name,
+            'context_window': self.model.context_window,
+            'tokenizer': tokenizer.name if tokenizer else None,
+            'token_error_bound': tokenizer.error_bound if tokenizer else None,
+            'totals': {
+                'files': len(files),
+                'included_files': len(included),
+                'lines': sum(file.stats.line_count for file in included),
+                'chars': sum(file.stats.char_count for file in included),
+                'tokens': total_tokens,
+                'context_usage_percent': round(total_tokens / self.model.context_window * 100, 2),
+            },
+            'transforms': {
+                'applied': [transform.name for transform in self.transforms.transforms],
+                'chars_saved': dict(self.transforms.chars_saved),
+                'tokens_saved': sum(file.stats.tokens_saved for file in included),
+            } if self.transforms else None,
+            'top_files': [os.path.relpath(file.directory, root_path) for file in top_files],
+            'files': [{
+                'path': os.path.relpath(file.directory, root_path),
+                'size': file.metadata.size,
+                'encoding': file.encoding,
+                'git_state': file.git_state,
+                'binary': file.is_binary,
+                'tokens': file.stats.token_count,
+                'lines': file.stats.line_count,
+                'chars': file.stats.char_count,
+                'tokens_saved': file.stats.tokens_saved,
+                'included': not (file.is_binary or file.skip_reason),
+                'skip_reason': file.skip_reason,
+                'duplicate_of': os.path.relpath(file.duplicate_of.directory, root_path) if file.duplicate_of else None,
+            } for file in files],
+            'deleted_files': list(self.project.deleted_files),
+            'timings': {phase: round(seconds, 6) for phase, seconds in metrics.timings.items()},
+            'total_seconds': round(metrics.total_seconds, 6),
+            'peak_memory_bytes': metrics.peak_memory_bytes(),
+        }
+
+    def write_stats_json(self, path: str) -> None:
+        """
+        Write the stats manifest of the run as JSON.
+        """
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.stats_manifest(), file, indent=2)
+        logging.info(f"Stats written to {path}")
+
+    def __repr__(self):
+        return f"<StatsReport of {self.project.name} for {self.model.name}>"
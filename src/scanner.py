@@ -0,0 +1,195 @@
+import logging
+import os
+import stat
+import subprocess
+from typing import Iterator, List, Optional
+from .ignore import IgnoreChain, IgnoreMatcher
+from .metrics import RunMetrics
+from .models import File
+from .settings import Settings
+
+
+class FileScanner:
+    """List the files of a project that are not ignored, with their metadata but without content."""
+
+    def __init__(self, use_git_index: bool = False, metrics: Optional[RunMetrics] = None):
+        """
+        Parameters:
+        use_git_index (bool): List files with git instead of walking the tree, when the project is in a repository.
+        metrics (RunMetrics): Times the ignore phase of the walk.
+        """
+        self.use_git_index = use_git_index
+        self.metrics = metrics or RunMetrics()
+        self.root_path = os.curdir
+        self.gitignore = IgnoreMatcher([])
+        self.gptignore = IgnoreMatcher([])
+        self.root_gitignore_path: Optional[str] = None
+        self.scanned_directories: List[str] = []
+
+    def start(self, root_path: str, repo_root: str, gptize_ignore: str) -> None:
+        """
+        Prepare scanning a project directory with the ignore files of its repository root.
+        """
+        self.root_path = root_path
+        self.gitignore = self.load_gitignore(repo_root, gptize_ignore)
+
+    def load_gitignore(self, repo_root: str, gptize_ignore: str) -> IgnoreMatcher:
+        """
+        Load both .gitignore from the repo root and a custom .gptignore for filtering files.
+        """
+        gitignore_path = os.path.join(repo_root, Settings.GITIGNORE_PATH)
+        gptize_ignore_path = os.path.join(repo_root, gptize_ignore)
+        self.root_gitignore_path = os.path.realpath(gitignore_path)
+        self.gptignore = IgnoreMatcher([])
+
+        patterns = []
+
+        # Load .gitignore from repo root
+        try:
+            with open(gitignore_path, 'r', encoding='utf-8') as file:
+                patterns += file.readlines()
+            logging.info(f".gitignore loaded from {gitignore_path}")
+        except FileNotFoundError:
+            logging.warning(f".gitignore not found at {gitignore_path}, proceeding without it")
+        except Exception as e:
+            logging.error(f"An unexpected error occurred when loading .gitignore: {e}")
+
+        # Load custom .gptignore
+        try:
+            with open(gptize_ignore_path, 'r', encoding='utf-8') as file:
+                gptignore_patterns = file.readlines()
+                patterns += gptignore_patterns
+                self.gptignore = IgnoreMatcher(gptignore_patterns)
+            logging.info(f"Custom .gptignore loaded from {gptize_ignore_path}")
+        except FileNotFoundError:
+            logging.warning(f"Custom .gptignore not found at {gptize_ignore_path}, proceeding without it")
+        except Exception as e:
+            logging.error(f"An unexpected error occurred when loading custom .gptignore: {e}")
+
+        return IgnoreMatcher(patterns)
+
+    def iter_candidate_files(self) -> Iterator[File]:
+        """
+        Yield files that are not ignored, with their metadata but without content. With use_git_index
+        the file list comes from git, otherwise, or when the project is not in a git repository, from walking the tree.
+        """
+        if self.use_git_index:
+            paths = self.list_git_files()
+            if paths is not None:
+                yield from self.iter_git_files(paths)
+                return
+            logging.info("Project is not in a git repository, falling back to walking the directory tree")
+        yield from self.walk_files()
+
+    def list_git_files(self) -> Optional[List[str]]:
+        """
+        List tracked and untracked, not ignored files under the project root with a single git call.
+        Returns paths relative to the project root, or None if git is unavailable.
+        """
+        try:
+            result = subprocess.run(
+                ['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+                capture_output=True,
+                cwd=self.root_path,
+                check=True
+            )
+        except (subprocess.CalledProcessError, OSError) as e:
+            logging.debug(f"git ls-files failed: {e}")
+            return None
+        # Unmerged files are listed once per stage
+        return list(dict.fromkeys(os.fsdecode(path) for path in result.stdout.split(b'\0') if path))
+
+    def iter_git_files(self, paths: List[str]) -> Iterator[File]:
+        """
+        Yield files listed by git, applying .gptignore on top of git's own ignore rules.
+        Files deleted from the working tree, submodules and files in Settings.IGNORED_DIRECTORIES are skipped,
+        the latter as when walking the tree, even if they are tracked.
+        """
+        ignored_directories = set(Settings.IGNORED_DIRECTORIES)
+        paths = [path for path in map(os.path.normpath, paths)
+                 if ignored_directories.isdisjoint(os.path.dirname(path).split(os.sep))]
+        directories = {os.path.dirname(path) for path in paths}
+        self.scanned_directories = sorted(os.path.join(self.root_path, path) for path in directories)
+        for relative_path in paths:
+            if self.gptignore.match_file(relative_path):
+                logging.debug(f"File {relative_path} is ignored")
+                continue
+            file_obj = File(os.path.basename(relative_path), os.path.join(self.root_path, relative_path))
+            try:
+                file_stat = os.stat(file_obj.directory)
+            except OSError:
+                logging.debug(f"File {relative_path} is missing from the working tree")
+                continue
+            if not stat.S_ISREG(file_stat.st_mode):
+                continue
+            self.set_file_metadata(file_obj, file_stat)
+            yield file_obj
+
+    def walk_files(self) -> Iterator[File]:
+        """
+        Walk the project and yield files that are not ignored, with their metadata but without content.
+        Ignored directories are pruned before descending, and .gitignore files found in
+        subdirectories apply to their own subtree.
+        """
+        root_path = self.root_path
+        chains = {root_path: IgnoreChain([('', self.gitignore)])}
+        self.scanned_directories = []
+        for root, dirs, files in os.walk(root_path):
+            chain = chains.pop(root)
+            self.scanned_directories.append(root)
+            # Use paths relative to the project root directory, not the current working directory
+            relative_root = os.path.relpath(root, root_path)
+            relative_root = '' if relative_root == os.curdir else relative_root
+
+            with self.metrics.phase('ignore'):
+                if Settings.GITIGNORE_PATH in files:
+                    nested_path = os.path.join(root, Settings.GITIGNORE_PATH)
+                    if os.path.realpath(nested_path) != self.root_gitignore_path:
+                        chain = chain.extend(relative_root, IgnoreMatcher.from_file(nested_path))
+
+                kept_dirs = []
+                for dir_name in dirs:
+                    if dir_name in Settings.IGNORED_DIRECTORIES:
+                        continue
+                    relative_dir = os.path.join(relative_root, dir_name)
+                    if chain.is_ignored(relative_dir, is_dir=True):
+                        logging.debug(f"Directory {relative_dir} is ignored")
+                        continue
+                    kept_dirs.append(dir_name)
+                    chains[os.path.join(root, dir_name)] = chain
+                dirs[:] = kept_dirs
+
+                kept_files = []
+                for file_name in files:
+                    relative_path = os.path.join(relative_root, file_name)
+                    if chain.is_ignored(relative_path):
+                        logging.debug(f"File {relative_path} is ignored")
+                        continue
+                    kept_files.append(file_name)
+
+            for file_name in kept_files:
+                file_obj = File(file_name, os.path.join(root, file_name))
+                self.load_file_metadata(file_obj)
+                yield file_obj
+
+    @classmethod
+    def load_file_metadata(cls, file: File) -> None:
+        """
+        Fill size, modification time and permissions of a file from os.stat.
+        """
+        try:
+            cls.set_file_metadata(file, os.stat(file.directory))
+        except Exception as e:
+            logging.error(f"Failed to retrieve metadata for {file.directory}: {e}")
+
+    @staticmethod
+    def set_file_metadata(file: File, file_stat: os.stat_result) -> None:
+        """
+        Fill size, modification time and permissions of a file from a stat result.
+        """
+        file.metadata.size = file_stat.st_size
+        file.metadata.mtime_ns = file_stat.st_mtime_ns
+        file.metadata.mode = file_stat.st_mode
+
+    def __repr__(self):
+        return f"<FileScanner at {self.root_path} use_git_index={self.use_git_index}>"
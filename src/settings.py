@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 import os
 
 
@@ -8,10 +9,60 @@ class Settings:
     GITIGNORE_PATH = '.gitignore'
     MAX_FILE_SIZE_BYTES_LIMIT = 512 * 1024 * 1024  # 512 MB
     MAX_TOKEN_COUNT_LIMIT = 2000000  # 2 million tokens
+    BYTES_PER_TOKEN_ESTIMATE = 4  # Rough bytes per token for the pre-tokenization estimate
     WARN_LINES_COUNT = 700
     GPT4O_CONTEXT_WINDOW = 128000  # Token context window for GPT-4o
     TOKEN_MODEL_NAME = 'o200k_base'
+    DEFAULT_MODEL = 'gpt-4o'
+    # Tokenizer encoding and context window size per model, selected with --model
+    MODEL_PROFILES = {
+        'gpt-4o': ('o200k_base', GPT4O_CONTEXT_WINDOW),
+        'gpt-4o-mini': ('o200k_base', 128000),
+        'gpt-4.1': ('o200k_base', 1047576),
+        'o3': ('o200k_base', 200000),
+        'gpt-4-turbo': ('cl100k_base', 128000),
+        'gpt-4': ('cl100k_base', 8192),
+        'gpt-3.5-turbo': ('cl100k_base', 16385),
+    }
+    TOKEN_SAMPLE_COUNT = 32  # Slices tokenized per batch by the sampled estimator
+    TOKEN_SAMPLE_CHARS = 1024
+    # Published BPE rank files with their SHA-256, used to verify files passed with --encoder-file
+    ENCODER_FILES = {
+        'o200k_base': ('https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken',
+                       '446a9538cb6c348e3516120d7c08b09f57c36495e2acfffe59a5bf8b0cfb1a2d'),
+        'cl100k_base': ('https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken',
+                        '223921b76ee99bde995b7ff738513eef100fb51d18c93597a113bcffe865b2a7'),
+    }
     TOP_TOKEN_FILES_COUNT = 10
+    MMAP_THRESHOLD_BYTES = 1024 * 1024  # Files from this size on are memory-mapped instead of read
+    DEFAULT_JOBS = 1
+    TOKENIZE_BATCH_SIZE = 256  # Files per tiktoken encode_ordinary_batch call
+    WATCH_DEBOUNCE_SECONDS = 0.2  # Quiet period before changes are coalesced into one rebuild
+    WATCH_POLL_INTERVAL_SECONDS = 1.0
+    NEAR_DUPLICATE_SKETCH_SIZE = 64  # Line hashes kept per file for near-duplicate detection
+    NEAR_DUPLICATE_MIN_LINES = 8  # Files with fewer distinct lines are never treated as near-duplicates
+    NEAR_DUPLICATE_CANDIDATES = 16  # Earlier files compared per file, by number of shared line hashes
+    NEAR_DUPLICATE_DIFF_CONTEXT = 1
+    GIT_LOG_MAX_COMMITS = 1000  # Commits scanned for the last commit of each file
+    TRANSFORM_MAX_LITERAL_CHARS = 200  # String literals and number lists longer than this are truncated
+    SINK_BLOCK_CHARS = 64 * 1024  # Output is handed to sinks in blocks of about this size
+    SINK_QUEUE_BLOCKS = 64  # Blocks a threaded sink may fall behind before the output waits for it
+    SINK_SOCKET_TIMEOUT_SECONDS = 10
+    CLIPBOARD_MAX_CHARS = 16 * 1024 * 1024  # Larger outputs are not copied to the clipboard
+    CLIPBOARD_TIMEOUT_SECONDS = 10  # Time given to a background clipboard copy to finish before exiting
+    CACHE_FILE_NAME = 'stats.sqlite3'
+    CACHE_MAX_ENTRIES = 200000  # Least recently used entries above this are evicted
+
+    @staticmethod
+    def cache_dir():
+        """Returns the gptize cache directory, following the XDG base directory spec."""
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(base, 'gptize')
+
+    @staticmethod
+    def encoder_cache_dir():
+        """Returns the directory tiktoken reads BPE rank files from, TIKTOKEN_CACHE_DIR if set."""
+        return os.environ.get('TIKTOKEN_CACHE_DIR') or os.path.join(Settings.cache_dir(), 'tiktoken')
 
     @staticmethod
     def default_output_file():
@@ -19,6 +70,18 @@ class Settings:
         current_time = datetime.now().strftime("%Y%m%d-%H%M%S")
         return f"gptize-output-{current_time}.txt"
 
+    @staticmethod
+    def part_output_file(output_file: str, part: int, total: int):
+        """
+        Returns the file name of one part of a split output, e.g. gptize-output-proj-part-03-of-07.txt.
+        A compression suffix stays at the end, as in out-part-01-of-02.txt.gz.
+        """
+        root, ext = os.path.splitext(output_file)
+        if ext in ('.gz', '.zst'):
+            root, inner = os.path.splitext(root)
+            ext = inner + ext
+        return f"{root}-part-{part:02d}-of-{total:02d}{ext}"
+
     @staticmethod
     def custom_output_file(project_name: str, target: str):
         """
@@ -37,3 +100,28 @@ class Settings:
 
         current_time = datetime.now().strftime("%Y%m%d-%H%M%S")
         return f"gptize-output-{project_part}-{current_time}.txt"
+
+
+class Limits:
+    """Size and token limits applied while collecting and loading files."""
+
+    def __init__(self, max_file_size: Optional[int] = Settings.MAX_FILE_SIZE_BYTES_LIMIT,
+                 max_total_size: Optional[int] = None, max_file_tokens: Optional[int] = None,
+                 max_total_tokens: Optional[int] = Settings.MAX_TOKEN_COUNT_LIMIT, estimate_tokens: bool = False):
+        """
+        Parameters:
+        max_file_size (int): Files larger than this many bytes are skipped without being read.
+        max_total_size (int): Once the collected files reach this many bytes, the remaining files are skipped.
+        max_file_tokens (int): Files with more tokens are skipped.
+        max_total_tokens (int): Once the loaded files reach this many tokens, the remaining files are skipped without being tokenized.
+        estimate_tokens (bool): Reject files whose size-based token estimate exceeds max_file_tokens, or the remaining max_total_tokens, before reading them.
+        """
+        self.max_file_size = max_file_size
+        self.max_total_size = max_total_size
+        self.max_file_tokens = max_file_tokens
+        self.max_total_tokens = max_total_tokens
+        self.estimate_tokens = estimate_tokens
+
+    def __repr__(self):
+        return (f"<Limits max_file_size={self.max_file_size} max_total_size={self.max_total_size} "
+                f"max_file_tokens={self.max_file_tokens} max_total_tokens={self.max_total_tokens}>")
@@ -0,0 +1,402 @@
+import gzip
+import io
+import logging
+import os
+import queue
+import socket
+import sys
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Union
+from urllib.parse import urlsplit
+from .metrics import RunMetrics
+from .settings import Settings
+
+
+class Sink(ABC):
+    """Destination of the output. Sinks receive the output in blocks while it is built and are closed at the end."""
+
+    name = ''
+    threaded = False  # Written on a background thread, for sinks that compress or send over a socket
+
+    @abstractmethod
+    def write(self, text: str) -> None:
+        """
+        Write the next block of the output.
+        """
+
+    def close(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        """
+        Release the sink when the output is incomplete. Sinks that would deliver the output on close discard it.
+        """
+        self.close()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+
+class FileSink(Sink):
+    """Write the output to a text file."""
+
+    def __init__(self, path: str):
+        self.name = path
+        self._file = open(path, 'w', encoding='utf-8')  # pylint: disable=consider-using-with  # Closed in close()
+
+    def write(self, text: str) -> None:
+        self._file.write(text)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class StdoutSink(Sink):
+    """Write the output to standard output, e.g. to pipe it into another tool."""
+
+    name = 'stdout'
+
+    def write(self, text: str) -> None:
+        sys.stdout.write(text)
+
+    def close(self) -> None:
+        sys.stdout.flush()
+
+
+class CompressedFileSink(Sink):
+    """Write the output to a gzip or zstd compressed file. zstd needs the optional zstandard package."""
+
+    threaded = True
+
+    def __init__(self, path: str, codec: Optional[str] = None):
+        self.name = path
+        self.codec = codec or ('zstd' if path.endswith('.zst') else 'gzip')
+        if self.codec == 'gzip':
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+            return
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise ValueError(f"Writing {path} needs the zstandard package, install it with 'pip install zstandard'") from exc
+        raw = open(path, 'wb')  # pylint: disable=consider-using-with  # Closed with the wrapper in close()
+        self._file = io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding='utf-8')
+
+    def write(self, text: str) -> None:
+        self._file.write(text)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class UnixSocketSink(Sink):
+    """Stream the output as UTF-8 to a local Unix domain socket, e.g. an editor plugin listening for context."""
+
+    threaded = True
+
+    def __init__(self, path: str):
+        self.name = f"unix:{path}"
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(Settings.SINK_SOCKET_TIMEOUT_SECONDS)
+        self._socket.connect(path)
+
+    def write(self, text: str) -> None:
+        self._socket.sendall(text.encode('utf-8'))
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+class HttpSink(Sink):
+    """POST the output to an HTTP endpoint with chunked transfer encoding, so it is sent while it is built."""
+
+    threaded = True
+
+    def __init__(self, url: str):
+        import http.client  # Only loaded when used, it pulls in the email package
+        self.name = url
+        parts = urlsplit(url)
+        if not parts.hostname:
+            raise ValueError(f"Sink URL without a host: {url}")
+        self._connection = http.client.HTTPConnection(parts.hostname, parts.port or 80,
+                                                      timeout=Settings.SINK_SOCKET_TIMEOUT_SECONDS)
+        self._connection.putrequest('POST', (parts.path or '/') + (f'?{parts.query}' if parts.query else ''))
+        self._connection.putheader('Content-Type', 'text/plain; charset=utf-8')
+        self._connection.putheader('Transfer-Encoding', 'chunked')
+        self._connection.endheaders()
+
+    def write(self, text: str) -> None:
+        data = text.encode('utf-8')
+        if data:
+            self._connection.send(b'%x\r\n%s\r\n' % (len(data), data))
+
+    def close(self) -> None:
+        try:
+            self._connection.send(b'0\r\n\r\n')
+            response = self._connection.getresponse()
+            if response.status >= 400:
+                raise OSError(f"{self.name} answered {response.status} {response.reason}")
+        finally:
+            self._connection.close()
+
+    def abort(self) -> None:
+        self._connection.close()  # Without the final chunk, the server sees an incomplete request
+
+
+class ClipboardSink(Sink):
+    """
+    Collect the output and copy it to the clipboard on a background thread once it is complete. Outputs over
+    max_chars are not copied, nor is anything copied where no clipboard is reachable, e.g. over SSH.
+    """
+
+    name = 'clipboard'
+
+    def __init__(self, max_chars: int = Settings.CLIPBOARD_MAX_CHARS, metrics: Optional[RunMetrics] = None):
+        self.max_chars = max_chars
+        self.too_large = False
+        self._metrics = metrics
+        self._parts: List[str] = []
+        self._size = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, text: str) -> None:
+        if self.too_large:
+            return
+        self._size += len(text)
+        if self._size > self.max_chars:
+            self.too_large = True
+            self._parts = []
+            logging.warning(f"Output exceeds {self.max_chars} characters and is not copied to the clipboard")
+            return
+        self._parts.append(text)
+
+    def close(self) -> None:
+        if self.too_large or not self._parts:
+            return
+        if not self.clipboard_available():
+            logging.info("No display available, output is not copied to the clipboard")
+            return
+        content, self._parts = ''.join(self._parts), []
+        self._thread = threading.Thread(target=self._copy, args=(content,), name='gptize-clipboard', daemon=True)
+        self._thread.start()
+
+    def abort(self) -> None:
+        self._parts = []
+
+    def _copy(self, content: str) -> None:
+        if self._metrics is None:
+            self.copy(content)
+            return
+        with self._metrics.phase('clipboard'):
+            self.copy(content)
+
+    def wait(self, timeout: Optional[float] = Settings.CLIPBOARD_TIMEOUT_SECONDS) -> bool:
+        """
+        Wait for the copy to finish. Returns False if it is still running after timeout seconds.
+        """
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logging.warning(f"Copying to the clipboard did not finish within {timeout} seconds")
+            return False
+        return True
+
+    @staticmethod
+    def clipboard_available() -> bool:
+        """
+        False on Linux without an X11 or Wayland display, where clipboard tools fail or hang. WSL uses clip.exe.
+        """
+        if not sys.platform.startswith('linux'):
+            return True
+        if os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'):
+            return True
+        return 'microsoft' in os.uname().release.lower()
+
+    @staticmethod
+    def copy(content: str) -> None:
+        """
+        Copy content to the clipboard, falling back to xclip when the default tool is missing.
+        """
+        import pyperclip
+        try:
+            pyperclip.copy(content)
+        except FileNotFoundError:
+            logging.warning("Clipboard tool 'clip.exe' not found.")
+            try:
+                logging.info("Attempting to use 'xclip' as the clipboard tool.")
+                pyperclip.set_clipboard("xclip")
+                pyperclip.copy(content)
+            except Exception:
+                logging.warning("Failed to copy content to clipboard even with 'xclip'")
+        except pyperclip.PyperclipException as e:
+            logging.warning(f"Failed to copy content to clipboard: {e}")
+
+
+def output_path(spec: str) -> Optional[str]:
+    """
+    The file a command line destination writes to, or None for stdout, the clipboard, sockets and URLs.
+    """
+    if spec in ('-', 'clipboard') or spec.startswith(('unix:', 'http://')):
+        return None
+    return spec
+
+
+def create_sink(spec: str, metrics: Optional[RunMetrics] = None) -> Sink:
+    """
+    Create a sink from a command line destination: '-' for stdout, 'clipboard', 'unix:PATH', an http:// URL,
+    or a file path, compressed when it ends with .gz or .zst. The clipboard copy is timed in metrics.
+    """
+    if spec == '-':
+        return StdoutSink()
+    if spec == 'clipboard':
+        return ClipboardSink(metrics=metrics)
+    if spec.startswith('unix:'):
+        return UnixSocketSink(spec[len('unix:'):])
+    if spec.startswith('http://'):
+        return HttpSink(spec)
+    if spec.endswith(('.gz', '.zst')):
+        return CompressedFileSink(spec)
+    return FileSink(spec)
+
+
+def create_sinks(specs: List[str], metrics: Optional[RunMetrics] = None) -> List[Sink]:
+    """
+    Create a sink for each command line destination. If one cannot be opened, the sinks opened before it
+    are closed and the error is raised.
+    """
+    sinks: List[Sink] = []
+    try:
+        for spec in specs:
+            sinks.append(create_sink(spec, metrics))
+    except Exception:
+        for sink in sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logging.debug(f"Closing {sink.name} failed: {e}")
+        raise
+    return sinks
+
+
+class SinkGroup:
+    """
+    Fan the streamed output out to several sinks. Writes are gathered into blocks of Settings.SINK_BLOCK_CHARS;
+    threaded sinks get the blocks through a bounded queue and write them on their own thread, the others
+    are written directly. A failing sink is logged, aborted and dropped without stopping the others, and kept
+    in failed. Leaving the group with an exception aborts all sinks, so no incomplete output is delivered.
+    """
+
+    def __init__(self, sinks: Sequence[Sink]):
+        self.sinks = list(sinks)
+        self._writers: List[Optional[Union[Sink, _BackgroundWriter]]] = [_BackgroundWriter(sink) if sink.threaded else sink for sink in sinks]
+        self.failed: List[Sink] = []
+        self._buffer: List[str] = []
+        self._buffered = 0
+
+    def write(self, text: str) -> int:
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= Settings.SINK_BLOCK_CHARS:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        block, self._buffer, self._buffered = ''.join(self._buffer), [], 0
+        for index, writer in enumerate(self._writers):
+            if writer is None:
+                continue
+            try:
+                writer.write(block)
+            except Exception as e:
+                self._fail(index, e)
+
+    def close(self) -> None:
+        self.flush()
+        for index, writer in enumerate(self._writers):
+            if writer is None:
+                continue
+            try:
+                writer.close()
+            except Exception as e:
+                self._fail(index, e)
+
+    def abort(self) -> None:
+        """
+        Discard the buffered output and abort all sinks, e.g. when building the output failed.
+        """
+        self._buffer, self._buffered = [], 0
+        for index in range(len(self._writers)):
+            self._abort(index)
+
+    def _fail(self, index: int, error: Exception) -> None:
+        logging.error(f"Writing the output to {self.sinks[index].name} failed: {error}")
+        self.failed.append(self.sinks[index])
+        self._abort(index)
+
+    def _abort(self, index: int) -> None:
+        writer, self._writers[index] = self._writers[index], None
+        if writer is None:
+            return
+        try:
+            writer.abort()
+        except Exception as e:
+            logging.debug(f"Aborting {self.sinks[index].name} failed: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __repr__(self):
+        return f"<SinkGroup {', '.join(sink.name for sink in self.sinks)}>"
+
+
+class _BackgroundWriter:
+    def __init__(self, sink: Sink):
+        self._sink = sink
+        self._error: Optional[Exception] = None
+        self._aborted = False
+        self._queue: queue.Queue = queue.Queue(maxsize=Settings.SINK_QUEUE_BLOCKS)
+        self._thread = threading.Thread(target=self._run, name=f'gptize-sink-{sink.name}', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            block = self._queue.get()
+            if block is None:
+                break
+            if self._error is None and not self._aborted:  # Keep draining after a failure so the producer never blocks
+                try:
+                    self._sink.write(block)
+                except Exception as e:
+                    self._error = e
+        try:
+            if self._aborted:
+                self._sink.abort()
+            else:
+                self._sink.close()
+        except Exception as e:
+            self._error = self._error or e
+
+    def write(self, block: str) -> None:
+        if self._error is not None:
+            raise self._error
+        self._queue.put(block)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def abort(self) -> None:
+        self._aborted = True
+        self._queue.put(None)
+        self._thread.join()
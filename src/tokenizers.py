@@ -0,0 +1,305 @@
+import bisect
+import hashlib
+import logging
+import os
+import random
+import shutil
+import statistics
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+from .metrics import RunMetrics
+from .models import File
+from .settings import Settings
+
+# Byte classes of the heuristic estimator: word characters (ASCII letters, digits, underscore), line breaks and
+# punctuation. Each table maps the bytes of one class to b'c' and all other bytes to b'.', so that the runs of the
+# class can be counted with a single bytes.count(b'c.')
+_WORD_BYTES = bytes(byte for byte in range(128) if chr(byte).isalnum() or byte == ord('_'))
+_LINE_BREAK_BYTES = b'\r\n'
+_PUNCTUATION_BYTES = bytes(byte for byte in range(128)
+                           if byte not in _WORD_BYTES and byte not in _LINE_BREAK_BYTES and byte not in b' \t')
+_ASCII_BYTES = bytes(range(128))
+
+
+def _class_table(members: bytes) -> bytes:
+    return bytes(ord('c') if byte in members else ord('.') for byte in range(256))
+
+
+_WORD_TABLE = _class_table(_WORD_BYTES)
+_LINE_BREAK_TABLE = _class_table(_LINE_BREAK_BYTES)
+_PUNCTUATION_TABLE = _class_table(_PUNCTUATION_BYTES)
+
+
+class ModelProfile:
+    """Tokenizer encoding and context window size of a model."""
+
+    def __init__(self, name: str, encoding: str, context_window: int):
+        self.name = name
+        self.encoding = encoding
+        self.context_window = context_window
+
+    @classmethod
+    def get(cls, name: str) -> 'ModelProfile':
+        """
+        Return the profile of a model from Settings.MODEL_PROFILES.
+        """
+        if name not in Settings.MODEL_PROFILES:
+            raise ValueError(f"Unknown model {name}, expected one of {', '.join(Settings.MODEL_PROFILES)}")
+        encoding, context_window = Settings.MODEL_PROFILES[name]
+        return cls(name, encoding, context_window)
+
+    def __repr__(self):
+        return f"<ModelProfile {self.name} {self.encoding} {self.context_window} tokens>"
+
+
+class Tokenizer(ABC):
+    """Base class of the token counting backends."""
+
+    name = 'none'
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @property
+    def error_bound(self) -> Optional[float]:
+        """
+        Relative error of the counts, e.g. 0.1 when they are within 10% of the exact count. 0 for exact backends,
+        None for estimates without a known bound.
+        """
+        return 0.0
+
+    @abstractmethod
+    def count(self, texts: List[str], jobs: int = 1) -> List[int]:
+        """
+        Count the tokens of each text.
+        """
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+
+class TiktokenTokenizer(Tokenizer):
+    """Exact counts with a tiktoken encoding. tiktoken is imported and the BPE ranks are loaded on first use."""
+
+    def __init__(self, encoding_name: str = Settings.TOKEN_MODEL_NAME, encoder_file: Optional[str] = None):
+        self.name = encoding_name
+        self.encoder_file = encoder_file
+        self._encoder = None
+        self._encoder_loaded = False
+        self._encoder_lock = threading.Lock()
+
+    @property
+    def encoder(self):
+        """
+        The tiktoken encoder, or None if it failed to load.
+        """
+        if not self._encoder_loaded:
+            with self._encoder_lock:
+                if not self._encoder_loaded:
+                    self._encoder = self.load_encoder()
+                    self._encoder_loaded = True
+        return self._encoder
+
+    @property
+    def available(self) -> bool:
+        return self.encoder is not None
+
+    def load_encoder(self):
+        """
+        Load the tiktoken encoder, from the file given with encoder_file or from the tiktoken cache.
+        """
+        try:
+            if self.encoder_file:
+                self.install_encoder_file(self.encoder_file, self.name)
+            if os.path.isdir(Settings.encoder_cache_dir()):
+                os.environ.setdefault('TIKTOKEN_CACHE_DIR', Settings.encoder_cache_dir())
+            logging.info(f"Loading tiktoken {self.name} model")
+            import tiktoken
+            encoder = tiktoken.get_encoding(self.name)
+            logging.info(f"Loading tiktoken {self.name} model complete")
+            return encoder
+        except Exception as e:
+            logging.error(f"Failed to initialize tiktoken encoder: {e}")
+            return None
+
+    @staticmethod
+    def install_encoder_file(path: str, encoding_name: str) -> None:
+        """
+        Verify a local BPE rank file against the pinned hash of the encoding and place it where tiktoken
+        looks it up, so the encoder loads without network access.
+        """
+        if encoding_name not in Settings.ENCODER_FILES:
+            raise ValueError(f"No pinned encoder file for {encoding_name}")
+        url, expected_hash = Settings.ENCODER_FILES[encoding_name]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if digest != expected_hash:
+            raise ValueError(f"Encoder file {path} does not match the pinned {encoding_name} hash")
+        cache_dir = Settings.encoder_cache_dir()
+        cache_path = os.path.join(cache_dir, hashlib.sha1(url.encode()).hexdigest())
+        if not os.path.exists(cache_path):
+            os.makedirs(cache_dir, exist_ok=True)
+            shutil.copyfile(path, cache_path)
+            logging.info(f"Encoder file {path} installed to {cache_path}")
+
+    def count(self, texts: List[str], jobs: int = 1) -> List[int]:
+        if self.encoder is None:
+            return [0] * len(texts)
+        if len(texts) == 1:
+            return [len(self.encoder.encode_ordinary(texts[0]))]
+        return [len(tokens) for tokens in self.encoder.encode_ordinary_batch(texts, num_threads=jobs)]
+
+
+class HeuristicTokenizer(Tokenizer):
+    """
+    Estimate counts from byte class statistics, without a vocabulary. Bytes are mapped to classes with
+    bytes.translate and counted with bytes.count, so a text is scanned at C speed a few times over.
+    """
+
+    name = 'heuristic'
+    CHARS_PER_WORD_TOKEN = 4  # Letters and digits per token, at least one token per word
+    CHARS_PER_SYMBOL_TOKEN = 3  # Punctuation characters per token after the first of a run
+    LINE_BREAK_TOKENS = 0.5  # Line breaks often merge with preceding punctuation or following indentation
+    BYTES_PER_NON_ASCII_TOKEN = 3
+
+    @property
+    def error_bound(self) -> Optional[float]:
+        return None  # A rough estimate, its error depends on the language and style of the text
+
+    def count(self, texts: List[str], jobs: int = 1) -> List[int]:
+        return [self.estimate(text) for text in texts]
+
+    def estimate(self, text: str) -> int:
+        """
+        Words and punctuation runs start a token each, longer runs add tokens by length; spaces merge with the
+        following word.
+        """
+        if not text:
+            return 0
+        data = text.encode('utf-8', 'replace')
+        words, word_chars = self._runs(data, _WORD_TABLE, _WORD_BYTES)
+        symbols, symbol_chars = self._runs(data, _PUNCTUATION_TABLE, _PUNCTUATION_BYTES)
+        line_breaks, _ = self._runs(data, _LINE_BREAK_TABLE, _LINE_BREAK_BYTES)
+        non_ascii_bytes = len(data.translate(None, _ASCII_BYTES))
+        estimate = sum((
+            max(words, word_chars / self.CHARS_PER_WORD_TOKEN),
+            symbols + (symbol_chars - symbols) / self.CHARS_PER_SYMBOL_TOKEN,
+            line_breaks * self.LINE_BREAK_TOKENS,
+            non_ascii_bytes / self.BYTES_PER_NON_ASCII_TOKEN,
+        ))
+        return max(1, round(estimate))
+
+    @staticmethod
+    def _runs(data: bytes, table: bytes, members: bytes) -> Tuple[int, int]:
+        """Number of runs and number of bytes of a class."""
+        classes = data.translate(table)
+        return classes.count(b'c.') + classes.endswith(b'c'), len(data) - len(data.translate(None, members))
+
+
+class SampledTokenizer(Tokenizer):
+    """
+    Estimate counts by tokenizing random line-aligned slices with an exact tokenizer and extrapolating
+    the tokens per character to the whole batch. Batches smaller than the sample are counted exactly.
+    """
+
+    def __init__(self, exact: TiktokenTokenizer, samples: int = Settings.TOKEN_SAMPLE_COUNT,
+                 slice_chars: int = Settings.TOKEN_SAMPLE_CHARS, seed: int = 0):
+        self.exact = exact
+        self.name = f"sampled-{exact.name}"
+        self.samples = samples
+        self.slice_chars = slice_chars
+        self.seed = seed
+        self._error_bound = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.exact.available
+
+    @property
+    def error_bound(self) -> Optional[float]:
+        """
+        Largest 95% confidence bound of the tokens per character over the batches estimated so far.
+        """
+        return self._error_bound
+
+    def count(self, texts: List[str], jobs: int = 1) -> List[int]:
+        offsets = [0]
+        for text in texts:
+            offsets.append(offsets[-1] + len(text))
+        total = offsets[-1]
+        if total <= self.samples * self.slice_chars:
+            return self.exact.count(texts, jobs)
+
+        rng = random.Random(self.seed)
+        slices = []
+        for _ in range(self.samples):
+            position = rng.randrange(total)
+            index = bisect.bisect_right(offsets, position) - 1
+            text = texts[index]
+            start = text.rfind('\n', 0, position - offsets[index]) + 1
+            end = text.rfind('\n', start, start + self.slice_chars) + 1 or start + self.slice_chars
+            slices.append(text[start:end])
+        slices = [text for text in slices if text]
+        counts = self.exact.count(slices, jobs)
+        ratio = sum(counts) / sum(len(text) for text in slices)
+
+        if len(slices) > 1 and ratio > 0:
+            ratios = [count / len(text) for count, text in zip(counts, slices)]
+            bound = 2 * statistics.stdev(ratios) / ratio / len(slices) ** 0.5
+            self._error_bound = max(self._error_bound, bound)
+        return [round(len(text) * ratio) for text in texts]
+
+
+class TokenCounter:
+    """Count tokens with a tokenizer backend on a number of jobs, timing the work as the tokenize phase."""
+
+    def __init__(self, tokenizer: Optional[Tokenizer], jobs: int = Settings.DEFAULT_JOBS,
+                 metrics: Optional[RunMetrics] = None):
+        self.tokenizer = tokenizer
+        self.jobs = max(1, jobs)
+        self.metrics = metrics or RunMetrics()
+
+    @property
+    def active(self) -> Optional[Tokenizer]:
+        """
+        The tokenizer, or None if tokens are not counted or the tokenizer failed to load.
+        """
+        return self.tokenizer if self.tokenizer is not None and self.tokenizer.available else None
+
+    def count(self, texts: List[str]) -> List[int]:
+        """
+        Count the tokens of each text, e.g. of file contents or output headers.
+        """
+        tokenizer = self.active
+        if not tokenizer:
+            return [0] * len(texts)
+        with self.metrics.phase('tokenize'):
+            return tokenizer.count(texts, self.jobs)
+
+    def count_files(self, files: List[File]) -> None:
+        """
+        Count the tokens of loaded files in batches; tiktoken encodes each batch on its own thread pool.
+        """
+        batch_size = Settings.TOKENIZE_BATCH_SIZE
+        for start in range(0, len(files), batch_size):
+            batch = files[start:start + batch_size]
+            for file, token_count in zip(batch, self.count([file.content for file in batch])):
+                file.stats.token_count = token_count
+
+    def __repr__(self):
+        return f"<TokenCounter {self.tokenizer!r} with {self.jobs} jobs>"
+
+
+def create_tokenizer(kind: str, encoding: str, encoder_file: Optional[str] = None) -> Tokenizer:
+    """
+    Create a tokenizer backend by name: exact, heuristic or sampled.
+    """
+    if kind == 'exact':
+        return TiktokenTokenizer(encoding, encoder_file)
+    if kind == 'heuristic':
+        return HeuristicTokenizer()
+    if kind == 'sampled':
+        return SampledTokenizer(TiktokenTokenizer(encoding, encoder_file))
+    raise ValueError(f"Unknown tokenizer {kind}, expected exact, heuristic or sampled")
@@ -0,0 +1,263 @@
+import ast
+import io
+import json
+import logging
+import os
+import re
+import threading
+import tokenize
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Union
+from .settings import Settings
+
+C_STYLE_EXTENSIONS = {'.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx', '.java', '.c', '.h', '.cc', '.cpp', '.hpp', '.cs',
+                      '.go', '.rs', '.swift', '.kt', '.kts', '.scala', '.php', '.dart'}
+CSS_EXTENSIONS = {'.css', '.scss', '.less'}
+HASH_COMMENT_EXTENSIONS = {'.sh', '.bash', '.zsh', '.rb', '.pl', '.r', '.yml', '.yaml', '.toml', '.ini', '.cfg',
+                           '.conf', '.dockerfile', '.mk'}
+HASH_COMMENT_NAMES = {'Dockerfile', 'Makefile', '.gitignore', '.dockerignore', '.gptignore'}
+COMMENT_EXTENSIONS = {'.py', '.pyi'} | C_STYLE_EXTENSIONS | CSS_EXTENSIONS | HASH_COMMENT_EXTENSIONS
+JSON_EXTENSIONS = {'.json', '.ipynb', '.jsonc', '.geojson'}
+JSON_LOCKFILES = {'package-lock.json', 'composer.lock', 'Pipfile.lock', 'flake.lock'}
+# Source and data files; prose is left alone, apostrophes in it would be read as string quotes
+LITERAL_EXTENSIONS = COMMENT_EXTENSIONS | JSON_EXTENSIONS | {'.xml', '.svg', '.csv', '.tsv', '.sql'}
+
+# String literals are matched first so comment markers inside them are kept
+_C_STYLE_COMMENT = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`)|//[^\n]*|/\*.*?\*/',
+                              re.DOTALL)
+# Only block comments in stylesheets, '//' also appears in unquoted url(http://...) values
+_CSS_COMMENT = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')|/\*.*?\*/', re.DOTALL)
+_HASH_COMMENT_LINE = re.compile(r'^[ \t]*#(?!!).*\n?', re.MULTILINE)
+_TRAILING_WHITESPACE = re.compile(r'[ \t]+$', re.MULTILINE)
+_BLANK_LINE_RUNS = re.compile(r'\n{3,}')
+_NUMBER_SEQUENCE = re.compile(r'(?:-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\s*,\s*){%d,}-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?')
+
+
+class Transform(ABC):
+    """Base class of content transforms. A transform rewrites the content of the files it applies to."""
+
+    name = ''
+
+    def applies(self, file_name: str) -> bool:
+        return True
+
+    @abstractmethod
+    def apply(self, content: str, file_name: str) -> str:
+        """
+        Return the rewritten content of a file this transform applies to.
+        """
+
+    @staticmethod
+    def extension(file_name: str) -> str:
+        return os.path.splitext(file_name)[1].lower()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+
+class WhitespaceTransform(Transform):
+    """Strip trailing whitespace and collapse runs of blank lines into one."""
+
+    name = 'whitespace'
+
+    def applies(self, file_name: str) -> bool:
+        return self.extension(file_name) not in ('.md', '.markdown')  # Trailing spaces are line breaks in Markdown
+
+    def apply(self, content: str, file_name: str) -> str:
+        content = _TRAILING_WHITESPACE.sub('', content)
+        return _BLANK_LINE_RUNS.sub('\n\n', content).strip('\n') + '\n' if content.strip() else ''
+
+
+class CommentTransform(Transform):
+    """Drop comments, and docstrings in Python, from source files."""
+
+    name = 'comments'
+
+    def applies(self, file_name: str) -> bool:
+        extension = self.extension(file_name)
+        return file_name in HASH_COMMENT_NAMES or extension in COMMENT_EXTENSIONS
+
+    def apply(self, content: str, file_name: str) -> str:
+        extension = self.extension(file_name)
+        if extension in ('.py', '.pyi'):
+            return self.strip_python(content)
+        if extension in C_STYLE_EXTENSIONS:
+            return _C_STYLE_COMMENT.sub(lambda match: match.group(1) or '', content)
+        if extension in CSS_EXTENSIONS:
+            return _CSS_COMMENT.sub(lambda match: match.group(1) or '', content)
+        return _HASH_COMMENT_LINE.sub('', content)
+
+    @staticmethod
+    def strip_python(content: str) -> str:
+        """
+        Remove comment tokens and docstrings. Docstrings that are the only statement of a body become '...'.
+        Content that does not parse is returned unchanged.
+        """
+        try:
+            tree = ast.parse(content)
+            comments = [token for token in tokenize.generate_tokens(io.StringIO(content).readline)
+                        if token.type == tokenize.COMMENT]
+        except (SyntaxError, tokenize.TokenError, ValueError):
+            return content
+
+        lines = content.splitlines(keepends=True)
+        for token in reversed(comments):
+            row, column = token.start
+            line = lines[row - 1]
+            code = line[:column].rstrip()
+            lines[row - 1] = code + ('\n' if line.endswith('\n') else '') if code else ''
+
+        docstrings = []
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) and node.body:
+                first = node.body[0]
+                if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and \
+                        isinstance(first.value.value, str):
+                    docstrings.append((first, len(node.body) == 1))
+        for node, only_statement in sorted(docstrings, key=lambda item: item[0].lineno, reverse=True):
+            start, end = node.lineno - 1, node.end_lineno or node.lineno
+            if lines[start][:node.col_offset].strip() or lines[end - 1][node.end_col_offset:].strip():
+                continue  # Shares its lines with other code
+            replacement = [' ' * node.col_offset + '...\n'] if only_statement else []
+            lines[start:end] = replacement
+        return ''.join(lines)
+
+
+class MinifyTransform(Transform):
+    """Minify JSON files, including JSON lockfiles and notebooks."""
+
+    name = 'minify'
+
+    def applies(self, file_name: str) -> bool:
+        return self.extension(file_name) in JSON_EXTENSIONS or file_name in JSON_LOCKFILES
+
+    def apply(self, content: str, file_name: str) -> str:
+        try:
+            return json.dumps(json.loads(content), separators=(',', ':'), ensure_ascii=False) + '\n'
+        except ValueError:
+            return content
+
+
+class LiteralTransform(Transform):
+    """Truncate long string literals and long sequences of numbers, such as embedded data or base64 blobs."""
+
+    name = 'literals'
+
+    def __init__(self, max_chars: int = Settings.TRANSFORM_MAX_LITERAL_CHARS):
+        self.max_chars = max_chars
+        self._string = re.compile(r'(["\'])((?:\\.|(?!\1)[^\\\n]){%d,})\1' % max_chars)
+        self._numbers = re.compile(_NUMBER_SEQUENCE.pattern % (max_chars // 4))
+
+    def applies(self, file_name: str) -> bool:
+        return self.extension(file_name) in LITERAL_EXTENSIONS or file_name in JSON_LOCKFILES | HASH_COMMENT_NAMES
+
+    def apply(self, content: str, file_name: str) -> str:
+        keep = self.max_chars // 4
+        content = self._string.sub(
+            lambda match: f"{match.group(1)}{match.group(2)[:keep]}...[{len(match.group(2)) - keep} chars truncated]"
+                          f"{match.group(1)}", content)
+        return self._numbers.sub(self._truncate_numbers, content)
+
+    def _truncate_numbers(self, match) -> str:
+        items = match.group(0).split(',')
+        keep = self.max_chars // 16
+        return ','.join(items[:keep]) + f", ...{len(items) - keep} more"
+
+
+class OutlineTransform(Transform):
+    """Reduce Python modules to imports, class and function signatures and the first docstring lines."""
+
+    name = 'outline'
+
+    def applies(self, file_name: str) -> bool:
+        return self.extension(file_name) in ('.py', '.pyi')
+
+    def apply(self, content: str, file_name: str) -> str:
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            return content
+        lines: List[str] = []
+        self._outline(tree.body, 0, lines)
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def _outline(self, body: List[ast.stmt], depth: int, lines: List[str]) -> None:
+        indent = '    ' * depth
+        for node in body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)) and depth == 0:
+                lines.append(ast.unparse(node))
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and depth <= 1:
+                if isinstance(node, ast.AnnAssign):
+                    lines.append(indent + ast.unparse(ast.AnnAssign(node.target, node.annotation, None, node.simple)))
+                else:
+                    lines.append(indent + ' = '.join(ast.unparse(target) for target in node.targets) + ' = ...')
+            elif isinstance(node, ast.ClassDef):
+                lines.extend(indent + '@' + ast.unparse(decorator) for decorator in node.decorator_list)
+                bases = [ast.unparse(base) for base in node.bases] + [ast.unparse(keyword) for keyword in node.keywords]
+                lines.append(f"{indent}class {node.name}{'(' + ', '.join(bases) + ')' if bases else ''}:")
+                size = len(lines)
+                self._docstring(node, depth + 1, lines)
+                self._outline(node.body, depth + 1, lines)
+                if len(lines) == size:
+                    lines.append(indent + '    ...')
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                lines.extend(indent + '@' + ast.unparse(decorator) for decorator in node.decorator_list)
+                prefix = 'async def' if isinstance(node, ast.AsyncFunctionDef) else 'def'
+                returns = f" -> {ast.unparse(node.returns)}" if node.returns else ''
+                lines.append(f"{indent}{prefix} {node.name}({ast.unparse(node.args)}){returns}:")
+                self._docstring(node, depth + 1, lines)
+                lines.append(indent + '    ...')
+
+    @staticmethod
+    def _docstring(node: Union[ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef], depth: int, lines: List[str]) -> None:
+        docstring = ast.get_docstring(node)
+        if docstring:
+            lines.append('    ' * depth + '"""' + docstring.strip().splitlines()[0] + '"""')
+
+
+TRANSFORMS = {transform.name: transform for transform in (
+    OutlineTransform, CommentTransform, LiteralTransform, MinifyTransform, WhitespaceTransform)}
+
+
+class TransformPipeline:
+    """
+    Apply the selected transforms to file contents in a fixed order (outline, comments, literals, minify,
+    whitespace) and count the characters each one removes. Safe to use from several threads.
+    """
+
+    def __init__(self, names: List[str]):
+        unknown = [name for name in names if name not in TRANSFORMS]
+        if unknown:
+            raise ValueError(f"Unknown transforms {', '.join(unknown)}, expected some of {', '.join(TRANSFORMS)}")
+        self.transforms = [transform() for name, transform in TRANSFORMS.items() if name in names]
+        self.chars_saved: Dict[str, int] = {transform.name: 0 for transform in self.transforms}
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return '+'.join(transform.name for transform in self.transforms)
+
+    def apply(self, content: str, file_name: str, record: bool = True) -> Optional[str]:
+        """
+        Return the transformed content, or None if no transform applies to the file.
+        With record set, the characters removed are added to chars_saved.
+        """
+        result = None
+        for transform in self.transforms:
+            if not transform.applies(file_name):
+                continue
+            before = content if result is None else result
+            try:
+                result = transform.apply(before, file_name)
+            except Exception as e:
+                logging.warning(f"Transform {transform.name} failed for {file_name}: {e}")
+                result = before
+                continue
+            if not record:
+                continue
+            with self._lock:
+                self.chars_saved[transform.name] += len(before) - len(result)
+        return result
+
+    def __repr__(self):
+        return f"<TransformPipeline {self.name}>"
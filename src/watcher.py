@@ -0,0 +1,185 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from .gptizer import GPTizer
+from .models import File
+from .settings import Settings
+from .sinks import SinkGroup, create_sinks, output_path
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyChangeSource:
+    """Report changed paths using Linux inotify watches on the project directories."""
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: Dict[int, str] = {}
+
+    def update(self, gptizer: GPTizer) -> None:
+        """Watch every directory of the project; already watched directories are not added twice."""
+        for directory in gptizer.scanner.scanned_directories:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                logging.warning(f"Could not watch {directory}: {os.strerror(ctypes.get_errno())}")
+                continue
+            self._directories[wd] = directory
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        """Wait up to timeout seconds (forever if None) and return the paths touched in the meantime."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        data = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                changed.add('')
+            elif wd in self._directories:
+                changed.add(os.path.join(self._directories[wd], name))
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def __repr__(self):
+        return f"<InotifyChangeSource watching {len(self._directories)} directories>"
+
+
+class PollingChangeSource:
+    """Report changed paths by periodically comparing file sizes and modification times."""
+
+    def __init__(self, interval: float = Settings.WATCH_POLL_INTERVAL_SECONDS):
+        self.interval = interval
+        self._gptizer: Optional[GPTizer] = None
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+
+    def update(self, gptizer: GPTizer) -> None:
+        """Take the files of the freshly processed project as the baseline."""
+        self._gptizer = gptizer
+        self._snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        if self._gptizer is None:
+            return {}
+        return {file.directory: (file.metadata.size, file.metadata.mtime_ns)
+                for file in self._gptizer.scanner.iter_candidate_files()}
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        """Poll until something changed, or once after timeout seconds, and return the changed paths."""
+        while True:
+            time.sleep(self.interval if timeout is None else timeout)
+            snapshot = self._take_snapshot()
+            changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                       if snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = snapshot
+            if changed or timeout is not None:
+                return changed
+
+    def close(self) -> None:
+        pass
+
+    def __repr__(self):
+        return f"<PollingChangeSource every {self.interval}s>"
+
+
+class ProjectWatcher:
+    """
+    Keep a resident GPTizer with its encoder and per-file stats and rewrite the output whenever project files change.
+    Only touched files are tokenized again; changes are debounced and coalesced into one rebuild. The output is
+    written to every destination in outputs, given as on the command line, e.g. a path, '-' or 'clipboard'.
+    """
+
+    def __init__(self, gptizer: GPTizer, target: str, repo_root: str, gptize_ignore: str, outputs: Sequence[str],
+                 *, use_polling: bool = False):
+        self.gptizer = gptizer
+        self.target = target
+        self.repo_root = repo_root
+        self.gptize_ignore = gptize_ignore
+        self.outputs = list(outputs)
+        self.source = PollingChangeSource() if use_polling else self._default_source()
+        self._files: List[File] = []
+
+    @property
+    def output_paths(self) -> Set[str]:
+        """Absolute paths of the output files, which are not part of the project."""
+        return {os.path.abspath(path) for path in map(output_path, self.outputs) if path is not None}
+
+    @staticmethod
+    def _default_source():
+        try:
+            return InotifyChangeSource()
+        except (OSError, AttributeError) as e:
+            logging.info(f"inotify is not available ({e}), polling for changes instead")
+            return PollingChangeSource()
+
+    def rebuild(self) -> None:
+        """Rescan the project, reuse stats of unchanged files and rewrite the output."""
+        start = time.perf_counter()
+        self.gptizer.scan_directory(self.target, self.repo_root, self.gptize_ignore)
+        output_paths = self.output_paths
+        self.gptizer.project.files = [file for file in self.gptizer.project.files
+                                      if os.path.abspath(file.directory) not in output_paths]
+        self.gptizer.reuse_stats(self._files)
+        self._files = self.gptizer.project.files
+        with SinkGroup(create_sinks(self.outputs, self.gptizer.metrics)) as output:
+            self.gptizer.write_output(output)
+        self.source.update(self.gptizer)
+        logging.info(f"Output {', '.join(self.outputs)} regenerated in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def wait_for_changes(self, debounce: float = Settings.WATCH_DEBOUNCE_SECONDS) -> Set[str]:
+        """Block until project files change, then keep collecting changes until none arrive for debounce seconds."""
+        while True:
+            changed = self.source.wait(None)
+            while True:
+                more = self.source.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+            changed = {os.path.abspath(path) for path in changed}
+            changed -= self.output_paths
+            if changed:
+                return changed
+
+    def run(self) -> None:
+        """Build the output once, then rebuild it on every change until interrupted."""
+        self.rebuild()
+        logging.info(f"Watching {self.target} for changes with {self.source!r}, press Ctrl+C to stop")
+        try:
+            while True:
+                changed = self.wait_for_changes()
+                logging.info(f"{len(changed)} paths changed")
+                self.rebuild()
+        except KeyboardInterrupt:
+            logging.info("Watch mode stopped")
+        finally:
+            self.source.close()
+
+    def __repr__(self):
+        return f"<ProjectWatcher {self.target} -> {', '.join(self.outputs)}>"
@@ -1,6 +1,41 @@
 from typing import List
+import pyperclip
 import pytest
+import tiktoken
 
 pytest_plugins: List[str] = [
     'mock',
 ]
+
+
+class FakeEncoder:
+    """Whitespace tokenizer standing in for tiktoken, which needs network access to load."""
+    calls = 0
+
+    def encode_ordinary(self, text):
+        FakeEncoder.calls += 1
+        return text.split()
+
+    def encode_ordinary_batch(self, texts, num_threads=1):
+        return [self.encode_ordinary(text) for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def fake_encoder(monkeypatch):
+    FakeEncoder.calls = 0
+    monkeypatch.setattr(tiktoken, 'get_encoding', lambda name: FakeEncoder())
+    monkeypatch.setattr(pyperclip, 'copy', lambda content: None)
+    return FakeEncoder
+
+
+@pytest.fixture
+def project_dir(tmp_path):
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src' / 'app.py').write_text('import os\n\nprint(os.getcwd())\n', encoding='utf-8')
+    (tmp_path / 'src' / 'legacy.txt').write_bytes('caf\xe9 au lait\n'.encode('latin-1'))
+    (tmp_path / 'README.md').write_text('# Demo\nSome words here', encoding='utf-8')
+    (tmp_path / 'image.bin').write_bytes(b'\x89PNG\0\0\0')
+    (tmp_path / 'build').mkdir()
+    (tmp_path / 'build' / 'out.txt').write_text('generated\n', encoding='utf-8')
+    (tmp_path / '.gitignore').write_text('build/\n', encoding='utf-8')
+    return tmp_path
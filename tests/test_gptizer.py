@@ -0,0 +1,453 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+import pytest
+from src.cache import LastRunManifest, StatsCache
+from src.git_metadata import GitChanges
+from src.gptizer import GPTizer
+from src.models import File, FileMetadata
+from src.output_builder import OutputBuilder
+from src.reader import FileReader
+from src.settings import Limits, Settings
+from src.tokenizers import HeuristicTokenizer, TiktokenTokenizer
+
+
+def run(project_dir, **kwargs):
+    gptizer = GPTizer(**kwargs)
+    gptizer.process_directory(str(project_dir), str(project_dir), '.gptignore')
+    return gptizer
+
+
+class TestGPTizer:
+    def test_ignored_and_binary_files(self, project_dir):
+        gptizer = run(project_dir)
+        names = sorted(file.file_name for file in gptizer.project.files)
+        assert 'out.txt' not in names
+        binary = [file for file in gptizer.project.files if file.is_binary]
+        assert [file.file_name for file in binary] == ['image.bin']
+
+    def test_stats(self, project_dir):
+        gptizer = run(project_dir)
+        readme = next(file for file in gptizer.project.files if file.file_name == 'README.md')
+        assert readme.stats.line_count == 2
+        assert readme.stats.char_count == len('# Demo\nSome words here')
+        assert readme.stats.token_count == 5
+
+    def test_metadata_is_formatted_when_written(self, project_dir):
+        os.chmod(project_dir / 'README.md', 0o640)
+        os.utime(project_dir / 'README.md', ns=(1700000000123456789, 1700000000123456789))
+        gptizer = run(project_dir)
+        readme = next(file for file in gptizer.project.files if file.file_name == 'README.md')
+        assert readme.metadata.mtime_ns == 1700000000123456789
+        assert readme.metadata.permissions == '640'
+        assert f"Last Modified: {datetime.fromtimestamp(1700000000).replace(microsecond=123456).isoformat()}\n" in gptizer.combine_files()
+        with pytest.raises(AttributeError):
+            readme.unknown = True
+
+    def test_parallel_output_matches_serial(self, project_dir):
+        serial = run(project_dir).combine_files()
+        parallel_gptizer = run(project_dir, jobs=4)
+        assert parallel_gptizer.combine_files() == serial
+        assert sum(file.stats.token_count for file in parallel_gptizer.project.files) > 0
+
+    @pytest.mark.parametrize('jobs', [1, 4])
+    def test_cache_skips_tokenization_of_unchanged_files(self, project_dir, tmp_path_factory, jobs, fake_encoder):
+        cache_path = str(tmp_path_factory.mktemp('cache') / 'stats.sqlite3')
+        first = run(project_dir, jobs=jobs, cache=StatsCache(cache_path))
+        expected = first.combine_files()
+
+        fake_encoder.calls = 0
+        second = run(project_dir, jobs=jobs, cache=StatsCache(cache_path))
+        assert fake_encoder.calls == 0
+        assert second.combine_files() == expected
+        assert [f.stats.token_count for f in second.project.files] == [f.stats.token_count for f in first.project.files]
+
+        (project_dir / 'README.md').write_text('# Demo\nchanged', encoding='utf-8')
+        third = run(project_dir, jobs=jobs, cache=StatsCache(cache_path))
+        readme = next(file for file in third.project.files if file.file_name == 'README.md')
+        assert readme.stats.token_count == 3
+        assert fake_encoder.calls == 1
+
+    def test_cache_eviction(self, project_dir, tmp_path_factory):
+        cache = StatsCache(str(tmp_path_factory.mktemp('cache') / 'stats.sqlite3'), max_entries=2)
+        run(project_dir, cache=cache)
+        assert cache._connection.execute("SELECT COUNT(*) FROM file_stats").fetchone()[0] == 2
+
+    def test_streamed_output_matches_combined(self, project_dir):
+        expected = run(project_dir).combine_files()
+        gptizer = run(project_dir)
+        sink = io.StringIO()
+        gptizer.write_output(sink)
+        assert sink.getvalue() == expected
+        assert all(file.content == "" for file in gptizer.project.files)
+
+    def test_lazy_scan_matches_eager(self, project_dir):
+        eager = run(project_dir)
+        expected = eager.combine_files()
+        lazy = GPTizer(jobs=2)
+        lazy.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        assert all(file.content == "" for file in lazy.project.files)
+        assert lazy.combine_files() == expected
+        assert [f.stats.token_count for f in lazy.project.files] == [f.stats.token_count for f in eager.project.files]
+
+    def test_fit_to_budget(self, project_dir, fake_encoder):
+        full = run(project_dir)
+        full_tokens = len(fake_encoder().encode_ordinary(full.combine_files()))
+
+        gptizer = GPTizer()
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        gptizer.fit_to_budget(full_tokens - 1, {'*.txt': 0})
+        names = [file.file_name for file in gptizer.project.files]
+        assert 'legacy.txt' not in names
+        assert 'app.py' in names
+        assert len(fake_encoder().encode_ordinary(gptizer.combine_files())) <= full_tokens - 1
+
+    def test_stats_json(self, project_dir, tmp_path_factory):
+        gptizer = GPTizer(limits=Limits(max_file_size=20))
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        gptizer.fit_to_budget(10000, {'*.txt': 0})
+        with open(os.devnull, 'w', encoding='utf-8') as sink:
+            gptizer.write_output(sink)
+        path = tmp_path_factory.mktemp('stats') / 'stats.json'
+        gptizer.write_stats_json(str(path))
+
+        stats = json.loads(path.read_text(encoding='utf-8'))
+        files = {file['path']: file for file in stats['files']}
+        assert files['README.md']['included'] is False and 'per-file limit' in files['README.md']['skip_reason']
+        assert files[os.path.join('src', 'legacy.txt')]['included'] is False
+        assert files['image.bin']['binary'] is True and files['image.bin']['included'] is False
+        assert stats['totals']['included_files'] == sum(file['included'] for file in stats['files'])
+        assert stats['totals']['tokens'] == sum(file['tokens'] for file in stats['files'] if file['included'])
+        assert set(stats['timings']) == {'walk', 'ignore', 'read', 'decode', 'transform', 'tokenize', 'git', 'build',
+                                         'write', 'clipboard'}
+        assert stats['timings']['walk'] > 0 and stats['timings']['build'] > 0
+
+    @pytest.mark.parametrize('jobs', [1, 4])
+    def test_identical_files_are_collapsed(self, project_dir, fake_encoder, jobs):
+        (project_dir / 'src' / 'vendored.py').write_bytes((project_dir / 'src' / 'app.py').read_bytes())
+        fake_encoder.calls = 0
+        gptizer = run(project_dir, jobs=jobs)
+        original, duplicate = [file for file in gptizer.project.files if file.file_name in ('app.py', 'vendored.py')]
+        assert duplicate.duplicate_of is original and original.duplicate_of is None
+        assert duplicate.stats.token_count == 0
+        assert fake_encoder.calls == len([file for file in gptizer.project.files if not file.is_binary]) - 1
+
+        output = gptizer.combine_files()
+        assert output.count('print(os.getcwd())') == 1
+        assert f"Identical to: {original.directory}\n" in output
+        assert run(project_dir, jobs=jobs, dedup=False).combine_files().count('print(os.getcwd())') == 2
+
+    def test_near_duplicates_are_written_as_diff(self, project_dir):
+        lines = [f'setting_{index} = {index}\n' for index in range(30)]
+        (project_dir / 'src' / 'config.py').write_text(''.join(lines), encoding='utf-8')
+        lines[10] = 'setting_10 = "changed"\n'
+        (project_dir / 'src' / 'config_copy.py').write_text(''.join(lines), encoding='utf-8')
+
+        gptizer = GPTizer(near_duplicate_threshold=0.8)
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        with io.StringIO() as sink:
+            gptizer.write_output(sink)
+            output = sink.getvalue()
+        original, duplicate = [file for file in gptizer.project.files if file.file_name.startswith('config')]
+        assert duplicate.duplicate_of is original
+        written = output.split(f'File: {duplicate.directory}\n', 1)[1].split(OutputBuilder.SEPARATOR)[0]
+        assert 'Near-duplicate of: ' in written
+        assert '\n-setting_10 = ' in written and '\n+setting_10 = ' in written
+        assert 'setting_20 = 20' not in written
+
+    def test_near_duplicate_sketches_do_not_depend_on_the_hash_seed(self):
+        script = ('from src.dedup import NearDuplicateIndex; '
+                  'print(NearDuplicateIndex(0.8, sketch_size=8).sketch("\\n".join(map(str, range(100)))))')
+        sketches = {subprocess.run([sys.executable, '-c', script], env=dict(os.environ, PYTHONHASHSEED=seed),
+                                   capture_output=True, text=True, check=True).stdout for seed in ('1', '2')}
+        assert len(sketches) == 1
+
+    @pytest.mark.parametrize('jobs', [1, 4])
+    def test_transforms_report_tokens_saved(self, project_dir, jobs):
+        (project_dir / 'src' / 'app.py').write_text('import os  # for getcwd\n\n\n\nprint(os.getcwd())  # cwd\n',
+                                                    encoding='utf-8')
+        gptizer = run(project_dir, jobs=jobs, transforms=['comments', 'whitespace'])
+        app = next(file for file in gptizer.project.files if file.file_name == 'app.py')
+        assert app.content == 'import os\n\nprint(os.getcwd())\n'
+        assert (app.stats.token_count, app.stats.original_token_count, app.stats.tokens_saved) == (3, 8, 5)
+        assert app.stats.line_count == 3
+
+        stats = gptizer.stats_report().stats_manifest()
+        assert stats['transforms']['tokens_saved'] == 5
+        assert stats['transforms']['chars_saved']['comments'] == len('  # for getcwd  # cwd')
+        assert 'for getcwd' not in gptizer.combine_files()
+        assert gptizer.loader.encoder_name == 'o200k_base+comments+whitespace'
+
+    def test_write_parts(self, project_dir, tmp_path_factory, fake_encoder):
+        (project_dir / 'big.txt').write_text(''.join(f'line {i} of the big file\n' for i in range(60)), encoding='utf-8')
+        output_dir = tmp_path_factory.mktemp('parts')
+        gptizer = GPTizer()
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        paths = gptizer.write_parts(str(output_dir / 'out.txt'), 120)
+
+        assert len(paths) > 2
+        assert paths[0].endswith(f'out-part-01-of-{len(paths):02d}.txt')
+        contents = [open(path, encoding='utf-8').read() for path in paths]
+        for index, content in enumerate(contents, start=1):
+            assert len(fake_encoder().encode_ordinary(content)) <= 120
+            assert f"Part: {index} of {len(paths)}\n" in content
+        assert 'Git Status:' in contents[0] and 'Git Status:' not in contents[1]
+        combined = ''.join(contents)
+        assert all(f'line {i} of the big file\n' in combined for i in range(60))
+        assert 'Lines: 1-' in combined
+
+    def test_write_compressed_parts(self, project_dir, tmp_path_factory, fake_encoder):
+        output_dir = tmp_path_factory.mktemp('parts')
+        gptizer = GPTizer()
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        paths = gptizer.write_parts(str(output_dir / 'out.txt.gz'), 120)
+
+        assert paths[0].endswith(f'out-part-01-of-{len(paths):02d}.txt.gz')
+        with gzip.open(paths[0], 'rt', encoding='utf-8') as file:
+            assert f"Part: 1 of {len(paths)}\n" in file.read()
+
+    def test_write_parts_rejects_parts_smaller_than_the_headers(self, project_dir, tmp_path_factory, fake_encoder):
+        output_dir = tmp_path_factory.mktemp('parts')
+        gptizer = GPTizer()
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        with pytest.raises(ValueError, match='part headers alone take'):
+            gptizer.write_parts(str(output_dir / 'out.txt'), 10)
+        assert not list(output_dir.iterdir())
+
+    def test_write_parts_needs_a_tokenizer(self, project_dir, tmp_path_factory):
+        output_dir = tmp_path_factory.mktemp('parts')
+        gptizer = GPTizer(count_tokens=False)
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        with pytest.raises(ValueError, match='needs a tokenizer'):
+            gptizer.write_parts(str(output_dir / 'out.txt'), 120)
+        assert not list(output_dir.iterdir())
+
+    def test_nested_gitignore_and_pruning(self, project_dir):
+        (project_dir / 'src' / '.gitignore').write_text('*.txt\n', encoding='utf-8')
+        (project_dir / 'node_modules' / 'pkg').mkdir(parents=True)
+        (project_dir / 'node_modules' / 'pkg' / 'index.js').write_text('x', encoding='utf-8')
+        (project_dir / '.gitignore').write_text('build/\nnode_modules/\n', encoding='utf-8')
+        gptizer = run(project_dir)
+        names = sorted(file.file_name for file in gptizer.project.files)
+        assert names == ['.gitignore', '.gitignore', 'README.md', 'app.py', 'image.bin']
+
+    def test_git_file_listing(self, project_dir):
+        subprocess.run(['git', 'init', '-q'], cwd=project_dir, check=True)
+        (project_dir / 'notes.log').write_text('ignored by gptignore', encoding='utf-8')
+        (project_dir / '.gptignore').write_text('*.log\n', encoding='utf-8')
+        (project_dir / 'src' / '__pycache__').mkdir()
+        (project_dir / 'src' / '__pycache__' / 'app.cpython-311.pyc').write_bytes(b'\0compiled')
+        subprocess.run(['git', 'add', '-f', os.path.join('src', '__pycache__')], cwd=project_dir, check=True)
+        walked = sorted(os.path.relpath(file.directory, project_dir) for file in run(project_dir).project.files)
+        gptizer = run(project_dir, use_git_index=True)
+        listed = [os.path.relpath(file.directory, project_dir) for file in gptizer.project.files]
+        assert listed == sorted(walked)
+        assert all(file.metadata.size > 0 for file in gptizer.project.files)
+
+    def test_git_file_listing_falls_back_to_walk(self, project_dir, monkeypatch):
+        monkeypatch.setenv('GIT_CEILING_DIRECTORIES', str(project_dir.parent))
+        walked = [file.directory for file in run(project_dir).project.files]
+        assert [file.directory for file in run(project_dir, use_git_index=True).project.files] == walked
+
+    def test_changed_since_git_ref(self, project_dir):
+        def git(*args):
+            subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args),
+                           cwd=project_dir, check=True, capture_output=True)
+        git('init', '-q')
+        git('add', '-A')
+        git('commit', '-q', '-m', 'initial')
+        (project_dir / 'src' / 'app.py').write_text('import os\n\nprint(os.getcwd())\nprint("changed")\n', encoding='utf-8')
+        (project_dir / 'new.txt').write_text('new file\n', encoding='utf-8')
+        (project_dir / 'README.md').unlink()
+
+        gptizer = GPTizer()
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        changes = GitChanges.collect(str(project_dir), 'HEAD', diff_context=1)
+        gptizer.project.keep_changed_files(changes.changed, changes.deleted, changes.diffs)
+        assert sorted(file.file_name for file in gptizer.project.files) == ['app.py', 'new.txt']
+        assert gptizer.project.deleted_files == ['README.md']
+
+        output = gptizer.combine_files()
+        assert '+print("changed")\n' in output
+        assert '\nimport os\n\n' not in output
+        assert 'new file\n' in output
+        assert 'File: README.md (Deleted)\n' in output
+
+    def test_git_metadata(self, project_dir):
+        def git(*args):
+            subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args),
+                           cwd=project_dir, check=True, capture_output=True)
+        git('init', '-q', '-b', 'main')
+        git('add', '-A')
+        git('commit', '-q', '-m', 'initial')
+        git('mv', 'README.md', 'INTRO.md')
+        (project_dir / 'src' / 'app.py').write_text('import sys\n', encoding='utf-8')
+        (project_dir / 'docs').mkdir()
+        (project_dir / 'docs' / 'guide.txt').write_text('guide\n', encoding='utf-8')
+
+        gptizer = GPTizer(git_file_log=True)
+        gptizer.scan_directory(str(project_dir / 'src'), str(project_dir), '.gptignore')
+        status = gptizer.git_status()
+        assert status.startswith('Branch: main\nLast Commit: ') and ' - initial (test, ' in status
+        assert ' M src/app.py\n' in status and 'R  README.md -> INTRO.md\n' in status and '?? docs/' in status
+        assert gptizer.get_git_status() == status
+        files = {file.file_name: file for file in gptizer.project.files}
+        assert files['app.py'].git_state == 'modified in work tree'
+        assert files['legacy.txt'].git_state is None
+        assert files['legacy.txt'].last_commit.subject == 'initial'
+
+        gptizer = run(project_dir)
+        output = gptizer.combine_files()
+        assert 'Git State: renamed in index from README.md\n' in output
+        assert 'Git State: untracked\n' in output
+        assert 'Last Commit: ' not in output.split(OutputBuilder.SEPARATOR, 3)[3]
+
+    def test_changed_since_last_run(self, project_dir, tmp_path_factory, monkeypatch):
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path_factory.mktemp('cache')))
+        manifest = LastRunManifest(str(project_dir))
+        gptizer = GPTizer()
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        manifest.select_changed(gptizer.project)
+        assert len(gptizer.project.files) == 5
+        manifest.save_run(gptizer.project)
+
+        (project_dir / 'README.md').write_text('# Demo\nchanged', encoding='utf-8')
+        (project_dir / 'src' / 'legacy.txt').unlink()
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        LastRunManifest(str(project_dir)).select_changed(gptizer.project)
+        assert [file.file_name for file in gptizer.project.files] == ['README.md']
+        assert gptizer.project.deleted_files == [os.path.join('src', 'legacy.txt')]
+
+    def test_files_left_out_are_changed_again_next_run(self, project_dir, tmp_path_factory, monkeypatch):
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path_factory.mktemp('cache')))
+        (project_dir / 'big.txt').write_text('many words ' * 50, encoding='utf-8')
+        gptizer = GPTizer(limits=Limits(max_file_size=100))
+        manifest = LastRunManifest(str(project_dir))
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        manifest.select_changed(gptizer.project)
+        gptizer.combine_files()
+        manifest.save_run(gptizer.project)
+
+        gptizer = GPTizer()
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        LastRunManifest(str(project_dir)).select_changed(gptizer.project)
+        assert [file.file_name for file in gptizer.project.files] == ['big.txt']
+
+    def test_file_size_limits_skip_files_before_reading(self, project_dir, monkeypatch):
+        opened = []
+        read_file_content = FileReader.read_file_content
+        monkeypatch.setattr(FileReader, 'read_file_content',
+                            lambda self, file: opened.append(file.file_name) or read_file_content(self, file))
+        gptizer = run(project_dir, limits=Limits(max_file_size=20))
+        names = sorted(file.file_name for file in gptizer.project.files)
+        assert 'README.md' not in names and 'app.py' not in names
+        assert 'README.md' not in opened
+
+        gptizer = run(project_dir, limits=Limits(max_file_tokens=4, estimate_tokens=True))
+        assert 'README.md' not in [file.file_name for file in gptizer.project.files]
+
+        (project_dir / 'big.txt').write_text('x' * 400, encoding='utf-8')
+        opened.clear()
+        gptizer = run(project_dir, limits=Limits(max_total_tokens=50, estimate_tokens=True))
+        skipped = [file.file_name for file in gptizer.project.excluded_files if 'by estimate' in file.skip_reason]
+        assert 'big.txt' in skipped and 'big.txt' not in opened
+
+    def test_token_limits(self, project_dir, fake_encoder):
+        gptizer = run(project_dir, limits=Limits(max_file_tokens=4))
+        skipped = [file.file_name for file in gptizer.project.files if file.skip_reason]
+        assert skipped == ['README.md']
+        assert 'Some words here' not in gptizer.combine_files()
+
+        gptizer = run(project_dir, limits=Limits(max_total_tokens=2))
+        assert all(file.skip_reason for file in gptizer.project.files if not file.is_binary)
+        output = gptizer.combine_files()
+        assert '# Demo' not in output and 'print(os.getcwd())' not in output
+
+    @pytest.mark.parametrize('jobs', [1, 4])
+    def test_nothing_is_tokenized_after_the_total_token_limit(self, tmp_path, fake_encoder, jobs):
+        for index in range(50):
+            (tmp_path / f'module{index}.txt').write_text(f'alpha beta {index}\n', encoding='utf-8')
+        gptizer = run(tmp_path, jobs=jobs, limits=Limits(max_total_tokens=10))
+        counted = [file for file in gptizer.project.files if not file.skip_reason]
+        assert len(counted) == 3
+        assert fake_encoder.calls == len(counted) + 1  # The file crossing the limit is the last one tokenized
+        assert sum(file.encoding is not None for file in gptizer.project.files) <= len(counted) + 1
+
+    def test_total_token_limit_is_the_same_in_parallel(self, tmp_path, fake_encoder):
+        (tmp_path / 'big.txt').write_text(' '.join(['word'] * 20))
+        for index in range(5):
+            (tmp_path / f'small{index}.txt').write_text('one two')
+        serial = run(tmp_path, jobs=1, limits=Limits(max_total_tokens=10))
+        parallel = run(tmp_path, jobs=4, limits=Limits(max_total_tokens=10))
+        skipped = [(file.file_name, file.skip_reason) for file in serial.project.files]
+        assert [(file.file_name, file.skip_reason) for file in parallel.project.files] == skipped
+        assert parallel.combine_files() == serial.combine_files()
+
+    def test_tokenizer_is_loaded_lazily(self, project_dir, fake_encoder):
+        result = subprocess.run([sys.executable, '-c', 'import sys, src.gptizer; print("tiktoken" in sys.modules)'],
+                                capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == 'False'
+
+        gptizer = run(project_dir, count_tokens=False)
+        assert gptizer.active_tokenizer is None and gptizer.encoder is None
+        assert fake_encoder.calls == 0
+        assert all(file.stats.token_count == 0 for file in gptizer.project.files)
+
+    def test_encoder_of_the_exact_tokenizer(self, fake_encoder):
+        assert isinstance(GPTizer().encoder, fake_encoder)
+        assert GPTizer(tokenizer=HeuristicTokenizer()).encoder is None
+
+    def test_install_encoder_file(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('TIKTOKEN_CACHE_DIR', str(tmp_path / 'cache'))
+        ranks = tmp_path / 'ranks.tiktoken'
+        ranks.write_bytes(b'YQ== 0\n')
+        url = 'https://example.com/test.tiktoken'
+        monkeypatch.setitem(Settings.ENCODER_FILES, 'test', (url, hashlib.sha256(b'YQ== 0\n').hexdigest()))
+        TiktokenTokenizer.install_encoder_file(str(ranks), 'test')
+        assert (tmp_path / 'cache' / hashlib.sha1(url.encode()).hexdigest()).read_bytes() == b'YQ== 0\n'
+
+        ranks.write_bytes(b'tampered')
+        with pytest.raises(ValueError):
+            TiktokenTokenizer.install_encoder_file(str(ranks), 'test')
+
+    @pytest.mark.parametrize('data', [
+        b'', b'one line', b'unix\nlines\n', b'windows\r\nlines\r\n', b'old mac\rlines\r', b'mixed\r\n\r\rend',
+        '\ufeffbom and caf\xe9\n'.encode('utf-8'), 'latin caf\xe9\r\n'.encode('latin-1'), b'big line\n' * 200000,
+    ])
+    def test_single_read_matches_text_mode(self, tmp_path, data, monkeypatch):
+        monkeypatch.setattr(Settings, 'MMAP_THRESHOLD_BYTES', 1024)
+        path = tmp_path / 'file.txt'
+        path.write_bytes(data)
+        reader = GPTizer().loader.reader
+        reader.root_path = str(tmp_path)
+        file = File('file.txt', str(path))
+        assert reader.read_file_content(file)
+
+        for encoding in Settings.DEFAULT_ENCODINGS:
+            try:
+                with open(path, 'r', encoding=encoding) as f:
+                    lines = f.readlines()
+                break
+            except UnicodeDecodeError:
+                continue
+        assert file.encoding == encoding
+        assert file.content == ''.join(lines)
+        assert file.stats.line_count == len(lines)
+        assert file.content_size == len(file.content.encode('utf-8'))
+
+    def test_last_modified_keeps_microseconds(self):
+        metadata = FileMetadata(mtime_ns=1700000000999999999)
+        assert metadata.last_modified == datetime.fromtimestamp(1700000000).replace(microsecond=999999).isoformat()
+
+    def test_populate_files_loads_the_walked_files(self, project_dir):
+        gptizer = GPTizer()
+        gptizer.scan_directory(str(project_dir), str(project_dir), '.gptignore')
+        gptizer.project.files = []
+        gptizer.populate_files()
+        readme = next(file for file in gptizer.project.files if file.file_name == 'README.md')
+        assert readme.content and readme.stats.token_count
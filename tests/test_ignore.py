@@ -0,0 +1,36 @@
+import pathspec
+import pytest
+from src.ignore import IgnoreChain, IgnoreMatcher
+
+PATTERNS = ['*.log', 'node_modules', 'build/', '/docs/out', 'src/gen', 'cache/', '*.tar.gz', '**/tmp/*.py', 'x?z', '  spaced']
+PATHS = ['app.log', 'a/b/app.log', 'node_modules', 'a/node_modules/x.js', 'build', 'build/', 'a/build/x', 'docs/out',
+         'docs/out/x', 'a/docs/out', 'src/gen/x.py', 'src/generated', 'cache', 'a/cache/', 'dist/a.tar.gz',
+         'a/tmp/b.py', 'tmp/b.py', 'xyz', 'a/xyz/', 'keep.py', 'spaced']
+
+
+class TestIgnoreMatcher:
+    @pytest.mark.parametrize('patterns', [PATTERNS, PATTERNS + ['!a/b/app.log', '!keep.py']])
+    def test_matches_pathspec(self, patterns):
+        spec = pathspec.PathSpec.from_lines('gitwildmatch', patterns)
+        matcher = IgnoreMatcher(patterns)
+        for path in PATHS:
+            assert matcher.match_file(path) == spec.match_file(path), path
+
+    def test_fast_path_indexes(self):
+        index = IgnoreMatcher(PATTERNS).index
+        assert index.suffixes == ('.log', '.tar.gz')
+        assert index.names == {'node_modules'}
+        assert index.dir_names == {'build', 'cache'}
+        assert index.prefixes == ['docs/out', 'src/gen']
+        assert len(index.residual.patterns) == 3
+        assert IgnoreMatcher(PATTERNS + ['!keep.py']).index is None
+
+    def test_match_dir(self):
+        matcher = IgnoreMatcher(['build/', 'dist/*'])
+        assert matcher.match_dir('a/build')
+        assert not matcher.match_dir('dist')
+
+    def test_nested_chain(self):
+        chain = IgnoreChain([('', IgnoreMatcher(['*.log']))]).extend('pkg', IgnoreMatcher(['data/', '!keep.log']))
+        results = {path: chain.is_ignored(path) for path in ['x.log', 'pkg/x.log', 'pkg/keep.log', 'pkg/data/a.txt']}
+        assert results == {'x.log': True, 'pkg/x.log': True, 'pkg/keep.log': False, 'pkg/data/a.txt': True}
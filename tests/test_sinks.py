@@ -0,0 +1,120 @@
+import gzip
+import socket
+import threading
+import pyperclip
+import pytest
+from src import main
+from src.settings import Settings
+from src.sinks import (ClipboardSink, CompressedFileSink, FileSink, Sink, SinkGroup, UnixSocketSink, create_sink,
+                       create_sinks)
+
+
+class FailingSink(Sink):
+    name = 'failing'
+
+    def write(self, text):
+        raise OSError('disk full')
+
+
+class TestSinks:
+    def test_output_is_fanned_out_to_all_sinks(self, tmp_path, monkeypatch, caplog):
+        monkeypatch.setattr(Settings, 'SINK_BLOCK_CHARS', 10)
+        received = []
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(str(tmp_path / 'gptize.sock'))
+            server.listen(1)
+
+            def accept():
+                connection, _ = server.accept()
+                with connection:
+                    received.extend(iter(lambda: connection.recv(4096), b''))
+            reader = threading.Thread(target=accept)
+            reader.start()
+            sinks = [FileSink(str(tmp_path / 'out.txt')), CompressedFileSink(str(tmp_path / 'out.txt.gz')),
+                     UnixSocketSink(str(tmp_path / 'gptize.sock')), FailingSink()]
+            text = ''.join(f'line {index} caf\xe9\n' for index in range(1000))
+            with SinkGroup(sinks) as output:
+                for line in text.splitlines(keepends=True):
+                    output.write(line)
+            reader.join()
+
+        assert (tmp_path / 'out.txt').read_text(encoding='utf-8') == text
+        with gzip.open(tmp_path / 'out.txt.gz', 'rt', encoding='utf-8') as file:
+            assert file.read() == text
+        assert b''.join(received).decode('utf-8') == text
+        assert 'Writing the output to failing failed: disk full' in caplog.text
+
+    def test_create_sink(self, tmp_path):
+        assert create_sink('-').name == 'stdout'
+        assert isinstance(create_sink('clipboard'), ClipboardSink)
+        sink = create_sink(str(tmp_path / 'out.txt.gz'))
+        sink.close()
+        assert isinstance(sink, CompressedFileSink) and sink.codec == 'gzip'
+        with pytest.raises(TypeError):
+            Sink()
+
+    def test_create_sinks_closes_opened_sinks_on_failure(self, tmp_path, monkeypatch):
+        closed = []
+        monkeypatch.setattr(FileSink, 'close', lambda sink: closed.append(sink.name) or sink._file.close())
+        with pytest.raises(OSError):
+            create_sinks([str(tmp_path / 'out.txt'), f"unix:{tmp_path / 'missing.sock'}"])
+        assert closed == [str(tmp_path / 'out.txt')]
+
+    def test_failing_primary_sink_is_an_error(self, project_dir, tmp_path_factory, monkeypatch, caplog):
+        output = tmp_path_factory.mktemp('output') / 'out.txt'
+        monkeypatch.setattr('src.sinks.create_sink', lambda spec, metrics=None: FailingSink() if spec == 'failing' else create_sink(spec))
+        monkeypatch.setattr('sys.argv', ['gptize', str(project_dir), '-o', 'failing', '--sink', str(output),
+                                         '--no-clipboard', '--no-cache'])
+        assert main.main() == 1
+        assert 'print(os.getcwd())' in output.read_text(encoding='utf-8')
+        assert 'The output could not be written to failing' in caplog.text
+        assert 'Files were combined' not in caplog.text
+
+    def test_split_output_rejects_streaming_sinks(self, project_dir, monkeypatch, capsys):
+        monkeypatch.setattr('sys.argv', ['gptize', str(project_dir), '--split-tokens', '100', '-o', '-'])
+        with pytest.raises(SystemExit):
+            main.main()
+        assert 'cannot be combined with --sink' in capsys.readouterr().err
+
+    def test_clipboard_is_copied_in_background_and_capped(self, monkeypatch):
+        copied = []
+        monkeypatch.setattr(pyperclip, 'copy', copied.append)
+        monkeypatch.setattr(ClipboardSink, 'clipboard_available', staticmethod(lambda: True))
+        clipboard = ClipboardSink(max_chars=10)
+        with SinkGroup([clipboard]) as output:
+            output.write('short')
+        assert clipboard.wait(5)
+        assert copied == ['short']
+
+        clipboard = ClipboardSink(max_chars=10)
+        with SinkGroup([clipboard]) as output:
+            output.write('much longer than ten')
+        assert clipboard.too_large and clipboard.wait(5)
+        assert copied == ['short']
+
+    def test_clipboard_is_skipped_without_display(self, monkeypatch):
+        monkeypatch.setattr('sys.platform', 'linux')
+        monkeypatch.delenv('DISPLAY', raising=False)
+        monkeypatch.delenv('WAYLAND_DISPLAY', raising=False)
+        monkeypatch.setattr('os.uname', lambda: type('uname', (), {'release': '6.1.0-generic'})())
+        assert not ClipboardSink.clipboard_available()
+        monkeypatch.setenv('DISPLAY', ':0')
+        assert ClipboardSink.clipboard_available()
+
+    def test_output_is_discarded_when_building_it_fails(self, tmp_path, monkeypatch):
+        copied, closed = [], []
+        monkeypatch.setattr(pyperclip, 'copy', copied.append)
+        monkeypatch.setattr(ClipboardSink, 'clipboard_available', staticmethod(lambda: True))
+        monkeypatch.setattr(FailingSink, 'close', lambda sink: closed.append(sink.name), raising=False)
+        clipboard = ClipboardSink()
+        compressed = CompressedFileSink(str(tmp_path / 'out.txt.gz'))
+        with pytest.raises(RuntimeError):
+            with SinkGroup([clipboard, compressed, FailingSink()]) as output:
+                output.write('partial output')
+                output.flush()
+                raise RuntimeError('building the output failed')
+        assert clipboard.wait(5)
+        assert copied == []
+        assert closed == ['failing']
+        with gzip.open(tmp_path / 'out.txt.gz', 'rt', encoding='utf-8') as file:
+            assert file.read() == ''
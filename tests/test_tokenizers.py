@@ -0,0 +1,49 @@
+import pytest
+from src.gptizer import GPTizer
+from src.tokenizers import HeuristicTokenizer, ModelProfile, SampledTokenizer, TiktokenTokenizer, Tokenizer, create_tokenizer
+
+
+class TestTokenizers:
+    def test_model_profiles(self):
+        profile = ModelProfile.get('gpt-4')
+        assert (profile.encoding, profile.context_window) == ('cl100k_base', 8192)
+        with pytest.raises(ValueError):
+            ModelProfile.get('unknown-model')
+
+    def test_create_tokenizer(self):
+        assert create_tokenizer('exact', 'cl100k_base').name == 'cl100k_base'
+        assert create_tokenizer('heuristic', 'o200k_base').error_bound is None
+        assert create_tokenizer('sampled', 'o200k_base').name == 'sampled-o200k_base'
+        with pytest.raises(TypeError):
+            Tokenizer()
+
+    def test_heuristic_estimate(self):
+        tokenizer = HeuristicTokenizer()
+        assert tokenizer.count(['', 'word']) == [0, 1]
+        assert tokenizer.estimate('print(value)\n') == 5
+        short, long = tokenizer.count(['def f(x):\n    return x\n', 'def f(x):\n    return x\n' * 10])
+        assert long == pytest.approx(short * 10, rel=0.1)
+
+    def test_sampled_extrapolates_large_batches(self, fake_encoder):
+        exact = TiktokenTokenizer()
+        tokenizer = SampledTokenizer(exact, samples=8, slice_chars=64)
+        small = ['one two three\n']
+        assert tokenizer.count(small) == exact.count(small)
+        assert tokenizer.error_bound == 0
+
+        fake_encoder.calls = 0
+        texts = ['alpha beta gamma delta\n' * 500, 'x = 1\n' * 2000]
+        estimated = tokenizer.count(texts)
+        assert fake_encoder.calls == 8
+        assert sum(estimated) == pytest.approx(sum(exact.count(texts)), rel=0.2)
+        assert 0 < tokenizer.error_bound < 1
+
+    def test_sampled_counts_across_files_in_a_serial_run(self, tmp_path, fake_encoder):
+        for index in range(20):
+            (tmp_path / f'module{index}.py').write_text(f'value_{index} = {index}\n' * 20, encoding='utf-8')
+        tokenizer = SampledTokenizer(TiktokenTokenizer(), samples=8, slice_chars=64)
+        fake_encoder.calls = 0
+        gptizer = GPTizer(jobs=1, tokenizer=tokenizer)
+        gptizer.process_directory(str(tmp_path), str(tmp_path), '.gptignore')
+        assert fake_encoder.calls == 8
+        assert sum(file.stats.token_count for file in gptizer.project.files) == pytest.approx(20 * 20 * 3, rel=0.2)
@@ -0,0 +1,68 @@
+import pytest
+from src.transforms import CommentTransform, LiteralTransform, OutlineTransform, Transform, TransformPipeline
+
+SOURCE = '''"""Module docstring."""
+import os  # Needed for getcwd
+
+
+def cwd(prefix: str = '#') -> str:
+    """Return the working directory."""
+    # Comment-only line
+    return prefix + os.getcwd()
+
+
+class Empty:
+    """Nothing but a docstring."""
+'''
+
+
+class TestTransforms:
+    def test_python_comments_and_docstrings(self):
+        stripped = CommentTransform().apply(SOURCE, 'app.py')
+        assert '"""' not in stripped and 'Needed' not in stripped and 'Comment-only' not in stripped
+        assert "prefix: str = '#'" in stripped
+        assert 'class Empty:\n    ...\n' in stripped
+        compile(stripped, 'app.py', 'exec')
+
+    def test_c_style_comments_keep_strings(self):
+        stripped = CommentTransform().apply('url = "http://example.com"; // Home\n/* Block\n comment */x = 1;\n', 'app.js')
+        assert stripped == 'url = "http://example.com"; \nx = 1;\n'
+
+    def test_css_keeps_urls(self):
+        css = '/* Header */\n.logo { background: url(http://example.com/logo.png); }\n'
+        assert CommentTransform().apply(css, 'style.css') == '\n.logo { background: url(http://example.com/logo.png); }\n'
+
+    def test_outline(self):
+        outline = OutlineTransform().apply(SOURCE, 'app.py')
+        assert outline == ("import os\n"
+                           "def cwd(prefix: str='#') -> str:\n"
+                           '    """Return the working directory."""\n'
+                           "    ...\n"
+                           "class Empty:\n"
+                           '    """Nothing but a docstring."""\n')
+        assert OutlineTransform().apply('def broken(:\n', 'app.py') == 'def broken(:\n'
+
+    def test_long_literals_are_truncated(self):
+        transform = LiteralTransform(max_chars=40)
+        content = f'blob = "{"A" * 100}"\ndata = [{", ".join(str(index) for index in range(50))}]\nname = "short"\n'
+        truncated = transform.apply(content, 'data.py')
+        assert f'"{"A" * 10}...[90 chars truncated]"' in truncated
+        assert 'data = [0, 1, ...48 more]' in truncated
+        assert 'name = "short"' in truncated
+
+    def test_literals_leave_prose_unchanged(self):
+        prose = "It's the project's notes, they're kept " + 'as written ' * 10 + "and aren't truncated.\n"
+        assert not LiteralTransform(max_chars=40).applies('NOTES.md')
+        assert TransformPipeline(['literals']).apply(prose, 'NOTES.md') is None
+
+    def test_pipeline(self):
+        pipeline = TransformPipeline(['whitespace', 'minify'])
+        assert pipeline.name == 'minify+whitespace'
+        assert pipeline.apply('{\n  "a": [1, 2]\n}\n', 'package-lock.json') == '{"a":[1,2]}\n'
+        assert pipeline.apply('text  \n\n\n\nmore\n', 'notes.txt') == 'text\n\nmore\n'
+        assert pipeline.apply('line  \nbreak\n', 'README.md') is None
+        assert pipeline.chars_saved == {'minify': 6, 'whitespace': 4}
+        with pytest.raises(ValueError):
+            TransformPipeline(['whitespace', 'uglify'])
+        with pytest.raises(TypeError):
+            Transform()
@@ -0,0 +1,37 @@
+import gzip
+import os
+from src.gptizer import GPTizer
+from src.watcher import PollingChangeSource, ProjectWatcher
+
+
+class TestProjectWatcher:
+    def test_rebuild_retokenizes_only_changed_files(self, project_dir, tmp_path_factory, fake_encoder):
+        output = str(tmp_path_factory.mktemp('out') / 'out.txt')
+        watcher = ProjectWatcher(GPTizer(), str(project_dir), str(project_dir), '.gptignore', [output], use_polling=True)
+        watcher.source = PollingChangeSource(interval=0.01)
+        watcher.rebuild()
+        assert 'Some words here' in open(output, encoding='utf-8').read()
+
+        fake_encoder.calls = 0
+        (project_dir / 'README.md').write_text('# Demo\nedited words', encoding='utf-8')
+        changed = watcher.wait_for_changes(debounce=0.01)
+        assert changed == {os.path.abspath(project_dir / 'README.md')}
+        watcher.rebuild()
+        assert fake_encoder.calls == 1
+        assert 'edited words' in open(output, encoding='utf-8').read()
+
+    def test_output_inside_project_is_ignored(self, project_dir):
+        output = str(project_dir / 'out.txt')
+        watcher = ProjectWatcher(GPTizer(), str(project_dir), str(project_dir), '.gptignore', [output])
+        watcher.rebuild()
+        assert output not in [os.path.abspath(file.directory) for file in watcher.gptizer.project.files]
+        watcher.source.close()
+
+    def test_rebuild_writes_to_all_outputs(self, project_dir, tmp_path_factory):
+        output_dir = tmp_path_factory.mktemp('out')
+        outputs = [str(output_dir / 'out.txt.gz'), str(output_dir / 'copy.txt')]
+        watcher = ProjectWatcher(GPTizer(), str(project_dir), str(project_dir), '.gptignore', outputs, use_polling=True)
+        watcher.rebuild()
+        with gzip.open(outputs[0], 'rt', encoding='utf-8') as file:
+            assert 'Some words here' in file.read()
+        assert 'Some words here' in open(outputs[1], encoding='utf-8').read()